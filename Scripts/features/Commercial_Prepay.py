@@ -11,6 +11,7 @@
 import logging
 from app import Navi, mws, pos, system, forecourt_installation, networksim, crindsim
 from app.framework import EDH
+from app.util import waits
 from app.framework.tc_helpers import setup, test, teardown, tc_fail
 from app.features import feature_activation
 from Scripts.features import NGFC_Helpers
@@ -1099,12 +1100,8 @@ class Commercial_Prepay():
         # there is some stuff that is not exactly a message and 
         # we will remove them, we just need 2, preauth and completion
 
-        messages = self.edh.get_network_messages(4,start_in=last_msg)
-
-        start_time = time.time()
-        while len(messages) < 2 and (time.time() - start_time < 60):
-            self.log.debug("There are messages pending to be generated, retrying to get all of them.")
-            messages = self.edh.get_network_messages(4,start_in=last_msg)
+        messages = waits.poll(self.edh.get_network_messages, 60, args=(4,), kwargs={'start_in': last_msg},
+                              until=lambda messages: len(messages) >= 2)
         if len(messages) < 2:
             tc_fail("The messages obtained from the EDH do not contain all requests and responses messages")               
         
@@ -1155,12 +1152,8 @@ class Commercial_Prepay():
         # there is some stuff that is not exactly a message and 
         # we will remove them, we just need 2, preauth and completion
 
-        messages = self.edh.get_network_messages(4,start_in=last_msg)
-
-        start_time = time.time()
-        while len(messages) < 2 and (time.time() - start_time < 60):
-            self.log.debug("There are messages pending to be generated, retrying to get all of them.")
-            messages = self.edh.get_network_messages(4,start_in=last_msg)
+        messages = waits.poll(self.edh.get_network_messages, 60, args=(4,), kwargs={'start_in': last_msg},
+                              until=lambda messages: len(messages) >= 2)
         if len(messages) < 2:
             tc_fail("The messages obtained from the EDH do not contain all requests and responses messages")              
         
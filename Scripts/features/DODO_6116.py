@@ -11,6 +11,7 @@
 import logging
 from app import Navi, mws, pos, system, networksim, crindsim, pinpadsim, runas
 from app.framework import EDH
+from app.util import waits
 from app.framework.tc_helpers import setup, test, teardown, tc_fail
 from app.features import feature_activation, forecourt_installation
 import time
@@ -455,12 +456,8 @@ class DODO_6116():
         self.pos.wait_for_fuel(default_dispenser, timeout=120)
         
         # Get messages the 4 messages (preauth and completion)
-        messages = self.edh.get_network_messages(8,start_in=last_msg)        
-
-        start_time = time.time()
-        while len(messages) < 4 and (time.time() - start_time < 60):
-            self.log.debug("The expected network messages are not still available, retrying...")
-            messages = self.edh.get_network_messages(8,start_in=last_msg)
+        messages = waits.poll(self.edh.get_network_messages, 60, args=(8,), kwargs={'start_in': last_msg},
+                              until=lambda messages: len(messages) >= 4)
 
         if len(messages) < 4:
             
@@ -598,12 +595,8 @@ class DODO_6116():
         # there is some stuff that is not exactly a message and 
         # we will remove them, we just need 2, preauth and completion
 
-        messages = self.edh.get_network_messages(4,start_in=last_msg)
-
-        start_time = time.time()
-        while len(messages) < 2 and (time.time() - start_time < 60):
-            self.log.debug("The expected network messages are not still available, retrying...")
-            messages = self.edh.get_network_messages(4,start_in=last_msg)
+        messages = waits.poll(self.edh.get_network_messages, 60, args=(4,), kwargs={'start_in': last_msg},
+                              until=lambda messages: len(messages) >= 2)
 
         if len(messages) < 2:
             
@@ -656,12 +649,8 @@ class DODO_6116():
         last_msg = self.wait_for_new_msg(last_msg, "23")    
         
         # Get messages to check the completion
-        messages = self.edh.get_network_messages(4,start_in=last_msg)
-
-        start_time = time.time()
-        while len(messages) < 2 and (time.time() - start_time < 60):
-            self.log.debug("The expected network messages are not still available, retrying...")
-            messages = self.edh.get_network_messages(4,start_in=last_msg)
+        messages = waits.poll(self.edh.get_network_messages, 60, args=(4,), kwargs={'start_in': last_msg},
+                              until=lambda messages: len(messages) >= 2)
 
         if len(messages) < 2:
             
@@ -786,14 +775,10 @@ class DODO_6116():
         # there is some stuff that is not exactly a message and 
         # we will remove them, we just need 2, preauth and completion
 
-        messages = self.edh.get_network_messages(4,start_in=last_msg)
+        messages = waits.poll(self.edh.get_network_messages, 10, args=(4,), kwargs={'start_in': last_msg},
+                              until=lambda messages: len(messages) >= 2)
         self.log.debug(messages)
 
-        start_time = time.time()
-        while len(messages) < 2 and (time.time() - start_time < 10):
-            self.log.debug("The expected network messages are not still available, retrying...")
-            messages = self.edh.get_network_messages(4,start_in=last_msg)
-
         if len(messages) < 2:
             
             tc_fail("The messages obtained from the EDH do not contain request and response messages")        
@@ -841,12 +826,8 @@ class DODO_6116():
         # Waiting for completion messages are generated
         last_msg = self.wait_for_new_msg(last_msg, "23")
 
-        messages = self.edh.get_network_messages(4,start_in=last_msg)
-
-        start_time = time.time()
-        while len(messages) < 2 and (time.time() - start_time < 10):
-            self.log.debug("The expected network messages are not still available, retrying...")
-            messages = self.edh.get_network_messages(4,start_in=last_msg)
+        messages = waits.poll(self.edh.get_network_messages, 10, args=(4,), kwargs={'start_in': last_msg},
+                              until=lambda messages: len(messages) >= 2)
 
         if len(messages) < 2:
             
@@ -1002,13 +983,10 @@ class DODO_6116():
         # Making reversal be send to the host
         self.log.info("Waiting for the reversal to be completed")
         
-        start = time.time()
-        reversal_found = False
         message_to_find= ""
-        
-        self.log.debug("Checking if the reversal was already placed")
-        while not reversal_found or time.time() - start < 60:
 
+        def reversal_found():
+            nonlocal message_to_find
             messages = self.edh.get_network_messages(12,start_in=last_msg)
             for message in messages:
                 if "Reversal response" in message:
@@ -1022,8 +1000,11 @@ class DODO_6116():
             for message in messages:
                 if message_to_find in message:
                     self.log.debug(f"Local Apporved transaction found: {message}")
-                    reversal_found = True
-                    break
+                    return True
+            return False
+
+        self.log.debug("Checking if the reversal was already placed")
+        waits.poll(reversal_found, 60)
     
     '''
     #TODO: uncomment when DODO-6276 get fixed
@@ -1139,12 +1120,8 @@ class DODO_6116():
         # there is some stuff that is not exactly a message and 
         # we will remove them, we just need 2, preauth and completion
 
-        messages = self.edh.get_network_messages(4,start_in=last_msg)        
-
-        start_time = time.time()
-        while len(messages) < 1 and (time.time() - start_time < 10):
-            self.log.debug("The expected network messages are not still available, retrying...")
-            messages = self.edh.get_network_messages(4,start_in=last_msg)
+        messages = waits.poll(self.edh.get_network_messages, 10, args=(4,), kwargs={'start_in': last_msg},
+                              until=lambda messages: len(messages) >= 1)
 
         if len(messages) < 1:
             
@@ -1294,12 +1271,8 @@ class DODO_6116():
         # we will remove them, we just need 2, preauth and completion
 
         self.log.debug("Looking for the preauth request and response")
-        messages = self.edh.get_network_messages(4,start_in=last_msg)
-
-        start_time = time.time()
-        while len(messages) < 2 and (time.time() - start_time < 20):
-            self.log.debug("The expected network messages are not still available, retrying...")
-            messages = self.edh.get_network_messages(4,start_in=last_msg)
+        messages = waits.poll(self.edh.get_network_messages, 20, args=(4,), kwargs={'start_in': last_msg},
+                              until=lambda messages: len(messages) >= 2)
 
         if len(messages) < 2:
             
@@ -1352,12 +1325,8 @@ class DODO_6116():
         # Waiting for completion messages are generated
         last_msg = self.wait_for_new_msg(last_msg, "23")
 
-        messages = self.edh.get_network_messages(4,start_in=last_msg)
-
-        start_time = time.time()
-        while len(messages) < 2 and (time.time() - start_time < 10):
-            self.log.debug("The expected network messages are not still available, retrying...")
-            messages = self.edh.get_network_messages(4,start_in=last_msg)
+        messages = waits.poll(self.edh.get_network_messages, 10, args=(4,), kwargs={'start_in': last_msg},
+                              until=lambda messages: len(messages) >= 2)
 
         if len(messages) < 2:
             
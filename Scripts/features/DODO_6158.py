@@ -12,6 +12,7 @@
 import logging
 from app import Navi, mws, pos, system, forecourt_installation, networksim, crindsim, runas, network_site_config
 from app.framework import EDH
+from app.util import waits
 from app.framework.tc_helpers import setup, test, teardown, tc_fail
 from app.features import feature_activation
 from Scripts.features import NGFC_Helpers
@@ -184,11 +185,8 @@ class DODO_6158():
         """
 
         self.log.debug("Try to get 4 messages (preauth and completion)")
-        messages = self.edh.get_network_messages(8,start_in=last_msg)
-        start_time = time.time()
-        while len(messages) < 4 and (time.time() - start_time < 60):
-            self.log.debug("There are messages pending to be generated, retrying to get all of them.")
-            messages = self.edh.get_network_messages(8,start_in=last_msg)
+        messages = waits.poll(self.edh.get_network_messages, 60, args=(8,), kwargs={'start_in': last_msg},
+                              until=lambda messages: len(messages) >= 4)
         if len(messages) < 4:
             tc_fail("The messages obtained from the EDH do not contain all requests and responses messages")
         
@@ -449,11 +447,8 @@ class DODO_6158():
         # we will remove them, we just need 2, preauth and completion
         
         self.log.debug("Try to get 4 messages (preauth and completion)")
-        messages = self.edh.get_network_messages(8,start_in=last_msg)
-        start_time = time.time()
-        while len(messages) < 4 and (time.time() - start_time < 60):
-            self.log.debug("There are messages pending to be generated, retrying to get all of them.")
-            messages = self.edh.get_network_messages(8,start_in=last_msg)
+        messages = waits.poll(self.edh.get_network_messages, 60, args=(8,), kwargs={'start_in': last_msg},
+                              until=lambda messages: len(messages) >= 4)
         if len(messages) < 4:
             tc_fail("The messages obtained from the EDH do not contain all requests and responses messages")
         
@@ -658,11 +653,8 @@ class DODO_6158():
         # we will remove them, we just need 2, preauth and completion
         
         self.log.debug("Try to get 4 messages (preauth and completion)")
-        messages = self.edh.get_network_messages(8,start_in=last_msg)
-        start_time = time.time()
-        while len(messages) < 4 and (time.time() - start_time < 60):
-            self.log.debug("There are messages pending to be generated, retrying to get all of them.")
-            messages = self.edh.get_network_messages(8,start_in=last_msg)
+        messages = waits.poll(self.edh.get_network_messages, 60, args=(8,), kwargs={'start_in': last_msg},
+                              until=lambda messages: len(messages) >= 4)
         if len(messages) < 4:
             tc_fail("The messages obtained from the EDH do not contain all requests and responses messages")
         
@@ -858,11 +850,8 @@ class DODO_6158():
         # we will remove them, we just need 2, preauth and completion
         
         self.log.debug("Try to get 4 messages (preauth and completion)")
-        messages = self.edh.get_network_messages(8,start_in=last_msg)
-        start_time = time.time()
-        while len(messages) < 4 and (time.time() - start_time < 60):
-            self.log.debug("There are messages pending to be generated, retrying to get all of them.")
-            messages = self.edh.get_network_messages(8,start_in=last_msg)
+        messages = waits.poll(self.edh.get_network_messages, 60, args=(8,), kwargs={'start_in': last_msg},
+                              until=lambda messages: len(messages) >= 4)
         if len(messages) < 4:
             tc_fail("The messages obtained from the EDH do not contain all requests and responses messages")
         
@@ -1061,11 +1050,8 @@ class DODO_6158():
         # we will remove them, we just need 2, preauth and completion
         
         self.log.debug("Try to get 4 messages (preauth and completion)")
-        messages = self.edh.get_network_messages(8,start_in=last_msg)
-        start_time = time.time()
-        while len(messages) < 4 and (time.time() - start_time < 60):
-            self.log.debug("There are messages pending to be generated, retrying to get all of them.")
-            messages = self.edh.get_network_messages(8,start_in=last_msg)
+        messages = waits.poll(self.edh.get_network_messages, 60, args=(8,), kwargs={'start_in': last_msg},
+                              until=lambda messages: len(messages) >= 4)
         if len(messages) < 4:
             self.log.debug("Reset host simulator values to previous state, since test case failed")
             networksim.set_commercial_customer_information(self.customerInfo[0], self.customerInfo[1], self.customerInfo[2], self.customerInfo[3])
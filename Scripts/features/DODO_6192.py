@@ -12,6 +12,7 @@ import logging
 from app import Navi, mws, pos, system, networksim, crindsim, runas, forecourt_installation
 from app import initial_setup
 from app.framework import EDH
+from app.util import waits
 from app.framework.tc_helpers import setup, test, teardown, tc_fail
 from app.features import feature_activation, tender
 from test_harness import site_type
@@ -165,12 +166,8 @@ class DODO_6192():
         self.pos.pay(tender_type=tender, prompts=commercial_prompts)
 
         self.log.debug("Get request and reponse from the EDH")
-        messages = self.edh.get_network_messages(4,start_in=last_msg)
-
-        start_time = time.time()
-        while len(messages) < 2 and (time.time() - start_time < 60):
-            self.log.debug("The expected network messages are not still available, retrying...")
-            messages = self.edh.get_network_messages(4,start_in=last_msg)
+        messages = waits.poll(self.edh.get_network_messages, 60, args=(4,), kwargs={'start_in': last_msg},
+                              until=lambda messages: len(messages) >= 2)
 
         if len(messages) < 2:
             
@@ -343,12 +340,8 @@ class DODO_6192():
         # get the last 4 messages in the DB after payment
         # there is some stuff that is not exactly a message and 
         # we will remove them, we just need 2, preauth and completion
-        messages = self.edh.get_network_messages(4,start_in=last_msg)
-
-        start_time = time.time()
-        while len(messages) < 2 and (time.time() - start_time < 60):
-            self.log.debug("The expected network messages are not still available, retrying...")
-            messages = self.edh.get_network_messages(4,start_in=last_msg)
+        messages = waits.poll(self.edh.get_network_messages, 60, args=(4,), kwargs={'start_in': last_msg},
+                              until=lambda messages: len(messages) >= 2)
 
         if len(messages) < 2:
             
@@ -537,12 +530,8 @@ class DODO_6192():
         # get the last 4 messages in the DB after payment
         # there is some stuff that is not exactly a message and 
         # we will remove them, we just need 2, preauth and completion
-        messages = self.edh.get_network_messages(4,start_in=last_msg)
-
-        start_time = time.time()
-        while len(messages) < 2 and (time.time() - start_time < 60):
-            self.log.debug("The expected network messages are not still available, retrying...")
-            messages = self.edh.get_network_messages(4,start_in=last_msg)
+        messages = waits.poll(self.edh.get_network_messages, 60, args=(4,), kwargs={'start_in': last_msg},
+                              until=lambda messages: len(messages) >= 2)
 
         if len(messages) < 2:
             
@@ -678,12 +667,8 @@ class DODO_6192():
         # get the last 4 messages in the DB after payment
         # there is some stuff that is not exactly a message and 
         # we will remove them, we just need 2, preauth and completion
-        messages = self.edh.get_network_messages(4,start_in=last_msg)
-
-        start_time = time.time()
-        while len(messages) < 2 and (time.time() - start_time < 60):
-            self.log.debug("The expected network messages are not still available, retrying...")
-            messages = self.edh.get_network_messages(4,start_in=last_msg)
+        messages = waits.poll(self.edh.get_network_messages, 60, args=(4,), kwargs={'start_in': last_msg},
+                              until=lambda messages: len(messages) >= 2)
 
         if len(messages) < 2:
             
@@ -811,12 +796,8 @@ class DODO_6192():
         # get the last 4 messages in the DB after payment
         # there is some stuff that is not exactly a message and 
         # we will remove them, we just need 2, preauth and completion
-        messages = self.edh.get_network_messages(4,start_in=last_msg)
-
-        start_time = time.time()
-        while len(messages) < 2 and (time.time() - start_time < 60):
-            self.log.debug("The expected network messages are not still available, retrying...")
-            messages = self.edh.get_network_messages(4,start_in=last_msg)
+        messages = waits.poll(self.edh.get_network_messages, 60, args=(4,), kwargs={'start_in': last_msg},
+                              until=lambda messages: len(messages) >= 2)
 
         if len(messages) < 2:
             
@@ -914,12 +895,8 @@ class DODO_6192():
         self.log.debug("Wait for new messages in the EDH so we can check the messages involved in the transaction")
         last_msg = self.helpers.wait_for_new_msg(last_msg, '23')
         
-        messages = self.edh.get_network_messages(4,start_in=last_msg)
-
-        start_time = time.time()
-        while len(messages) < 1 and (time.time() - start_time < 60):
-            self.log.debug("The expected network messages are not still available, retrying...")
-            messages = self.edh.get_network_messages(2,start_in=last_msg)
+        messages = waits.poll(self.edh.get_network_messages, 60, args=(2,), kwargs={'start_in': last_msg},
+                              until=lambda messages: len(messages) >= 1)
 
         if len(messages) < 1:
             
@@ -12,6 +12,7 @@
 import logging
 from app import Navi, mws, pos, system, forecourt_installation, networksim, crindsim, runas, network_site_config
 from app.framework import EDH
+from app.util import waits
 from app.framework.tc_helpers import setup, test, teardown, tc_fail
 from app.features import feature_activation
 from Scripts.features import NGFC_Helpers
@@ -417,11 +418,8 @@ class DODO_6270():
         """
         
         self.log.debug("Try to get 1 message (preauth request), since host is unavailable")
-        messages = self.edh.get_network_messages(6,start_in=last_msg)
-        start_time = time.time()
-        while len(messages) != 1 and (time.time() - start_time < 30):
-            self.log.debug("There are messages pending to be generated, retrying to get all of them.")
-            messages = self.edh.get_network_messages(6,start_in=last_msg)
+        messages = waits.poll(self.edh.get_network_messages, 30, args=(6,), kwargs={'start_in': last_msg},
+                              until=lambda messages: len(messages) == 1)
         if len(messages) != 1:
             tc_fail("The messages obtained from the EDH do not contain preauth requests and responses messages")
         
@@ -446,11 +444,8 @@ class DODO_6270():
         """
         
         self.log.debug("Try to get 2 messages (completion request and response), after host gets online")
-        messages = self.edh.get_network_messages(4,start_in=last_msg)
-        start_time = time.time()
-        while len(messages) < 2 and (time.time() - start_time < 60):
-            self.log.debug("There are messages pending to be generated, retrying to get all of them.")
-            messages = self.edh.get_network_messages(4,start_in=last_msg)
+        messages = waits.poll(self.edh.get_network_messages, 60, args=(4,), kwargs={'start_in': last_msg},
+                              until=lambda messages: len(messages) >= 2)
         if len(messages) < 2:
             tc_fail("The messages obtained from the EDH do not contain completion requests and responses messages")
     
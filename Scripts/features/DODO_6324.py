@@ -12,6 +12,7 @@
 import logging
 from app import Navi, mws, pos, system, forecourt_installation, networksim, crindsim
 from app.framework import EDH
+from app.util import waits
 from app.framework.tc_helpers import setup, test, teardown, tc_fail
 from app.features import feature_activation
 from Scripts.features import NGFC_Helpers
@@ -1190,12 +1191,8 @@ class DODO_6324():
         if not messages_to_verify is None:
 
             self.log.debug("Try to get 2 messages (completion)")
-            messages = self.edh.get_network_messages(4,start_in=last_msg)
-            
-            start_time = time.time()
-            while len(messages) < 2 and (time.time() - start_time < 60):
-                self.log.debug("There are messages pending to be generated, retrying to get all of them.")
-                messages = self.edh.get_network_messages(8,start_in=last_msg)
+            messages = waits.poll(self.edh.get_network_messages, 60, args=(8,), kwargs={'start_in': last_msg},
+                                  until=lambda messages: len(messages) >= 2)
             if len(messages) < 2:
                 tc_fail("The messages obtained from the EDH do not contain all requests and responses messages")
 
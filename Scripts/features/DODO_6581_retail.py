@@ -12,6 +12,7 @@ import logging
 import time
 from app import Navi, mws, pos, networksim, crindsim
 from app.framework import EDH
+from app.util import waits
 from app.framework.tc_helpers import setup, test, teardown, tc_fail
 from app.features import  tender
 from Scripts.features import NGFC_Helpers
@@ -185,12 +186,8 @@ class DODO_6581_retail():
             tc_fail("The terminal din't prompt for receipt and it should be doing that")
 
         self.log.debug("Try to get 2 messages (sale)")
-        messages = self.edh.get_network_messages(4,start_in=last_msg)
-        
-        start_time = time.time()
-        while len(messages) < 2 and (time.time() - start_time < 60):
-            self.log.debug("There are messages pending to be generated, retrying to get all of them.")
-            messages = self.edh.get_network_messages(4,start_in=last_msg)
+        messages = waits.poll(self.edh.get_network_messages, 60, args=(4,), kwargs={'start_in': last_msg},
+                              until=lambda messages: len(messages) >= 2)
         if len(messages) < 2:
             tc_fail("The messages obtained from the EDH do not contain all requests and responses messages")
 
@@ -302,12 +299,8 @@ class DODO_6581_retail():
         #    tc_fail("The terminal din't prompt for receipt and it should be doing that")
 
         self.log.debug("Try to get 2 messages (sale)")
-        messages = self.edh.get_network_messages(4,start_in=last_msg)
-        
-        start_time = time.time()
-        while len(messages) < 2 and (time.time() - start_time < 60):
-            self.log.debug("There are messages pending to be generated, retrying to get all of them.")
-            messages = self.edh.get_network_messages(4,start_in=last_msg)
+        messages = waits.poll(self.edh.get_network_messages, 60, args=(4,), kwargs={'start_in': last_msg},
+                              until=lambda messages: len(messages) >= 2)
         if len(messages) < 2:
             tc_fail("The messages obtained from the EDH do not contain all requests and responses messages")
 
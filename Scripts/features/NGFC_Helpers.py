@@ -13,6 +13,7 @@ from app import Navi, pos, system, forecourt_installation, crindsim, networksim,
 from app.framework.tc_helpers import setup, test, teardown, tc_fail
 from app.features import feature_activation
 from app.framework import EDH
+from app.util import waits
 
 import time
 
@@ -568,16 +569,12 @@ class NGFC_Helpers():
         if not messages_to_verify is None:
 
             self.log.debug("Try to get 4 messages (preauth and completion)")
-            messages = self.edh.get_network_messages(8,start_in=last_msg)
-            
             messages_num = len(message_types)
 
             messages_to_get = messages_num * 2 #for each valid message, concord logs one that we don't care
             
-            start_time = time.time()
-            while len(messages) < messages_num and (time.time() - start_time < 60):
-                self.log.debug("There are messages pending to be generated, retrying to get all of them.")
-                messages = self.edh.get_network_messages(messages_to_get,start_in=last_msg)
+            messages = waits.poll(self.edh.get_network_messages, 60, args=(messages_to_get,), kwargs={'start_in': last_msg},
+                                  until=lambda messages: len(messages) >= messages_num)
             if len(messages) < messages_num:
                 tc_fail("The messages obtained from the EDH do not contain all requests and responses messages")            
 
@@ -714,12 +711,8 @@ class NGFC_Helpers():
         if not messages_to_verify is None:
 
             self.log.debug("Try to get 4 messages (preauth and completion)")
-            messages = self.edh.get_network_messages(8,start_in=last_msg)
-            
-            start_time = time.time()
-            while len(messages) < 4 and (time.time() - start_time < 60):
-                self.log.debug("There are messages pending to be generated, retrying to get all of them.")
-                messages = self.edh.get_network_messages(8,start_in=last_msg)
+            messages = waits.poll(self.edh.get_network_messages, 60, args=(8,), kwargs={'start_in': last_msg},
+                                  until=lambda messages: len(messages) >= 4)
             if len(messages) < 4:
                 tc_fail("The messages obtained from the EDH do not contain all requests and responses messages")
 
@@ -12,7 +12,8 @@ import logging, json, time
 
 from app import carwash, crindsim, employee, forecourt_installation
 from app import network_site_config, item, tax_maint
-from app import initial_setup, mws, Navi, pinpad, server, system, tender
+from app import initial_setup, mws, Navi, pinpad, system, tender
+from app.util import server
 from app.framework import EDH
 from app.framework.tc_helpers import setup, test, teardown, tc_fail
 from app.util import constants
@@ -12,7 +12,8 @@ import logging, json
 
 from app import crindsim, employee, forecourt_installation, network_site_config
 from app import item, tax_maint
-from app import initial_setup, mws, Navi, pinpad, server, system, tender
+from app import initial_setup, mws, Navi, pinpad, system, tender
+from app.util import server
 from app.framework import EDH
 from app.framework.tc_helpers import setup, test, teardown, tc_fail
 from app.util import constants
@@ -15,12 +15,14 @@ TODO
 - Switch to new headless crind sim
 - Write TC results
 - Add indoor credit transactions
-- Analyze perfmon/health check logs
+- Analyze perfmon/health check logs (latency and process resources are tracked by app.util.telemetry)
 """
 
 import logging, pywinauto, datetime, time, threading, random, os, json, sys
-from app import Navi, mws, pos, system, store_close, crindsim, runas, server
+from app import Navi, mws, pos, system, store_close, crindsim, runas
+from app.util import server
 from app.framework import EDH
+from app.util import telemetry, webdriver_pool
 from app.framework.tc_helpers import setup, test, teardown, tc_fail
 
 script_path = os.path.dirname(os.path.realpath(__file__))
@@ -55,6 +57,7 @@ class endurance():
         self.log_num = 1
         self.error_count = 0
         self.consecutive_errors = 0
+        self.telemetry = telemetry.Telemetry(os.path.join(self.log_path, "telemetry"))
 
     @setup 
     def setup(self):
@@ -74,6 +77,7 @@ class endurance():
 
         Navi.navigate_to("pos")
         pos.sign_on()
+        self.telemetry.start()
 
     @test
     def endurance(self):
@@ -84,7 +88,6 @@ class endurance():
         for i in range(self.num_crinds-self.num_prepays+1, self.num_crinds+1):
             crindsim.set_sales_target("auth", dispenser=i)
         self.dispatch_crind_threads(self.num_crinds-self.num_prepays)     
-        self.loops_since_restart = 0
         while True:
             pass # remove me
             try:
@@ -97,12 +100,11 @@ class endurance():
                 if self.consecutive_errors >= 5:
                     self.log.error("!!! Failed 5 transactions in a row. Trying to recover...")
                     system.takescreenshot()
-                    pos.close()
+                    pos.close(quit=True)
                     system.restartpp()
                     pos.connect()
                     pos.sign_on()
                     self.consecutive_errors = 0
-                    self.loops_since_restart = 0
                 # TODO: Do something here to log a TC fail? Need to do it without ending the script.     
             self.message_check()
             self.serveralert_check()
@@ -117,36 +119,43 @@ class endurance():
                 self.stop_crinds = True
                 self.store_close()
                 self.log.info(f"Current error count: {self.error_count}")
+                self.log_telemetry()
                 self.zip_files()
                 self.rotate_log()
                 self.stop_crinds = False
                 self.dispatch_crind_threads(self.num_crinds)
 
-            # Restart Chrome every so often to work around a ChromeDriver memory leak
+            # Restart Chrome once it has grown past the pool's memory limit, to work around a ChromeDriver memory leak
             # TODO: Remove this as soon as the leak is resolved. This workaround reduces our ability to identify long-term performance issues with the POS GUI
-            if self.loops_since_restart >= 100:
-                pos.close()
+            # Classic POS has no Chrome session to restart
+            driver = getattr(pos, 'driver', None)
+            if driver is not None and webdriver_pool.get().over_memory(driver):
+                self.log.info(f"Restarting Chrome. Sessions so far: {webdriver_pool.get().metrics()}")
+                pos.close(quit=True)
                 pos.connect()
-                self.loops_since_restart = 0
 
     def run_transactions(self):
-        """Run a handful of indoor transactions."""
+        """Run a handful of indoor transactions, timing each one."""
         # Speedkey sale
-        assert pos.add_item("Generic Item", verify=False), "Failed to add item by speed key"
-        assert pos.pay(verify=False), "Failed to pay out speed key transaction" 
+        with self.telemetry.timed("speed key sale"):
+            assert pos.add_item("Generic Item", verify=False), "Failed to add item by speed key"
+            assert pos.pay(verify=False), "Failed to pay out speed key transaction" 
 
         # Dept key sale
-        assert pos.add_item("Dept 3", "Dept Key", price="$5.00", verify=False), "Failed to add item by dept key"
-        assert pos.pay(verify=False), "Failed to pay out dept key transaction"
+        with self.telemetry.timed("dept sale"):
+            assert pos.add_item("Dept 3", "Dept Key", price="$5.00", verify=False), "Failed to add item by dept key"
+            assert pos.pay(verify=False), "Failed to pay out dept key transaction"
 
         # Car wash sale
-        assert pos.add_item("1234", "PLU", qualifier="Carwash 1 ($5.00)", verify=False), "Failed to add car wash by PLU"
-        assert pos.pay(verify=False), "Failed to pay out car wash transaction"
+        with self.telemetry.timed("car wash sale"):
+            assert pos.add_item("1234", "PLU", qualifier="Carwash 1 ($5.00)", verify=False), "Failed to add car wash by PLU"
+            assert pos.pay(verify=False), "Failed to pay out car wash transaction"
 
         try:
             for i in range(self.num_crinds-self.num_prepays+1, self.num_crinds+1):
-                assert pos.add_fuel("10.00", i, verify=False), f"Failed to add prepay on dispenser {i}"
-                assert pos.pay(verify=False), f"Failed to pay for prepay on dispenser {i}"
+                with self.telemetry.timed("prepay"):
+                    assert pos.add_fuel("10.00", i, verify=False), f"Failed to add prepay on dispenser {i}"
+                    assert pos.pay(verify=False), f"Failed to pay for prepay on dispenser {i}"
         except AssertionError as e:
             pos.click("GO BACK", verify=False)
             raise
@@ -175,24 +184,47 @@ class endurance():
             if not system.wait_for(lambda: "Pay here" in crindsim.get_display_text(num), timeout=60, verify=False):
                 self.log.warning(f"CRIND {num} not idle. Actual prompt: {crindsim.get_display_text(num)}")
                 continue
+            start_time = time.perf_counter()
             crindsim.swipe_card(dispenser=num)
-            if not system.wait_for(lambda: "DEBIT" in crindsim.get_display_text(num), timeout=30, verify=False):
-                self.log.warning(f"Didn't get debit prompt on CRIND {num}. Actual prompt: {crindsim.get_display_text(num)}")
+            if not self.crind_step(num, "debit prompt", "DEBIT", 30):
                 continue
             crindsim.press_softkey("No", dispenser=num)
-            if not system.wait_for(lambda: "Carwash" in crindsim.get_display_text(num), timeout=30, verify=False):
-                self.log.warning(f"Didn't get Carwash prompt on CRIND {num}. Actual prompt: {crindsim.get_display_text(num)}")
+            if not self.crind_step(num, "carwash prompt", "Carwash", 30):
                 continue
             crindsim.press_softkey("No", dispenser=num)
-            if not system.wait_for(lambda: "receipt" in crindsim.get_display_text(num), timeout=60, verify=False):
-                self.log.warning(f"Didn't get receipt prompt on CRIND {num}. Actual prompt: {crindsim.get_display_text(num)}")
+            if not self.crind_step(num, "receipt prompt", "receipt", 60):
                 continue
             crindsim.press_softkey("No", dispenser=num)
-            if not system.wait_for(lambda: "Thank you" in crindsim.get_display_text(num), timeout=120, verify=False):
-                self.log.warning(f"Didn't get transaction complete prompt on CRIND {num}. Actual prompt: {crindsim.get_display_text(num)}")
+            if not self.crind_step(num, "transaction complete prompt", "Thank you", 120):
                 continue
+            self.telemetry.record("crind sale", time.perf_counter() - start_time)
             self.log.info(f"Sale of {fuel_value} completed on CRIND {num}.")
 
+    def crind_step(self, num, name, text, timeout):
+        """Wait for a CRIND prompt, recording how long it took to appear as "crind <name>"."""
+        start_time = time.perf_counter()
+        if not system.wait_for(lambda: text in crindsim.get_display_text(num), timeout=timeout, verify=False):
+            self.telemetry.record(f"crind {name}", time.perf_counter() - start_time, success=False)
+            self.log.warning(f"Didn't get {name} on CRIND {num}. Actual prompt: {crindsim.get_display_text(num)}")
+            return False
+        self.telemetry.record(f"crind {name}", time.perf_counter() - start_time)
+        return True
+
+    def log_telemetry(self):
+        """Roll up today's telemetry and log the latencies and resource growth."""
+        yesterday = (datetime.datetime.now() - datetime.timedelta(days=1)).strftime("%Y%m%d")
+        if os.path.isdir(os.path.join(self.telemetry.directory, yesterday)):
+            self.telemetry.rollup(yesterday) # Finish the summary of the last full day
+        summary = self.telemetry.rollup()
+        for name, stats in summary['latency'].items():
+            self.log.info(f"{name}: {stats['count']} done, p50 {stats['p50']}s, p99 {stats['p99']}s, max {stats['max']}s, "
+                          f"{stats['failures']} failed")
+        for label, measures in summary['resources'].items():
+            memory = measures.get('memory_mb', {})
+            handles = measures.get('handles', {})
+            self.log.info(f"{label}: {memory.get('last')} MB ({memory.get('per_hour')} MB/hour), "
+                          f"{handles.get('last')} handles ({handles.get('per_hour')}/hour)")
+
     def message_check(self):
         """Check for, log, and dismiss any unexpected POS popup messages."""
         msg = pos.read_message_box()
@@ -316,6 +348,10 @@ class endurance():
                 file_list.append(x)
             for item in file_list:
                 my_zip.write(item)
+            self.log.info("Zipping the telemetry summary.")
+            telemetry_summary = os.path.join(self.telemetry.directory, time.strftime("%Y%m%d"), "summary.json")
+            if os.path.isfile(telemetry_summary):
+                my_zip.write(telemetry_summary)
             self.log.info("Zipping the automation event logs.")
             try:
                 my_zip.write("%s\\%s"%(self.log_path, self.log_name))
@@ -543,6 +579,8 @@ class endurance():
         Returns: None
         """
         self.stop_crinds = True
+        self.telemetry.stop()
+        self.telemetry.rollup()
 
         #if not system.restore_snapshot():
         #    self.log.debug("No snapshot to restore, if this is not expected please contact automation team")
\ No newline at end of file
@@ -10,7 +10,8 @@
 """
 
 import logging, time
-from app import Navi, mws, server, system, checkout, console, register_setup
+from app import Navi, mws, system, checkout, console, register_setup
+from app.util import server
 from app.framework.tc_helpers import setup, test, teardown, tc_fail
 
 class express_personality():
@@ -2,12 +2,36 @@ import functools
 import logging, time, json, requests
 import winreg
 from app import pos, system
-from app import constants
+from app.util import constants
 from app import pinpadsim, crindsim
 from app.framework.tc_helpers import tc_fail
+from app.framework.EDH import NetworkMessageTail
 
 logger = logging.getLogger()
 
+def _tail_network_messages():
+    """
+    Start following the primary network's messages, so a transaction's host traffic can be waited on.
+    Returns: NetworkMessageTail, or None if the EDH database can't be reached.
+    """
+    try:
+        return NetworkMessageTail()
+    except Exception as e:
+        logger.warning(f"Unable to follow network messages, falling back to fixed waits: {e}")
+        return None
+
+def _wait_for_host(tail, fallback):
+    """
+    Wait for the host messages of a transaction to finish, instead of sleeping.
+    Args:
+        tail: (NetworkMessageTail) Started before the payment
+        fallback: (int) Seconds to sleep if there is no tail
+    """
+    if tail is None:
+        time.sleep(fallback)
+    else:
+        tail.wait_until_idle(timeout=30)
+
 def pinpad_retry(func):
     """
     Decorator for test methods
@@ -816,6 +840,7 @@ def prepay_sale_func(card_info = ["Visa", "Core"], dispenser_num = 1, money_amou
     pos.enter_keypad(money_amount.replace(".", ""), after="Enter")
 
     logger.info(f"Prepay Name of card about to be swiped: {card_name}")
+    tail = _tail_network_messages()
     if not pos.pay_card(brand=card_group, card_name=card_name):
         logger.warning(f"Pay card failed for card {card_name}")
         system.takescreenshot()
@@ -831,7 +856,7 @@ def prepay_sale_func(card_info = ["Visa", "Core"], dispenser_num = 1, money_amou
         return False
 
     #Allow Transaction to finish before checking receipt
-    time.sleep(5)
+    _wait_for_host(tail, 5)
 
     if not pos.check_receipt_for([f"PUMP# {dispenser_num}", f"${money_amount}"]):
         logger.info(f"Receipt not displaying expected fuel total for the card: {card_name}")
@@ -867,6 +892,7 @@ def overrun_sale_func(card_info = ["Visa", "Core"], dispenser_num = 1, init_mone
     pos.enter_keypad(init_money_amount.replace(".", ""), after="Enter")
 
     logger.info(f"Card being used to pay: {card_name}")
+    tail = _tail_network_messages()
     if not pos.pay_card(brand=card_group, card_name=card_name):
         logger.warning(f"Pay card failed for card {card_name}")
         system.takescreenshot()
@@ -882,7 +908,7 @@ def overrun_sale_func(card_info = ["Visa", "Core"], dispenser_num = 1, init_mone
         return False
 
     #Allow Transaction to finish before checking receipt
-    time.sleep(5)
+    _wait_for_host(tail, 5)
 
     #Find the difference between the overrun amount and initial amount for buffer check
     init_int = int(float(init_money_amount))
@@ -945,6 +971,7 @@ def underrun_sale_func(card_info = ["Visa", "Core"], dispenser_num = 1, init_mon
     pos.enter_keypad(init_money_amount.replace(".", ""), after="Enter")
 
     logger.info(f"Prepay Name of card about to be swiped: {card_name}")
+    tail = _tail_network_messages()
     if not pos.pay_card(brand=card_group, card_name=card_name):
         logger.warning(f"Pay card failed for card {card_name}")
         system.takescreenshot()
@@ -992,7 +1019,7 @@ def underrun_sale_func(card_info = ["Visa", "Core"], dispenser_num = 1, init_mon
         system.takescreenshot()
         return False
 
-    time.sleep(3)
+    _wait_for_host(tail, 3)
 
     if not pos.check_receipt_for([f"PUMP# {dispenser_num}", f"${underrun_money_amount}", f"${init_money_amount}", f"{diff_receipt_str}"]):
         logger.info(f"Receipt not displaying expected fuel total for the card: {card_name}")
@@ -1031,6 +1058,7 @@ def manual_fuel_sale_func(card_info = ["Visa", "Core"], dispenser_num = 1, money
     pos.enter_keypad(money_amount.replace(".", ""), after="Enter")
 
     logger.info(f"Prepay Name of card about to be swiped: {card_name}")
+    tail = _tail_network_messages()
     if not pos.pay_card(brand=card_group, card_name=card_name):
         logger.warning(f"Pay card failed for card {card_name}")
         system.takescreenshot()
@@ -1046,7 +1074,7 @@ def manual_fuel_sale_func(card_info = ["Visa", "Core"], dispenser_num = 1, money
         return False
 
     #Allow Transaction to finish before checking receipt
-    time.sleep(3)
+    _wait_for_host(tail, 3)
 
     if not pos.check_receipt_for([f"PUMP# {dispenser_num}", f"${money_amount}"]):
         logger.info(f"Receipt not displaying expected fuel total for the card: {card_name}")
@@ -1085,6 +1113,7 @@ def manual_fuel_card_based_discount_sale_func(card_info = ["Visa", "Core"], disp
     pos.enter_keypad(money_amount.replace(".", ""), after="Enter")
 
     logger.info(f"Prepay Name of card about to be swiped: {card_name}")
+    tail = _tail_network_messages()
     if not pos.pay_card(brand=card_group, card_name=card_name):
         logger.warning(f"Pay card failed for card {card_name}")
         system.takescreenshot()
@@ -1100,7 +1129,7 @@ def manual_fuel_card_based_discount_sale_func(card_info = ["Visa", "Core"], disp
         return False
 
     #Allow Transaction to finish before checking receipt
-    time.sleep(3)
+    _wait_for_host(tail, 3)
 
     if not pos.check_receipt_for([f"PUMP# {dispenser_num}", f"${money_amount}"], discount_name):
         logger.info(f"Receipt not displaying expected fuel total for the card: {card_name}")
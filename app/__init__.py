@@ -1,12 +1,9 @@
-import winreg
 import importlib
 import app
 import os
 import json
 import logging
 
-from app.util import constants
-
 from app.framework import results
 from app.util import overlay
 from app.util import runas
@@ -16,7 +13,6 @@ from app.framework import pytesseract
 from app.framework import OCR
 from app.framework import mws
 from app.util import feature_activate
-from app.util import server
 
 from app.simulators import pinpadsim
 from app.simulators import networksim
@@ -24,7 +20,7 @@ from app.simulators import crindsim
 from app.simulators import unitecsim
 
 # Create pinpad simulator.
-simulator_ips = server.server.get_site_info()
+simulator_ips = system.profile().simulator_ips
 pinpad = pinpadsim.init_pinpadsim()
 crindsim = crindsim.CrindSim(endpoint=f"http://{simulator_ips['ip']}/")
 unitecsim = unitecsim.init_unitecsim()
@@ -32,15 +28,7 @@ unitecsim = unitecsim.init_unitecsim()
 networksim = networksim.init_networksim()
 
 #Importing pos based on the system config
-pp_subkey = constants.NT_SUBKEY
-reg_key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, pp_subkey, 0, winreg.KEY_ALL_ACCESS)
-html_key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, constants.CSOFT_PP_SUBKEY, 0, winreg.KEY_ALL_ACCESS)
-
-Site_Type = "Classic"
-if (winreg.QueryValueEx(reg_key, 'Machine')[0] == "PS65"):
-    Site_Type = "Edge"
-elif ('htmlpos' in winreg.QueryValueEx(html_key, 'POSPathName')[0]):
-    Site_Type = "HTMLPos"
+Site_Type = system.profile().site_type
 
 if Site_Type == "Edge":
     from app.framework import edge as pos
@@ -1,4 +1,5 @@
 from app.framework import mws, Navi
+from app import pos
 import logging, pywinauto
 from app.framework import OCR
 
@@ -363,6 +364,7 @@ class SpeedKeyMaintenance(KeyMaintenance):
             mws.click_toolbar("No", submenu=True)
             return False
 
+        pos.invalidate_key_index() # The POS key pages change
         return mws.click_toolbar("Save", submenu=True)
 
     def add(self, *args, menu_id=None, **kwargs):
@@ -421,6 +423,7 @@ class SpeedKeyMaintenance(KeyMaintenance):
         mws.click_toolbar("Add")
         if not mws.set_value("Key Menu Description", description):
             return False
+        pos.invalidate_key_index() # The POS key pages change
         return mws.click_toolbar("Save")
 
     def change_menu(self, description):
@@ -501,6 +504,7 @@ class DepartmentKeyMaintenance(KeyMaintenance):
             mws.click_toolbar("No", main=True)
             return False
 
+        pos.invalidate_key_index() # The POS key pages change
         return mws.click_toolbar("Save", main=True)
 
 class CouponKeyMaintenance(KeyMaintenance):
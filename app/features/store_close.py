@@ -92,10 +92,7 @@ class StoreClose:
         # Check for the process that connects to registers and closes networks
         # Create timeout
         start_time = time.time()
-        while time.time() - start_time <= timeout:
-            if system.process_wait("STOREC~1.exe", timeout=1):
-                break
-        else:
+        if not system.process_wait("STOREC~1.exe", timeout=timeout):
             # Terminate process and recover
             self.log.warning(f"Terminating process \'{self.STORECLOSE_PROC}\' after a timeout and performing recovery")
             os.system(f"taskkill /f /im {self.STORECLOSE_PROC}")
@@ -104,11 +101,7 @@ class StoreClose:
             return None
         
         # Wait for register and network communication to finish
-        # Create timeout
-        while time.time() - start_time <= timeout:
-            if not system.process_wait("STOREC~1.exe", timeout=1):
-                break
-        else:
+        if not system.process_wait_exit("STOREC~1.exe", timeout=max(timeout - (time.time() - start_time), 0)):
             # Terminate process and recover
             self.log.warning(f"Terminating process \'{self.STORECLOSE_PROC}\' after a timeout and performing recovery")
             os.system(f"taskkill /f /im {self.STORECLOSE_PROC}")
@@ -117,10 +110,7 @@ class StoreClose:
             return None
 
         # Wait for report engine
-        while time.time() - start_time <= timeout:
-            if not system.process_wait("reportengine.exe", timeout=1):
-                break
-        else:
+        if not system.process_wait_exit("reportengine.exe", timeout=max(timeout - (time.time() - start_time), 0)):
             self.log.error(f"Exceeded timout for waiting for Store Close process (reportengine.exe) to start")
             # Terminate process and recover
             self.log.warning(f"Terminating process \'{self.STORECLOSE_PROC}\' after a timeout and performing recovery")
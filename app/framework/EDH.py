@@ -8,15 +8,12 @@ Date Modified:
 """
 
 
-import json, logging
-
-import requests
+import collections, json, logging, time
 
 from app import runas
 from app import system
-from app.util import constants
+from app.util import constants, db, translator, waits
 from app.framework.tc_helpers import test_func
-from requests.auth import HTTPBasicAuth
 
 class EDH:
 
@@ -134,17 +131,15 @@ class EDH:
             'True'
         """
 
-        ret = False
-        if stype.lower() == "local":
-            # Do the thing
-            if runas.run_sqlcmd("Update SMIStatus set OptionValue = '1' where OptionID = '0'", database="network", cmdshell=False):
-                    ret = True
-        else:
-            # Do another thing
-            if runas.run_sqlcmd("insert into EncryptionConfig (configid, value) values(6,1)", database="network", cmdshell=False):
-                    ret = True
-
-        return ret
+        try:
+            if stype.lower() == "local":
+                # Do the thing
+                return db.get().execute("Update SMIStatus set OptionValue = ? where OptionID = ?", '1', '0') > 0
+            else:
+                # Do another thing
+                return db.get().execute("insert into EncryptionConfig (configid, value) values(?, ?)", 6, 1) > 0
+        except db.DatabaseError:
+            return False
 
     def get_network_messages(self, amount, pspid=None, start_in=0, order_by="desc" ):
         """
@@ -157,7 +152,7 @@ class EDH:
             order_by (str): this is the orderby of the query
 
         Returns:
-            List: List of messages returned by the EDH
+            List: The NetworkMessage text of each message returned by the EDH
 
         Examples:
             >>> edh.getNetworkmessages(10) will return a list of the last 10 messages in the table
@@ -171,12 +166,13 @@ class EDH:
         #convert the number to int just in case we get a string
         start_in = int(start_in)
 
+        if order_by.lower() not in ("asc", "desc"):
+            raise ValueError(f"order_by must be asc or desc, not {order_by}")
+
         #we order by 1 desc to get the last messages and filter for PSPis to avoid Loyalty or another network logging in the middle
-        query = f"select top ({amount}) * from networkmessages where NetworkPSPid = '{pspid}' and NetworkMessageId > {start_in} order by 1 {order_by}"
-        output = runas.run_sqlcmd(query, database="network", cmdshell=False)['output']
-        
-        # Turning string into list of strings that have \n delimitation
-        output_list = output.split("\n")
+        query = f"select * from networkmessages where NetworkPSPid = ? and NetworkMessageId > ? order by 1 {order_by}"
+        rows = db.get().query(query, str(pspid), start_in, limit=int(amount))
+        output_list = [row.NetworkMessage for row in rows if row.NetworkMessage]
 
         if pspid == "23":
 
@@ -237,18 +233,16 @@ class EDH:
         if pspid is None:
             pspid = self.PSPId
 
-        query = f"select top 1 NetworkMessageId from NetworkMessages where NetworkPSPid = '{pspid}' order by 1 desc"
-        output = runas.run_sqlcmd(query, database="network", cmdshell=False)['output']
-        
-        # Turning string into list of strings that have \n delimitation
-        output_list = output.split("\n")
+        query = "select max(NetworkMessageId) from NetworkMessages where NetworkPSPid = ?"
+        last_id = db.get().scalar(query, str(pspid))
 
-        #the first 2 lines are not important
-        return output_list[2].strip()
+        # No messages yet, so every message is newer than 0
+        return str(last_id) if last_id is not None else '0'
 
     def translate_message(self, message, timeout=30):
         """
-        Sends the message to the the parser API to get it a readable way (JSON)
+        Sends the message to the the parser API to get it a readable way (JSON).
+        Translations are cached, so a message that was already translated isn't sent again.
         
         Args:
 
@@ -256,53 +250,42 @@ class EDH:
 
         Returns:
 
-            Dictionary: the message in a readable way
+            Dictionary: the message in a readable way, or False if it could not be parsed
 
         Examples:
 
             >>> edh.translate_message(messages)
         """
-        
-        
-        self.log.debug(f"{message} was sent to {constants.PARSER_API}")
-            
-        try:
-            #Send the message to the API
-            post_request = requests.post(
-                    constants.PARSER_API,
-                    data=message,
-                    timeout=timeout
-                )
-
-            self.log.debug(f"{post_request.text} was returned from {constants.PARSER_API}")
-       
-        except requests.exceptions.ConnectionError as e:
+        return translator.get().translate(message, timeout)
 
-            self.log.error(f"Failed attempting to do a get request to: {constants.PARSER_API}, please check it the parser is working")
-            self.log.error(e)
-            return False
+    def translate_messages(self, messages, timeout=30):
+        """
+        Translates several messages with as few requests to the parser API as possible
 
+        Args:
 
-        #Check if the API was able to parse the message
-            
-        if post_request.status_code == 200:
+            messages (list): the messages that we want to parse
 
-            return json.loads(post_request.text)
+        Returns:
 
-        else:
+            List: the messages in a readable way, in the same order. False for any that could not be parsed
 
-            self.log.error(f"Error was returned from {constants.PARSER_API} status code {post_request.status_code}")                
-            return False
+        Examples:
+
+            >>> edh.translate_messages(edh.get_network_messages(4, start_in=last_msg))
+        """
+        return translator.get().translate_many(messages, timeout)
     
     @test_func
     def verify_field(self, message, verifications):
         """
-        Verify that message obtined from the EDH contains the expected values on the specified fields
+        Verify that message obtined from the EDH contains the expected values on the specified fields.
+        A whole transaction can be checked at once by passing lists, raw messages are then translated in one batch
         
         Args:
 
-            message (dictionary): The message in a JSON format
-            verification (tuple): List of field: expected value
+            message (dictionary): The message in a JSON format, or a list of messages (translated or raw)
+            verification (tuple): List of field: expected value, or a list of them, one per message
 
         Returns:
 
@@ -312,7 +295,34 @@ class EDH:
 
             >>> edh.verify_field(message, {NonFuel Amount': '10000'})
             >>> edh.verify_field(message, {'Prod 4 product Code': {'present': False, 'value': '032'}})
+            >>> edh.verify_field(messages[:2], [preauth_request_verifications, preauth_response_verifications])
         """
+        if type(message) is list:
+
+            if len(message) != len(verifications):
+
+                self.log.error(f"Got {len(message)} messages to verify but {len(verifications)} sets of verifications")
+
+                return False
+
+            raw = [msg for msg in message if type(msg) is str]
+            translated = iter(self.translate_messages(raw))
+            messages = [next(translated) if type(msg) is str else msg for msg in message]
+
+            # Check every message, so all the mismatches are logged
+            results = []
+            for num, (msg, checks) in enumerate(zip(messages, verifications)):
+                if not msg:
+                    self.log.error(f"Unable to translate message #{num}, cannot verify it")
+                    results.append(False)
+                else:
+                    results.append(self._verify_message(msg, checks))
+
+            return all(results)
+
+        return self._verify_message(message, verifications)
+
+    def _verify_message(self, message, verifications):
         
         result = False
         
@@ -424,22 +434,28 @@ class EDH:
         elif enableSSL == 'Yes':
             enableSSL = '1'
 
-        # Update connection parmeters
-        output = runas.run_sqlcmd(  "update RBS_ConnectionInfo set "
-                                    "PrimaryIPAddress = '%s', "
-                                    "primaryIPPort = '%s', "
-                                    "SecondaryIPAddress = '%s', "
-                                    "SecondaryIPPort = '%s', "
-                                    "URLAndIPPort = '%s', "
-                                    "EnableSSL = %s" %(primaryIPAddress, primaryIPPort,
-                                                    secondaryIPAddress, secondaryIPPort,
-                                                    URLAndIPPort, enableSSL
-                                    ), cmdshell=False
-                                )
-
-        if "1 rows affected" not in output['output']:
+        TID = self.network_json[self.brand]['Site Configuration']['Page 1']['Terminal Id']
+
+        # Update connection parmeters and Site Info together
+        try:
+            counts = db.get().batch([
+                ("update RBS_ConnectionInfo set "
+                 "PrimaryIPAddress = ?, "
+                 "primaryIPPort = ?, "
+                 "SecondaryIPAddress = ?, "
+                 "SecondaryIPPort = ?, "
+                 "URLAndIPPort = ?, "
+                 "EnableSSL = ?", (primaryIPAddress, primaryIPPort,
+                                   secondaryIPAddress, secondaryIPPort,
+                                   URLAndIPPort, int(enableSSL))),
+                ("update RBS_GlobalInfo set TID = ?", (TID,))
+            ])
+        except db.DatabaseError:
+            return False
+
+        if counts[0] != 1:
         
-            self.log.error("Update connection parameters failed: %s" %(output['output']))
+            self.log.error("Update connection parameters failed: %s rows affected" %(counts[0]))
             
             return False
         
@@ -447,17 +463,9 @@ class EDH:
 
             self.log.debug('RBS_ConnectionInfo correctly updated')
 
-        # Update Site Info
-
-        TID = enableSSL = self.network_json[self.brand]['Site Configuration']['Page 1']['Terminal Id']
+        if counts[1] != 1:
 
-        output = runas.run_sqlcmd(  "update RBS_GlobalInfo set "
-                                    "TID = '%s'" %(TID), cmdshell=False
-                                )
-
-        if "1 rows affected" not in output['output']:
-
-            self.log.error("Update Site Info failed: %s" %(output['output']))
+            self.log.error("Update Site Info failed: %s rows affected" %(counts[1]))
 
             return False
 
@@ -489,15 +497,14 @@ class EDH:
             self.log.error("Configuration values not found: %s" %(e))
         
         # Update connection parmeters
-        output = runas.run_sqlcmd(  "update ConnectionInfo set "
-                                    "IPAddress = '%s', "
-                                    "IPPort = '%s' " %(IPAddress, IPPort
-                                    ), cmdshell=False
-                                )
+        try:
+            count = db.get().execute("update ConnectionInfo set IPAddress = ?, IPPort = ?", IPAddress, IPPort)
+        except db.DatabaseError:
+            return False
 
-        if "2 rows affected" not in output['output']:
+        if count != 2:
         
-            self.log.error("Update connection parameters failed: %s" %(output['output']))
+            self.log.error("Update connection parameters failed: %s rows affected" %(count))
             
             return False
         
@@ -531,6 +538,140 @@ class EDH:
         # Will add support for other networks when initialization be included
 
         return runas.run_sqlcmd('taskkill /im %s /F' %(processName),domain="passporteps")
-        
 
+TailMessage = collections.namedtuple('TailMessage', ['id', 'text'])
+
+class NetworkMessageTail:
+    """
+    Follows the NetworkMessages table for one PSP. Only rows newer than the last one
+    seen are fetched, and each message is translated at most once.
+    Examples:
+        >>> tail = NetworkMessageTail()
+        >>> pos.pay_card(card_name="Visa")
+        >>> tail.wait_for({'Transaction Type': '01'}, timeout=30)
+        {'Transaction Type': {'value': '01', ...}, ...}
+    """
+    def __init__(self, edh=None, pspid=None, start_in=None):
+        """
+        Args:
+            edh: (EDH) Used to translate messages. Defaults to a new EDH
+            pspid: (str) The PSP to follow. Defaults to the primary network
+            start_in: (str) Message id to start after. Defaults to the newest message, so only
+                      messages logged from now on are seen
+        """
+        self.edh = edh or EDH()
+        self.pspid = str(pspid or self.edh.PSPId)
+        self.last_id = int(self.edh.get_last_msg_id(self.pspid) if start_in is None else start_in)
+        self.messages = []
 
+    def poll(self):
+        """
+        Fetch the messages logged since the last poll.
+        Returns:
+            list: TailMessages (id, text) that are new, oldest first
+        """
+        rows = db.get().query("select NetworkMessageId, NetworkMessage from NetworkMessages "
+                              "where NetworkPSPid = ? and NetworkMessageId > ? order by 1 asc",
+                              self.pspid, self.last_id)
+        new = []
+        for row in rows:
+            self.last_id = max(self.last_id, int(row.NetworkMessageId))
+            if self._is_message(row.NetworkMessage):
+                new.append(TailMessage(int(row.NetworkMessageId), row.NetworkMessage.strip()))
+        self.messages.extend(new)
+        return new
+
+    def mark(self):
+        """Forget the messages seen so far and only look at ones logged from now on."""
+        self.poll()
+        self.messages = []
+
+    def translate(self, message):
+        """
+        Translate a message through the parser API, or from the cache if it's been translated before.
+        Args:
+            message: (TailMessage/str) The message
+        Returns:
+            dict: The translated message, or False if the parser couldn't translate it
+        """
+        return self.edh.translate_message(message.text if isinstance(message, TailMessage) else message)
+
+    def wait_for(self, fields=None, timeout=60, count=1):
+        """
+        Wait for messages whose fields match. New messages are translated together, as they arrive.
+        Args:
+            fields: (dict) Field mapped to its expected value, as for EDH.verify_field. The expected
+                    value can also be a function that takes the field's value and returns a bool.
+                    None matches any message the parser can translate
+            timeout: (int) Seconds to wait
+            count: (int) How many matching messages to wait for
+        Returns:
+            dict/list: The first matching translated message, or a list of them if count is more than 1.
+                       None (or a shorter list) if they didn't arrive in time
+        Examples:
+            >>> tail.wait_for({'Message Type': '0100', 'Amount': lambda amount: int(amount) > 0})
+            {'Message Type': {'value': '0100'}, 'Amount': {'value': '500'}, ...}
+        """
+        matches = []
+        checked = 0
+        def found():
+            nonlocal checked
+            self.poll()
+            new = self.messages[checked:]
+            checked = len(self.messages)
+            if new:
+                translated = self.edh.translate_messages([message.text for message in new])
+                matches.extend(message for message in translated
+                               if message and (fields is None or self._matches(message, fields)))
+            return len(matches) >= count
+
+        if not waits.poll(found, timeout, max_wait=0.5, exceptions=(db.DatabaseError,), name="NetworkMessageTail.wait_for"):
+            self.edh.log.warning(f"Found {len(matches)} of {count} network messages matching {fields} after {timeout} seconds")
+        if count == 1:
+            return matches[0] if matches else None
+        return matches[:count]
+
+    def wait_until_idle(self, idle=1.0, timeout=60):
+        """
+        Wait until a message has been logged and no more have been for a while, i.e. the
+        host conversation for a transaction is over.
+        Args:
+            idle: (float) Seconds without a new message that count as finished
+            timeout: (int) Seconds to wait in all
+        Returns:
+            list: The TailMessages seen, or None if messages were still coming (or never came) at the timeout
+        """
+        end = waits.deadline(timeout)
+        quiet_since = time.monotonic()
+        def settled():
+            nonlocal quiet_since
+            if self.poll():
+                quiet_since = time.monotonic()
+            return bool(self.messages) and time.monotonic() - quiet_since >= idle
+
+        if not waits.poll(settled, end, max_wait=idle / 2, exceptions=(db.DatabaseError,), name="NetworkMessageTail.wait_until_idle"):
+            self.edh.log.warning(f"Network messages for PSP {self.pspid} didn't settle within {timeout} seconds")
+            return None
+        return self.messages
+
+    def _is_message(self, text):
+        # Concord logs rows that are not real messages, those have no "> ["
+        if not text:
+            return False
+        return self.pspid != "23" or "> [" in text
+
+    def _matches(self, message, fields):
+        for field, expected in fields.items():
+            if type(expected) is dict and not expected['present']:
+                if field in message:
+                    return False
+                continue
+            if type(expected) is dict:
+                expected = expected['value']
+            try:
+                value = message[field]['value']
+            except (KeyError, TypeError):
+                return False
+            if not (expected(value) if callable(expected) else value == expected):
+                return False
+        return True
@@ -1,13 +1,11 @@
 __author__ = "Cassidy Garner"
 #required modules
-import time, logging, json
+import time, logging
 from pywinauto import Application
 
 # In-House Modules
 from app import mws, OCR, pos, system, Site_Type
 
-JSON_DATA_PATH = "D:/Automation/app/data/controls.json"
-
 log = logging.getLogger()
 
 def navigate_to(end):
@@ -36,28 +34,13 @@ def navigate_to(end):
     else:
         get_to_mws()
 
-    # Load the current process. 
-    # NOTE: Duplicates logic from mws.load_controls - clean this up at some point
+    # Load the current process.
     try:
-        data = json.load(open(JSON_DATA_PATH))
-        data = data[str(end).lower()]
+        _, data = mws.resolve_menu(str(end).lower())
     except FileNotFoundError:
         raise NaviException(f"Couldn't load controls file.")
-    except KeyError:
-        raise NaviException(f"Couldn't find {end} in controls file.")
-    try:
-        network = data['network']
-    except KeyError:
-        network = False
-    if network:
-        log.debug("Loading controls for network menu")
-        brand = system.get_brand()
-        for key in data.keys():
-            if brand.upper() in key.upper():
-                try:
-                    data = data[key]
-                except KeyError:
-                    raise NaviException(f"Failed to find the brand network controls for {brand}")
+    except mws.MWSMapException as e:
+        raise NaviException(f"Couldn't find {end} in controls file: {e.message}")
     try:   
         process = str(data['process'])
     except KeyError:
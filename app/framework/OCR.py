@@ -11,12 +11,21 @@ __author__ = 'Cassidy Garner'
 
 from PIL import Image, ImageGrab, ImageOps, ImageFilter
 from app import pytesseract
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from threading import Lock
 from time import sleep, time
+import hashlib
 import logging
 import pywinauto
 import sys
 import math
 import inspect
+from pkgutil import find_loader
+
+numpy_installed = find_loader('numpy') is not None
+if numpy_installed:
+    import numpy
 
 #############
 # Constants #
@@ -53,9 +62,25 @@ save_img = None
 show_img = False
 screenshot_workaround = True
 
+# PSM settings. When parallel_psm is set, every requested PSM is run at the same
+# time against a single capture and the first acceptable result wins. Each worker
+# drives its own tesseract process. Set it to False to try the PSMs one by one.
+parallel_psm = True
+max_psm_workers = 4
+_psm_pool = None
+
 cache = []
 cache_attempt = False
 max_cache_size = 25
+
+# Tesseract output cache, keyed by a hash of the processed image and the PSM.
+# Reading a part of the screen that hasn't changed since the last read skips
+# Tesseract entirely. Least recently used entries are dropped first.
+result_cache = OrderedDict()
+max_result_cache_size = 256
+result_cache_hits = 0
+result_cache_misses = 0
+_result_cache_lock = Lock()
 #############
 # Functions #
 #############
@@ -128,15 +153,17 @@ def searchAndClick(searchText, color='000000', bbox=None,
     # Try to find + click text until timeout
     startTime = time()
     while time() - startTime <= timeout:
-        for mode in psm:
+        # Take one screenshot per attempt and share it between all PSMs
+        img = grabScreen(bbox)
+        if img is None:
+            continue
+        img = processImage(img, color, tolerance)
+        attempt = lambda mode, img=img: imageTextCoords(img, searchText, bbox=bbox,
+                                                        psm=mode, maxDist=maxDist,
+                                                        coord_location=click_location,
+                                                        filter_strings=filter_strings)
+        for mode, (coords, dist, result, bboxes) in runPSMs(attempt, psm):
             log.debug('With PSM %s:' % mode)
-            # Use OCR to find coords of text
-            coords, dist, result, bboxes = getTextCoords(searchText=searchText,
-                                                         color=color,
-                                                         tolerance=tolerance,bbox=bbox,
-                                                         psm=mode, maxDist=maxDist,
-                                                         coord_location=click_location,
-                                                         filter_strings=filter_strings)
 
             # Record new best result for later logging
             if dist < bestDist:
@@ -199,7 +226,7 @@ def searchAndClick(searchText, color='000000', bbox=None,
             if maxDist > 0:
                 msg = ('Did not find any strings within distance %s of the '
                       'search string %s. Minimum distance found was %s'
-                      % (maxDist, searchText, dist))
+                      % (maxDist, searchText, bestDist))
             else:
                 msg = 'Did not find %s' % searchText
             log.warning('%s. Closest OCR result (using page seg mode %s): \n%s'
@@ -246,10 +273,13 @@ def findText(searchText, color='000000', bbox=None, tolerance='000000',
     bestResult = ''
     missingStrings = []
     while time() - startTime <= timeout:
-        for mode in psm:
+        # Take one screenshot per attempt and share it between all PSMs
+        img = grabScreen(bbox)
+        if img is None:
+            continue
+        img = processImage(img, color, tolerance)
+        for mode, tessOut in runPSMs(lambda mode, img=img: imageToString(img, mode), psm):
             log.debug('With PSM %s:' % mode)
-            # Use OCR to read the screen
-            tessOut = OCRRead(bbox, color, tolerance, mode)
             tessOutNoBreak = tessOut.replace('\n', ' ')
             tessOutNoWhtsp = tessOutNoBreak.replace(' ', '')
 
@@ -261,7 +291,7 @@ def findText(searchText, color='000000', bbox=None, tolerance='000000',
                 for string in filter_strings: # Remove filtered strings
                     string = string.replace('\n', '').replace(' ', '')
                     searchTextNoWhtsp = searchTextNoWhtsp.replace(string, '')
-                matches, dist = closestMatch(tessOutNoWhtsp, searchTextNoWhtsp)
+                matches, dist = closestMatch(tessOutNoWhtsp, searchTextNoWhtsp, maxDist)
                 totalDist += dist
 
                 if dist <= maxDist:
@@ -326,6 +356,23 @@ def OCRRead(bbox=None, color='000000', tolerance='000000', psm=12):
         >String: the text found by Tesseract.
     @throws:
     """
+    img = grabScreen(bbox)
+    if img is None:
+        return None
+    img = processImage(img, color, tolerance)
+    return imageToString(img, psm)
+
+def grabScreen(bbox=None):
+    """
+    @Creator: Cassidy Garner
+    @Name: grabScreen
+    @Description: Capture the screen (or part of it) for OCR.
+    @params:
+        >bbox (list,tuple:None) The bounding box to crop the capture to.
+    @return:
+        >PIL.Image: the captured image, or None if the capture failed.
+    @throws:
+    """
     # ImageGrab can't see the WPF GUI, use print screen instead
     if screenshot_workaround:
         #NOTE: If this fails we may need to retry the print screen function
@@ -340,11 +387,109 @@ def OCRRead(bbox=None, color='000000', tolerance='000000', psm=12):
             log.error("Failed to generate a failure screenshot within timeout")
             return None
         if bbox is not None:
-            img = img.crop(bbox)     
+            img = img.crop(bbox)
     else:
         img = ImageGrab.grab(bbox)
-    img = processImage(img, color, tolerance)
-    return pytesseract.image_to_string(img, None, f"--psm {psm} --tessdata-dir '{tessdata_dir}'")
+    return img
+
+def imageToString(img, psm=12):
+    """
+    @Creator: Cassidy Garner
+    @Name: imageToString
+    @Description: Run Tesseract on an image that has already been processed.
+    @params:
+        >img (PIL.Image): the output of processImage.
+        >psm: (int:12) The page segmentation mode to use.
+    @return:
+        >String: the text found by Tesseract.
+    @throws:
+    """
+    return runTesseract(img, psm)
+
+def runTesseract(img, psm=12, boxes=False):
+    """
+    @Creator: Cassidy Garner
+    @Name: runTesseract
+    @Description: Run Tesseract on a processed image, or return the cached
+                  output if the same image was already read with this PSM.
+    @params:
+        >img (PIL.Image): the output of processImage.
+        >psm: (int:12) The page segmentation mode to use.
+        >boxes (bool:False): Return character boxes (image_to_boxes) instead
+                of plain text (image_to_string).
+    @return:
+        >String: the Tesseract output.
+    @throws:
+    """
+    global result_cache_hits, result_cache_misses
+    key = (boxes, psm, img.mode, img.size,
+           hashlib.blake2b(img.tobytes(), digest_size=16).digest())
+    with _result_cache_lock:
+        if key in result_cache:
+            result_cache.move_to_end(key)
+            result_cache_hits += 1
+            return result_cache[key]
+        result_cache_misses += 1
+
+    config = f"--psm {psm} --tessdata-dir '{tessdata_dir}'"
+    if boxes:
+        output = pytesseract.image_to_boxes(img, None, config)
+    else:
+        output = pytesseract.image_to_string(img, None, config)
+
+    with _result_cache_lock:
+        result_cache[key] = output
+        while len(result_cache) > max_result_cache_size:
+            result_cache.popitem(last=False)
+    return output
+
+def cacheStats():
+    """
+    @Creator: Cassidy Garner
+    @Name: cacheStats
+    @Description: Report how well the Tesseract output cache is doing.
+    @params:
+    @return:
+        >dict: hits, misses and the number of cached results.
+    @throws:
+    """
+    with _result_cache_lock:
+        return {'hits': result_cache_hits, 'misses': result_cache_misses,
+                'size': len(result_cache)}
+
+def runPSMs(func, psm):
+    """
+    @Creator: Cassidy Garner
+    @Name: runPSMs
+    @Description: Run an OCR function once per page segmentation mode.
+                  If parallel_psm is set, all modes run at the same time and
+                  results are yielded as they finish. Otherwise they run one
+                  after another in the order given. Modes that haven't started
+                  yet are cancelled once the caller stops iterating.
+    @params:
+        >func (function): Takes a PSM and returns the OCR result for it.
+        >psm (int,list): The page segmentation mode(s) to run.
+    @return:
+        >generator: (psm, result) tuples.
+    @throws:
+    """
+    global _psm_pool
+    if isinstance(psm, int):
+        psm = [psm]
+    if not parallel_psm or len(psm) < 2:
+        for mode in psm:
+            yield mode, func(mode)
+        return
+
+    if _psm_pool is None:
+        _psm_pool = ThreadPoolExecutor(max_workers=max_psm_workers)
+    futures = {_psm_pool.submit(func, mode): mode for mode in psm}
+    try:
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        for future in futures:
+            future.cancel()
 
 def getTextCoords(searchText, bbox=None, color='000000', tolerance='000000',
                   psm=12, maxDist=0, coord_location=0, filter_strings=[]):
@@ -373,30 +518,42 @@ def getTextCoords(searchText, bbox=None, color='000000', tolerance='000000',
                 possible dist will be returned), and the raw OCR result.
     @throws:
     """
+    img = grabScreen(bbox)
+    if img is None:
+        return None
+    img = processImage(img, color, tolerance)
+    return imageTextCoords(img, searchText, bbox, psm, maxDist, coord_location,
+                           filter_strings)
+
+def imageTextCoords(img, searchText, bbox=None, psm=12, maxDist=0,
+                    coord_location=0, filter_strings=[]):
+    """
+    @Creator: Cassidy Garner
+    @Name: imageTextCoords
+    @Description: Locate a string in an image that has already been captured
+                  and processed. See getTextCoords.
+    @params:
+        >img (PIL.Image): the output of processImage.
+        >searchText (String): The text to search for.
+        >bbox (int list,tuple:None): The bounding box the image was captured
+               from. Used to offset the coordinates.
+        >psm (int:12): The page segmentation mode to use.
+        >maxDist (int:0): The maximum Levenshtein distance between the result
+                  and the search text to consider a match.
+        >coord_location (int:0): which part of the string to return coords for.
+                         0 for center, -1 for left end, 1 for right end
+        >filter_strings (list,str:[]): Strings to remove from OCR output before
+                         searching it.
+    @return:
+        >tuple: Same as getTextCoords.
+    @throws:
+    """
     if type(filter_strings) == str:
         filter_strings = [filter_strings]
-    
+
     searchText = searchText.replace(' ', '')
-    # ImageGrab can't see the WPF GUI, use print screen instead
-    if screenshot_workaround:
-        #NOTE: If this fails we may need to retry the print screen function
-        pywinauto.keyboard.send_keys('{PRTSC}')
-        #Timeout loop waiting for the clipboard to load
-        starttime = time()
-        while time() - starttime <= 30:
-            img = ImageGrab.grabclipboard()
-            if img != None:
-                break
-        else:
-            log.error("Failed to generate a failure screenshot within timeout")
-            return None
-        if bbox is not None:
-            img = img.crop(bbox)   
-    else:
-        img = ImageGrab.grab(bbox)
-    img = processImage(img, color, tolerance)
     # Pass image to Tesseract which does the heavy lifting for us
-    tesseractOut = pytesseract.image_to_boxes(img, None, f"--psm {psm} --tessdata-dir '{tessdata_dir}'")
+    tesseractOut = runTesseract(img, psm, boxes=True)
     if tesseractOut == '':
         log.debug('Did not find any text!')
         return [[-1, -1]], float('inf'), '', []
@@ -416,7 +573,7 @@ def getTextCoords(searchText, bbox=None, color='000000', tolerance='000000',
     result = textFound
     
     # Find matching text
-    matches, dist = closestMatch(textFound, searchText)
+    matches, dist = closestMatch(textFound, searchText, maxDist)
     numMatches = len(matches)
     if dist > maxDist or numMatches == 0:
         return [[-1, -1]], dist, result, []
@@ -474,6 +631,57 @@ def getTextCoords(searchText, bbox=None, color='000000', tolerance='000000',
 
     return coords, dist, result, bboxes
 
+def imageTextLines(img, bbox=None, psm=PSM_UNIFORMTEXTBLOCK, lineGap=6):
+    """
+    @Creator: Cassidy Garner
+    @Name: imageTextLines
+    @Description: Read every line of text in an image that has already been
+                  captured and processed, in one Tesseract run. Characters are
+                  grouped into lines by the vertical center of their boxes.
+    @params:
+        >img (PIL.Image): the output of processImage.
+        >bbox (int list,tuple:None): The bounding box the image was captured
+               from. Used to offset the coordinates.
+        >psm (int:6): The page segmentation mode to use.
+        >lineGap (int:6): Characters whose centers are more than this many
+                  screen pixels below the previous one start a new line.
+    @return:
+        >list: A (text, left, y) tuple per line, top to bottom. text has no
+               spaces, left is the left edge of its first character and y is
+               the vertical center of the line, in screen coordinates.
+    @throws:
+    """
+    tesseractOut = runTesseract(img, psm, boxes=True)
+    y_size = img.size[1]/scaleFactor[1]
+    chars = []
+    for box in tesseractOut.split('\n'):
+        fields = box.split()
+        if len(fields) < 5 or not fields[0].strip():
+            continue
+        left, bottom, right, top = [int(n) for n in fields[1:5]]
+        y = y_size - (bottom+top)/(2*scaleFactor[1])
+        chars.append((y, left/scaleFactor[0], fields[0]))
+    chars.sort()
+
+    lines = []
+    current = []
+    for char in chars:
+        if current and char[0] - current[-1][0] > lineGap:
+            lines.append(current)
+            current = []
+        current.append(char)
+    if current:
+        lines.append(current)
+
+    x_offset, y_offset = (bbox[0], bbox[1]) if bbox is not None else (0, 0)
+    result = []
+    for line in lines:
+        line.sort(key=lambda char: char[1])
+        text = ''.join(char[2] for char in line)
+        y = sum(char[0] for char in line)/len(line)
+        result.append((text, int(line[0][1]) + x_offset, int(round(y)) + y_offset))
+    return result
+
 def processImage(img, color='000000', tolerance='000000'):
     """
     @Creator: Cassidy Garner
@@ -488,6 +696,42 @@ def processImage(img, color='000000', tolerance='000000'):
         >PIL.Image: the filtered image
     @throws:
     """
+    if isinstance(color, str):
+        color = [color]
+    # PIL's point() is quicker for a single color (see tests/bench_color_mask.py),
+    # and colorMask has one bit per color in its lookup tables
+    if numpy_installed and 1 < len(color) <= 64:
+        mergedImg = colorMask(img, color, tolerance)
+    else:
+        mergedImg = bandMask(img, color, tolerance)
+
+    # Upscale and filter the image to make it easier to read
+    newSize = (img.size[0]*scaleFactor[0], img.size[1]*scaleFactor[1])
+    finalImg = mergedImg.resize(newSize, resize_filter)
+    for img_filter in img_filters:
+        finalImg = finalImg.filter(img_filter)
+    finalImg.convert('L')
+    if save_img is not None:
+        finalImg.save(save_img)
+    if show_img:
+        finalImg.show()
+    return finalImg
+
+def bandMask(img, color='000000', tolerance='000000'):
+    """
+    @Creator: Cassidy Garner
+    @Name: bandMask
+    @Description: Build the black-on-white text mask used by processImage with
+                  PIL alone, filtering each band once per color.
+    @params:
+        >img (PIL.Image): the RGB(A) image to filter
+        >color (String,list:'000000') the RGB color(s) to filter for
+        >tolerance (String:'000000') the amount of variance to accept in the
+                    color
+    @return:
+        >PIL.Image: 'L' mode image, black where any color matched, else white
+    @throws:
+    """
     if isinstance(color, str):
         color = [color]
     source = img.split()
@@ -517,28 +761,61 @@ def processImage(img, color='000000', tolerance='000000'):
     mergedImg = images.pop()
     for image in images:
         mergedImg = Image.composite(mergedImg, image, image)
-        
-    # Upscale and filter the image to make it easier to read
-    newSize = (img.size[0]*scaleFactor[0], img.size[1]*scaleFactor[1])
-    finalImg = mergedImg.resize(newSize, resize_filter)
-    for img_filter in img_filters:
-        finalImg = finalImg.filter(img_filter)
-    finalImg.convert('L')
-    if save_img is not None:
-        finalImg.save(save_img)
-    if show_img:
-        finalImg.show()
-    return finalImg
+    return mergedImg
 
-def closestMatch(text, pattern):
+def colorMask(img, color='000000', tolerance='000000'):
+    """
+    @Creator: Cassidy Garner
+    @Name: colorMask
+    @Description: Build the black-on-white text mask used by processImage with
+                  NumPy. Each band gets a 256 entry lookup table with one bit
+                  per color whose tolerance range covers that value, so every
+                  color is checked with three lookups and two ANDs over the
+                  image. The result is identical to bandMask, which
+                  processImage uses when NumPy isn't installed.
+    @params:
+        >img (PIL.Image): the RGB(A) image to filter
+        >color (String,list:'000000') the RGB color(s) to filter for
+        >tolerance (String:'000000') the amount of variance to accept in the
+                    color
+    @return:
+        >PIL.Image: 'L' mode image, black where any color matched, else white
+    @throws:
+    """
+    if isinstance(color, str):
+        color = [color]
+    pixels = numpy.asarray(img)
+    values = numpy.arange(256)
+    # Smallest unsigned type with a bit for every color
+    bitType = next(t for t in (numpy.uint8, numpy.uint16, numpy.uint32, numpy.uint64)
+                   if len(color) <= numpy.iinfo(t).bits)
+    matched = None
+    for band, start in enumerate((0, 2, 4)):
+        tol = int(tolerance[start:start+2], 16)
+        lookup = numpy.zeros(256, dtype=bitType)
+        for bit, c in enumerate(color):
+            val = int(c[start:start+2], 16)
+            lookup[(values >= val-tol) & (values <= val+tol)] |= bitType(1 << bit)
+        hits = lookup[pixels[:, :, band]]
+        matched = hits if matched is None else matched & hits
+    return Image.fromarray(numpy.where(matched != 0, 0, 255).astype(numpy.uint8), 'L')
+
+def closestMatch(text, pattern, maxDist=None):
     """
     @Creator: Cassidy Garner
     @Name: closestMatch
     @Description: Fuzzy string matching algorithm using Levenshtein distance.
-                  Uses dynamic programming, so it's fast!
+                  The distance of the best match ending at each position of the
+                  text is found with Myers' bit-vector algorithm, which is
+                  linear in the length of the text. Only the text around the
+                  best matches is then run through the dynamic programming table
+                  to recover the matched substrings.
     @params:
         >text (String): the string to search within
         >pattern (String): the string to try and match
+        >maxDist (int:None): If the closest match is further away than this,
+                  skip recovering the matched substrings and return an empty
+                  list of matches along with the distance.
     @return:
         >tuple: A list of the closest matches, and the Levenshtein distance
                 between them and the search string.
@@ -546,69 +823,107 @@ def closestMatch(text, pattern):
         >ClosestMatchError: Raised if something goes wrong computing matches.
                             Should never be thrown unless I messed something up.
     """
-    
+
     tLen = len(text)
     pLen = len(pattern)
+    if pLen == 0:
+        return ([''] * (tLen+1), 0)
+
+    ## Bit i of each vector refers to row i+1 of the distance table.
+    ## Pv/Mv hold the vertical deltas (+1/-1) of the current column and
+    ## score tracks the value in the last row, D(pLen,j).
+    peq = {}
+    for i, char in enumerate(pattern):
+        peq[char] = peq.get(char, 0) | (1 << i)
+    mask = (1 << pLen) - 1
+    lastBit = 1 << (pLen-1)
+    pv, mv = mask, 0
+    score = pLen
+    lastRow = [score]
+    for char in text:
+        eq = peq.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        if ph & lastBit:
+            score += 1
+        elif mh & lastBit:
+            score -= 1
+        # D(0,j) = 0, so nothing is shifted into the first row
+        ph = (ph << 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+        lastRow.append(score)
+
+    minDist = min(lastRow)
+    starts = [j for j in range(tLen+1) if lastRow[j] == minDist]
+    if maxDist is not None and minDist > maxDist:
+        return ([], minDist)
+    if minDist == 0:
+        # Exact matches can only be the pattern itself
+        return ([pattern] * len(starts), 0)
+
+    ## A match ending at j spans at most pLen+minDist <= 2*pLen characters, and
+    ## every cell we look at while walking back along it is exact as long as
+    ## the table starts 2*pLen columns before that. Matches whose windows
+    ## overlap share a single table.
+    margin = 4*pLen + 1
+    windows = []
+    for start in starts:
+        left = max(0, start - margin)
+        if windows and left <= windows[-1][1]:
+            windows[-1][1] = start
+            windows[-1][2].append(start)
+        else:
+            windows.append([left, start, [start]])
 
-    ## Initialize data array.
-    ## D(0,j) = 0
-    minDists = [[float('inf') for x in range(tLen+1)] for y in range(pLen+1)]
-    for j in range(tLen+1):
-        minDists[0][j] = 0
-
-    ## For all (i,j) in minDists, compute the minimum edit distance...
-    ## ...between the first i chars of P and all substrings of T ending at j
-    ## D(i,j) = min( D(i-1,j)+1,
-    ##               D(i-1,j-1)+(Pi != Tj),
-    ##               D(i,j-1)+1 )
-    ## And save the computation path
-    paths = [[-1 for x in range(tLen+1)] for y in range(pLen+1)]
-    for j in range(tLen+1):
-        for i in range(1,pLen+1):
-            if j == 0:
-                minDists[i][j] = minDists[i-1][j] + 1
-                paths[i][j] = 1
-            else:
-                # Compute minDists[i][j]
-                path1 = minDists[i-1][j] + 1
-                path2 = minDists[i-1][j-1] + (pattern[i-1] != text[j-1])
-                path3 = minDists[i][j-1] + 1
-                minDists[i][j] = min(path1, path2, path3)
-                # Save computation path
-                if minDists[i][j] == path1: paths[i][j] = 1
-                elif minDists[i][j] == path2: paths[i][j] = 2
-                else: paths[i][j] = 3
-
-    ## Compute the closest match(es) by following the computation path backwards
-    ## from the min. value(s) in last row
-    minDist = float('inf')
-    starts = []
     matches = []
-    for j in range(tLen+1):
-        if minDists[pLen][j] < minDist:
-            starts = []
-            starts.append(j)
-            minDist = minDists[pLen][j]
-        elif minDists[pLen][j] == minDist:
-            starts.append(j)
-    for start in starts:
-        y = start
-        x = pLen
-        while x > 0 and y > 0:
-            if paths[x][y] == 1:
-                x = x-1
-            elif paths[x][y] == 2:
-                x = x-1
-                y = y-1
-            elif paths[x][y] == 3:
-                y = y-1
-            else:
-                log.error('ERROR: Invalid computation path')
-                msg = ('Tried to follow a bad path in closest match ',
-                      'algorithm. This should never happen! Contact Cassidy!')
-                raise ClosestMatchError(msg)
-            
-        matches.append(text[y:start])
+    for left, right, ends in windows:
+        ## D(i,j) = min( D(i-1,j)+1,
+        ##               D(i-1,j-1)+(Pi != Tj),
+        ##               D(i,j-1)+1 )
+        ## And save the computation path, one column per position in the text
+        prev = list(range(pLen+1))
+        paths = [[-1] + [1]*pLen]
+        for j in range(left+1, right+1):
+            textChar = text[j-1]
+            column = [0]*(pLen+1)
+            colPath = [-1]*(pLen+1)
+            for i in range(1, pLen+1):
+                path1 = column[i-1] + 1
+                path2 = prev[i-1] + (pattern[i-1] != textChar)
+                path3 = prev[i] + 1
+                best = min(path1, path2, path3)
+                column[i] = best
+                if best == path1: colPath[i] = 1
+                elif best == path2: colPath[i] = 2
+                else: colPath[i] = 3
+            paths.append(colPath)
+            prev = column
+
+        ## Compute the closest match(es) by following the computation path
+        ## backwards from the min. value(s) in last row
+        for start in ends:
+            y = start
+            x = pLen
+            while x > 0 and y > 0:
+                path = paths[y-left][x]
+                if path == 1:
+                    x = x-1
+                elif path == 2:
+                    x = x-1
+                    y = y-1
+                elif path == 3:
+                    y = y-1
+                else:
+                    log.error('ERROR: Invalid computation path')
+                    msg = ('Tried to follow a bad path in closest match ',
+                          'algorithm. This should never happen! Contact Cassidy!')
+                    raise ClosestMatchError(msg)
+
+            matches.append(text[y:start])
     return (matches, minDist)
 
 class ClosestMatchError(RuntimeError):
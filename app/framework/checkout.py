@@ -10,21 +10,17 @@ Date Modified:
 
 # Selenium modules
 from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.support.ui import Select
-from selenium.common.exceptions import NoSuchElementException, SessionNotCreatedException, ElementClickInterceptedException, StaleElementReferenceException
+from selenium.common.exceptions import NoSuchElementException, SessionNotCreatedException
 from selenium.webdriver.support.ui import WebDriverWait
 
 # Third party modules
 import time
-import json
 import logging
 
 # In house modules
 from app import pinpad, runas
-from app.util import constants
+from app.util import constants, locators, webdriver_pool
 from app.simulators.ip_scanner import IPScanner
 from app.framework.tc_helpers import test_func
 
@@ -52,10 +48,10 @@ sco_xml                 = r"C:\Passport\ExpressLane\bin\SCPOSStart.exe.config"
 # Selenium objects
 driver  = None
 wait    = None
+finder  = locators.Finder(lambda: driver)
 
 # Edge element locators and button names
-with open(controls_path) as f:
-    controls = json.load(f)
+controls = locators.load_controls(controls_path)
 
 WELCOME = controls['Welcome']
 SPEED_KEYS = controls['Speed Keys']
@@ -102,19 +98,21 @@ def connect(url="https://POSCLIENT001:8765/"):
             options = webdriver.ChromeOptions()
             options.add_experimental_option('w3c', False)
             options.add_argument("ignore-certificate-errors")
-            driver = webdriver.Chrome(constants.CHROME_DRIVER, chrome_options=options)
+            session = webdriver_pool.get().acquire("checkout", url, options)
         except WindowsError:
             logger.warning(f"Unable to locate {constants.CHROME_DRIVER}")
             return False
         except SessionNotCreatedException as e:
             logger.warning(f"Unable to instantiate chrome driver: {e}")
             return False
+        driver = session.driver
 
-        try:
-            driver.get(url)
-        except:
-            logger.warning("Unable to open web page.")
-            return False
+        if session.fresh or "Express Lane" not in driver.title: # A warm session already has the page open
+            try:
+                driver.get(url)
+            except:
+                logger.warning("Unable to open web page.")
+                return False
 
         # Verify Express Lane page loads
         if "Express Lane" not in driver.title:
@@ -128,10 +126,19 @@ def connect(url="https://POSCLIENT001:8765/"):
         logger.debug(f"Already connected to a chrome driver instance")
         return True
 
-def close():
+def close(quit=False):
+    """
+    Hides the Chrome driver instance, keeping it warm for the next connect.
+    Args:
+        quit: (bool) Quit Chrome instead of hiding it.
+    Returns:
+        True if success, False if failure
+    """
     try:
         global driver
-        driver.close()
+        if quit or not webdriver_pool.get().release(driver):
+            driver.close()
+            webdriver_pool.get().discard(driver)
         driver = None
         return True
     except:
@@ -1091,40 +1098,7 @@ def click_key(xpath, timeout=default_timeout):
         True
     """
     logger.debug(f"Clicking the element with XPATH {xpath}")
-    start_time = time.time()
-    try:
-        try:
-            element = WebDriverWait(driver, timeout).until(
-                EC.presence_of_element_located((By.XPATH, xpath)))
-        except TimeoutException:
-            logger.warning(f"Element with xpath {xpath} was not found within {timeout} seconds.")
-            return False
-
-        driver.execute_script("arguments[0].scrollIntoView(true);", element)
-    
-        try:
-            element = WebDriverWait(driver, timeout - (time.time()-start_time)).until(
-                EC.element_to_be_clickable((By.XPATH, xpath)))
-        except TimeoutException:
-            logger.warning(f"Element with xpath {xpath} was found but not clickable within {timeout} seconds.")
-            return False   
-
-        while True:
-            try:
-                element.click()
-                break
-            except ElementClickInterceptedException as e:
-                if time.time() - start_time > timeout:
-                    logger.warning(f"Element with xpath {xpath} was found but obscured by another element.")
-                    logger.warning(f"Selenium message: {e}") # This exception actually contains useful information
-                    return False
-
-        return True
-    except StaleElementReferenceException:
-        # Account for situations where the element is present but gets overwritten with an identical element
-        # This can happen when switching function key menus, for example
-        logger.debug("Element became stale after we grabbed it. Restarting the click process.")
-        return click_key(xpath, timeout=timeout - (start_time - time.time()))
+    return finder.click(xpath, timeout)
 
 def _clicked_start():
     """
@@ -1147,9 +1121,7 @@ def _is_element_present(xpath, timeout=prompt_timeout):
     """
     Helper function. Waits for the element/button to be present on the screen.
     Args:
-        text (str): The inner text of the desired element
-        container (str): An attribute of a parent of the desired element
-        find_container_by (str): What attribute type to look for in the parent
+        xpath (str): The element's XPATH
         timeout (int): How long to wait for the window and key to be available.
     Returns:
         bool: True if success, False if failure
@@ -1159,29 +1131,18 @@ def _is_element_present(xpath, timeout=prompt_timeout):
         >>> _is_element_present(SOME_INVALID_LOCATOR)
         False
     """
-    start_time = time.time()
-    try:
-        element = WebDriverWait(driver, timeout).until(
-                    EC.visibility_of_element_located(
-                        (By.XPATH, xpath)))
-    except:
-        logger.warning(f"Element with XPATH {xpath} not available within {timeout} seconds")
-        return False
-    while time.time() - start_time <= timeout:
-        if element.is_displayed():
-            return True
-    else:
-        logger.warning(f"Element with XPATH {xpath} was available but not displayed within {timeout} seconds")
-        return False
+    if finder.is_present(xpath, timeout):
+        return True
+    logger.warning(f"Element with XPATH {xpath} not displayed within {timeout} seconds")
+    return False
 
-def _get_text(locator, timeout=default_timeout, type = By.XPATH):
+def _get_text(locator, timeout=default_timeout, type = None):
     """
     Helper function. Returns the element's text.
-    Utilizes _find_element()
     Args:
         locator (str): Element's locator
         timeout (int): How long to wait for the window and element to be available.
-        type: the type to use: By.CSS_SELECTOR or By.XPATH
+        type: the type to use: By.CSS_SELECTOR or By.XPATH. Defaults to the locator's own type
     Returns:
         Returns string with text of the element upon success or None otherwise
     Examples:
@@ -1191,66 +1152,50 @@ def _get_text(locator, timeout=default_timeout, type = By.XPATH):
         None
     """
     logger.debug("Entered _get_text() method")
-    button = _find_element(locator, type = type, timeout = timeout)
-    if button:
-        return button.text
-    return None
+    return finder.get_text(locator, timeout, type)
 
-def _get_texts(locator, timeout=default_timeout, type = By.XPATH):
+def _get_texts(locator, timeout=default_timeout, type = None):
     """
-    Helper function. Returns the element's text.
-    Utilizes _find_elements()
+    Helper function. Returns the text of every element matching the locator, read in one call to the browser.
     Args:
         locator (str): Element's locator
         timeout (int): How long to wait for the window and element to be available.
-        type: the type to use: By.CSS_SELECTOR or By.XPATH
+        type: the type to use: By.CSS_SELECTOR or By.XPATH. Defaults to the locator's own type
     Returns:
-        Returns string with text of the element upon success or None otherwise
+        Returns list of strings with the text of the elements upon success or None otherwise
     Examples:
-        >>> _get_text(SOME_VALID_LOCATOR)
-        'Generic Item'
-        >>> _get_text(SOME_INVALID_LOCATOR)
+        >>> _get_texts(SOME_VALID_LOCATOR)
+        ['Generic Item', '$5.00']
+        >>> _get_texts(SOME_INVALID_LOCATOR)
         None
     """
-    logger.debug("Entered _get_text() method")
-    elts = _find_elements(locator, type = type, timeout = timeout)
-    if elts:
-        return [elt.text for elt in elts]
-    return None
+    logger.debug("Entered _get_texts() method")
+    return finder.get_texts(locator, timeout, type)
 
-def _find_element(locator, timeout=1, type = By.XPATH):
+def _find_element(locator, timeout=1, type = None):
     """
     Helper function. Searches the DOM to find the element you are looking for.
     Args:
         locator (str): Element's locator (CSS or XPATH)
         timeout (int): How long to wait for the window and element to be available.
-        type: the locator type (By.CSS_SELECTOR or By.XPATH)
+        type: the locator type (By.CSS_SELECTOR or By.XPATH). Defaults to the locator's own type
     Returns:
-        The list of selenium webelement or None
+        The selenium webelement or None
     Examples:
         >>> _find_element(SOME_VALID_LOCATOR)
         <selenium.webdriver.remote.webelement.WebElement (session="80f1a1ebe8220157e9d2f394e913db02", element="0.05045595521012469-1")>
         >>> _find_element(SOME_INVALID_LOCATOR)
         None
     """
-    elements = _find_elements(locator, timeout, type)
-    if elements:
-        if len(elements) > 1:
-            logger.warning(f"There is more than one element matching the locator {locator}."
-                            "Try a more specific locator, or use _find_elements if this is expected.")
-            return None
-        return elements[0]
-    else:
-        logger.warning("Could not find element with the locator [%s]"%(locator))
-        return None
+    return finder.find_element(locator, timeout, type)
 
-def _find_elements(locator, timeout=1, type = By.XPATH):
+def _find_elements(locator, timeout=1, type = None):
     """
     Helper function. Searches the DOM to find the elements you are looking for.
     Args:
         locator (str): Element's locator (CSS or XPATH)
         timeout (int): How long to wait for the window and element to be available.
-        type: the locator type (By.CSS_SELECTOR or By.XPATH)
+        type: the locator type (By.CSS_SELECTOR or By.XPATH). Defaults to the locator's own type
     Returns:
         The list of selenium webelements or None
     Examples:
@@ -1259,12 +1204,8 @@ def _find_elements(locator, timeout=1, type = By.XPATH):
         >>> _find_element(SOME_INVALID_LOCATOR)
         None
     """
-    try:
-        logger.debug("Looking for elements with locator [%s]"%(locator))
-        return WebDriverWait(driver, timeout).until(EC.visibility_of_all_elements_located((type, locator)))
-    except TimeoutException:
-        logger.warning(f"No elements with locator {locator} were visible within {timeout} seconds")
-        return None
+    logger.debug("Looking for elements with locator [%s]"%(locator))
+    return finder.find_elements(locator, timeout, type)
 
 def _strip_currency(amount):
     """
@@ -14,22 +14,20 @@ TODO:
 
 # Selenium modules
 from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
 from selenium.common.exceptions import SessionNotCreatedException
 from selenium.webdriver.support.ui import Select
 from selenium.common.exceptions import NoSuchElementException, InvalidSelectorException
-from selenium.webdriver.support.ui import WebDriverWait
 
 # Third party modules
 import time
 import json
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # In house modules
 from app import pinpad, runas, system
-from app.util import constants
+from app.util import constants, locators, webdriver_pool
 from app.simulators.ip_scanner import IPScanner
 from app.framework.tc_helpers import test_func
 
@@ -44,13 +42,18 @@ credentials_path = constants.USER_CREDENTIALS
 default_timeout = 3
 prompt_timeout  = 0.5
 
+# Console settings
+default_url   = "https://127.0.0.1:8764"
+max_terminals = 8 # Terminals run_terminals will drive at once
+
 # Selenium objects
 driver  = None
 wait    = None
+finder  = locators.Finder(lambda: driver)
+_local  = threading.local() # The Terminal this thread is driving, if any
 
 # Edge element locators and button names
-with open(controls_path) as f:
-    controls = json.load(f)
+controls = locators.load_controls(controls_path)
 
 TERMINALS = { "1": controls["Terminal 1"],
               "2": controls["Terminal 2"] }
@@ -61,7 +64,7 @@ KEYPAD = controls["Keypad"]
 KEYBOARD = controls["Keyboard"]
 PROMPT_BOX = controls["Prompt Box"]
 
-def connect(url="https://127.0.0.1:8764"):
+def connect(url=default_url):
     """
     Initializes Chrome driver instance and navigates to self checkout.
 
@@ -91,41 +94,18 @@ def connect(url="https://127.0.0.1:8764"):
     #    logger.warning(f"Unable to edit the settings for {sco_xml}")
      
     if driver is None:
-        try:
-            options = webdriver.ChromeOptions()
-            options.add_experimental_option('w3c', False)
-            options.add_argument("ignore-certificate-errors")
-            driver = webdriver.Chrome(constants.CHROME_DRIVER, chrome_options=options)
-        except WindowsError:
-            logger.warning(f"Unable to locate {constants.CHROME_DRIVER}")
-            return False
-        except SessionNotCreatedException as e:
-            logger.warning(f"Unable to instantiate chrome driver: {e}")
-            return False
-
-        try:
-            driver.get(url)
-        except:
-            logger.warning("Unable to connect to Cashier Control Console.")
-            return False
-
-        # Verify control console page loads
-        if "Express Lane Control Console" not in driver.title:
-            logger.warning("Opened a web page, but it wasn't Express Lane Control Console. Check Passport status and URL.")
-            return False
-
-        driver.maximize_window()
-        return True
+        driver = _open_console("console", url)
+        return driver is not None
     else:
         logger.debug(f"Already connected to a chrome driver instance")
         return True
 
-def close():
+def close(quit=False):
     """
-    Closes current Chrome driver instance.
+    Hides current Chrome driver instance, keeping it warm for the next connect.
 
     Args:
-        None
+        quit: (bool) Quit Chrome instead of hiding it.
 
     Returns:
         True if success, False if failure
@@ -138,13 +118,207 @@ def close():
     """
     try:
         global driver
-        driver.close()
+        if quit or not webdriver_pool.get().release(driver):
+            driver.close()
+            webdriver_pool.get().discard(driver)
         driver = None
         return True
     except:
         logger.warning("Unable to close chrome driver instance")
         return False
 
+class Terminal:
+    """
+    One terminal, driven from its own Chrome session on the console, so several terminals
+    can be driven at the same time. Inside a with block, this module's functions act on
+    the terminal's session instead of the module's driver, from that thread only.
+
+    Examples:
+        >>> lane = Terminal(2)
+        >>> with lane:
+        ...     lane.step(add_prepay, "$10.00", 2)
+        ...     lane.step(void_transaction)
+        True
+        >>> lane.timeline
+        [('add_prepay', 0.0, 1.412, True), ('void_transaction', 1.412, 2.037, True)]
+        >>> lane.close()
+        True
+    """
+    def __init__(self, number, url=default_url):
+        """
+        Args:
+            number: (int) The terminal to drive
+            url: (str) The cashier control console
+        """
+        self.number = int(number)
+        self.url = url
+        self.driver = None
+        self.finder = None
+        self.timeline = [] # (step, seconds since the first step, seconds taken, result) of each step
+        self.start = None
+        self._previous = [] # What each thread was driving before entering, for nested with blocks
+
+    def connect(self):
+        """
+        Open the terminal's session and select the terminal in it.
+        Returns:
+            bool: True if success, False if failure
+        """
+        if self.driver is None:
+            self.driver = _open_console(f"console-{self.number}", self.url)
+            if self.driver is None:
+                return False
+            self.finder = locators.Finder(lambda: self.driver)
+        with self:
+            return select_terminal(self.number, verify=False)
+
+    def close(self, quit=False):
+        """
+        Hide the terminal's session, keeping it warm for the next connect.
+        Args:
+            quit: (bool) Quit Chrome instead of hiding it.
+        Returns:
+            bool: True if success, False if failure
+        """
+        if self.driver is None:
+            return True
+        try:
+            if quit or not webdriver_pool.get().release(self.driver):
+                webdriver_pool.get().discard(self.driver)
+        except Exception as e:
+            logger.warning(f"Unable to close the chrome driver instance for terminal {self.number}: {e}")
+            return False
+        self.driver = None
+        return True
+
+    def step(self, func, *args, **kwargs):
+        """
+        Call one of this module's functions on this terminal, timing it.
+        Args:
+            func: (function) The function to call
+            args: Its positional arguments
+            kwargs: Its keyword arguments
+        Returns:
+            Whatever the function returned. Falsy results and exceptions are recorded as failures
+        """
+        if self.start is None:
+            self.start = time.perf_counter()
+        began = time.perf_counter()
+        result = False
+        try:
+            with self:
+                result = func(*args, **kwargs)
+            return result
+        finally:
+            name = getattr(func, '__name__', repr(func))
+            self.timeline.append((name, round(began - self.start, 3), round(time.perf_counter() - began, 3), result))
+            logger.debug(f"Terminal {self.number}: {name} took {time.perf_counter() - began:.3f}s")
+
+    def __enter__(self):
+        if self.driver is None and not self.connect():
+            raise RuntimeError(f"Unable to connect to terminal {self.number} at {self.url}")
+        self._previous.append(getattr(_local, 'terminal', None))
+        _local.terminal = self
+        return self
+
+    def __exit__(self, *exc):
+        _local.terminal = self._previous.pop()
+        return False
+
+    def __repr__(self):
+        return f"Terminal({self.number})"
+
+def run_terminals(flows, url=default_url, close_after=False):
+    """
+    Run scripted checkout flows on several terminals at once, each from its own Chrome session,
+    timing every step.
+
+    Args:
+        flows: (dict) Each terminal number mapped to its flow: a list of steps, each one of this
+               module's functions or a (function, args...) tuple. A flow stops at its first failed step.
+        url: (str) The cashier control console
+        close_after: (bool) Quit each terminal's Chrome when its flow is done, instead of keeping it warm.
+
+    Returns:
+        list: A dict per terminal, in the order given, with 'terminal', 'success', 'duration' in seconds,
+              and 'steps', the (step, seconds since start, seconds taken, result) of each step run.
+
+    Examples:
+        >>> run_terminals({1: [(add_prepay, "$10.00", 1), void_transaction],
+        ...                2: [(add_postpay, 2), (click_function_key, "Suspend Transaction")]})
+        [{'terminal': 1, 'success': True, 'duration': 3.4, 'steps': [('add_prepay', 0.0, 1.4, True), ...]},
+         {'terminal': 2, 'success': True, 'duration': 2.9, 'steps': [...]}]
+    """
+    def run(item):
+        number, flow = item
+        terminal = Terminal(number, url)
+        result = {'terminal': terminal.number, 'success': False, 'duration': None, 'steps': terminal.timeline}
+        start = time.perf_counter()
+        try:
+            if terminal.connect():
+                for step in flow:
+                    func, args = (step[0], step[1:]) if isinstance(step, (tuple, list)) else (step, ())
+                    if not terminal.step(func, *args):
+                        logger.warning(f"Terminal {terminal.number}: {getattr(func, '__name__', func)} failed")
+                        break
+                else:
+                    result['success'] = True
+            else:
+                logger.warning(f"Unable to connect to terminal {terminal.number}")
+        except Exception as e:
+            logger.warning(f"Flow on terminal {terminal.number} failed: {e}")
+        finally:
+            terminal.close(quit=close_after)
+        result['duration'] = round(time.perf_counter() - start, 3)
+        return result
+
+    items = list(flows.items())
+    logger.info(f"Running flows on terminals {[number for number, _ in items]}")
+    with ThreadPoolExecutor(max_workers=min(len(items), max_terminals) or 1, thread_name_prefix="Terminal") as pool:
+        results = list(pool.map(run, items))
+    passed = [r for r in results if r['success']]
+    logger.info(f"{len(passed)}/{len(results)} terminal flows completed")
+    return results
+
+def _open_console(role, url):
+    """
+    Helper function. Get a warm Chrome session from the pool with the console loaded.
+
+    Args:
+        role: (str) What the session is for in the pool, e.g. "console" or "console-2"
+        url: (str) The cashier control console
+
+    Returns:
+        WebDriver: The session's driver, or None if the console couldn't be opened
+    """
+    try:
+        options = webdriver.ChromeOptions()
+        options.add_experimental_option('w3c', False)
+        options.add_argument("ignore-certificate-errors")
+        session = webdriver_pool.get().acquire(role, url, options)
+    except WindowsError:
+        logger.warning(f"Unable to locate {constants.CHROME_DRIVER}")
+        return None
+    except SessionNotCreatedException as e:
+        logger.warning(f"Unable to instantiate chrome driver: {e}")
+        return None
+    session_driver = session.driver
+
+    if session.fresh or "Express Lane Control Console" not in session_driver.title: # A warm session already has the page open
+        try:
+            session_driver.get(url)
+        except:
+            logger.warning("Unable to connect to Cashier Control Console.")
+            return None
+
+    # Verify control console page loads
+    if "Express Lane Control Console" not in session_driver.title:
+        logger.warning("Opened a web page, but it wasn't Express Lane Control Console. Check Passport status and URL.")
+        return None
+
+    session_driver.maximize_window()
+    return session_driver
+
 def get_to_mws(sign_in=True):
     """
     Closes chrome instance and navigates to the MWS.
@@ -691,25 +865,7 @@ def click_key(xpath, timeout=default_timeout, case_sens=False):
         >>> click_key("//button[@id='login_enter']")
         True
     """
-    start_time = time.time()
-    try:
-        element = WebDriverWait(driver, timeout).until(
-            EC.presence_of_element_located((By.XPATH, xpath)))
-    except TimeoutException:
-        logger.warning(f"Element with xpath {xpath} was not found within {timeout} seconds.")
-        return False
-
-    driver.execute_script("arguments[0].scrollIntoView(true);", element)
-    
-    try:
-        element = WebDriverWait(driver, timeout).until(
-            EC.element_to_be_clickable((By.XPATH, xpath)))
-    except TimeoutException:
-        logger.warning(f"Element with xpath {xpath} was found but not clickable within {timeout} seconds.")
-        return False   
-
-    element.click()
-    return True
+    return _finder().click(xpath, timeout)
 
 ##################
 # Read functions #
@@ -884,6 +1040,53 @@ def read_options(timeout=default_timeout):
     """
     return _get_text(OPTIONS["Text"], timeout).split('\n')
 
+# Reads the state of every terminal in one round trip, instead of one WebDriver call per element
+TERMINALS_SCRIPT = """
+    var terminals = arguments[0], help = arguments[1], out = {};
+    function first(xpath) {
+        return xpath ? document.evaluate(xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue : null;
+    }
+    function text(node) { return node ? node.innerText : null; }
+    Object.keys(terminals).forEach(function(number) {
+        var map = terminals[number], win = first(map.Window), receipt = first(map.Receipt), items = first(map.Items);
+        out[number] = {
+            selected: !!win && /selected$/.test(win.getAttribute('class') || ''),
+            calling: !!receipt && window.getComputedStyle(receipt).animationName === help,
+            timer: text(first(map.Timer)),
+            notification: text(first(map.Notification)),
+            journal: items ? Array.prototype.filter.call(items.children, function(e) { return e.tagName === 'DIV'; }).map(text) : [],
+            totals: text(first(map.Totals))
+        };
+    });
+    return out;
+"""
+
+def read_terminals():
+    """
+    Read the state of every terminal at once.
+
+    Args: None
+
+    Returns: (dict) Each terminal number mapped to its 'selected' and 'calling' flags, 'timer',
+             'notification', 'journal' (as read_journal returns it) and 'totals' (as read_balance returns it).
+             Text that isn't on screen is None.
+
+    Example:
+        >>> read_terminals()
+        {1: {'selected': True, 'calling': False, 'timer': '3:57', 'notification': '',
+             'journal': [['Generic Item', '$5.00']], 'totals': {'Transaction Total': '$5.00', 'Balance Due': '$5.00'}},
+         2: {'selected': False, 'calling': True, ...}}
+    """
+    help_animation_name = "blinkRed"
+    states = _current_driver().execute_script(TERMINALS_SCRIPT, TERMINALS, help_animation_name)
+    terminals = {}
+    for number, state in states.items():
+        state['journal'] = [line.split('\n') for line in state['journal'] if line is not None]
+        totals = state['totals'].split('\n') if state['totals'] else []
+        state['totals'] = dict(zip(totals[0::2], totals[1::2]))
+        terminals[int(number)] = state
+    return terminals
+
 def get_selected_terminal():
     """
     Check which terminal is currently selected.
@@ -896,9 +1099,9 @@ def get_selected_terminal():
         >>> get_selected_terminal()
         2
     """
-    for terminal, map in TERMINALS.items():
-        if _find_element(map["Window"]).get_attribute("class").endswith("selected"):
-            return int(terminal)
+    for terminal, state in read_terminals().items():
+        if state['selected']:
+            return terminal
     return None
 
 def is_terminal_calling(terminal=None):
@@ -963,9 +1166,7 @@ def is_element_present(xpath, timeout=prompt_timeout):
     Waits for the element/button to be present on the screen.
     
     Args:
-        text (str): The inner text of the desired element
-        container (str): An attribute of a parent of the desired element
-        find_container_by (str): What attribute type to look for in the parent
+        xpath (str): The element's XPATH
         timeout (int): How long to wait for the window and key to be available.
 
     Returns:
@@ -977,21 +1178,10 @@ def is_element_present(xpath, timeout=prompt_timeout):
         >>> _is_element_present(SOME_INVALID_LOCATOR)
         False
     """
-    start_time = time.time()
-    try:
-        element = WebDriverWait(driver, timeout).until(
-                    EC.visibility_of_element_located(
-                        (By.XPATH, xpath)))
-    except:
-        logger.warning(f"Element with XPATH {xpath} not available within {timeout} seconds")
-        return False
-    while time.time() - start_time <= timeout:
-        if element.is_displayed():
-            return True
-    else:
-        logger.warning(f"Element with XPATH {xpath} was available but not displayed within {timeout} seconds")
-        return False
-        
+    if _finder().is_present(xpath, timeout):
+        return True
+    logger.warning(f"Element with XPATH {xpath} not displayed within {timeout} seconds")
+    return False
 """
 Helper Functions
 """
@@ -1012,13 +1202,7 @@ def _get_text(locator, timeout=default_timeout):
         >>> _get_text(SOME_INVALID_LOCATOR)
         None
     """
-    try:
-        button = WebDriverWait(driver, timeout).until(EC.presence_of_element_located
-                        ((By.XPATH, locator)))
-        return button.text
-    except Exception as e:
-        logger.warning(f"Could not get text of element with XPATH {locator} within {timeout} seconds. Error message: {e}")
-        return None
+    return _finder().get_text(locator, timeout, visible_only=False, unique=False)
 
 def _find_element(locator, timeout=.5):
     """
@@ -1029,55 +1213,39 @@ def _find_element(locator, timeout=.5):
         timeout (int): How long to wait for the window and key to be available.
 
     Returns:
-        bool: True if success, False if failure
+        WebElement: The first element matching the locator, or None
 
     Examples:
         >>> _find_element(SOME_VALID_LOCATOR)
-        (
-            <selenium.webdriver.remote.webelement.WebElement (session="80f1a1ebe8220157e9d2f394e913db02", element="0.05045595521012469-1")>,
-            True
-        )
+        <selenium.webdriver.remote.webelement.WebElement (session="80f1a1ebe8220157e9d2f394e913db02", element="0.05045595521012469-1")>
         >>> _find_element(SOME_INVALID_LOCATOR)
-        (
-            None,
-            False
-        )
+        None
     """
-    try:
-        element = WebDriverWait(driver, timeout).until(EC.presence_of_element_located
-                        ((By.XPATH, locator)))
-        return element
-    except Exception as e:
-        logger.warning(f"Could not find element with XPATH {locator} within {timeout} seconds. Error message: {e}")
-        return None
+    return _finder().find_element(locator, timeout, visible_only=False, unique=False)
 
 def _find_elements(locator, timeout=.5):
     """
     Helper function. Searches the DOM to find a list of elements you are looking for.
+    Doesn't wait for them to appear.
     Args:
         locator (str): Button's XPATH
-        timeout (int): How long to wait for the window and key to be available.
+        timeout (int): Not used. Kept for existing callers
     Returns:
-        bool: True if success, False if failure
+        list: The elements currently matching the locator. Empty if there are none
     Examples:
-        >>> _find_element(SOME_VALID_LOCATOR)
-        (
-            <selenium.webdriver.remote.webelement.WebElement (session="80f1a1ebe8220157e9d2f394e913db02", element="0.05045595521012469-1")>,
-            True
-        )
-        >>> _find_element(SOME_INVALID_LOCATOR)
-        (
-            None,
-            False
-        )
-    """
-    start_time = time.time()
-    while time.time() - start_time <= timeout:
-        try:
-            elements = driver.find_elements_by_xpath(locator)
-            return elements
-        except:
-            continue
-    else:
-        logger.warning(f"Could not find elements with xpath {locator}.")
-        return None
\ No newline at end of file
+        >>> _find_elements(SOME_VALID_LOCATOR)
+        [<selenium.webdriver.remote.webelement.WebElement (session="80f1a1ebe8220157e9d2f394e913db02", element="0.05045595521012469-1")>]
+        >>> _find_elements(SOME_INVALID_LOCATOR)
+        []
+    """
+    return _finder().find_elements(locator, 0, visible_only=False, warn=False) or []
+
+def _current_driver():
+    """Helper function. The driver of the Terminal this thread is driving, or the module's driver."""
+    terminal = getattr(_local, 'terminal', None)
+    return terminal.driver if terminal is not None else driver
+
+def _finder():
+    """Helper function. The Finder of the Terminal this thread is driving, or the module's Finder."""
+    terminal = getattr(_local, 'terminal', None)
+    return terminal.finder if terminal is not None else finder
@@ -17,11 +17,8 @@ from html.parser import HTMLParser
 # Selenium modules
 from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.support.ui import Select
-from selenium.common.exceptions import NoSuchElementException, SessionNotCreatedException, ElementClickInterceptedException, StaleElementReferenceException
-from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import NoSuchElementException, SessionNotCreatedException
 
 # In house modules
 from app.simulators.ip_scanner import IPScanner
@@ -29,7 +26,7 @@ from app.simulators.printersim import PrinterSim
 from app import pinpad
 from app import mws
 from app import crindsim
-from app.util import constants, system
+from app.util import constants, locators, system, webdriver_pool
 from app.framework.tc_helpers import test_func, tc_fail
 
 # Change Selenium's logging handlers to avoid spam
@@ -58,13 +55,13 @@ json_user_credentials   = constants.USER_CREDENTIALS # Change this when we final
 edge_controls_path      = constants.CONTROLS_EDGE
 
 try:
-    with open(edge_controls_path) as f:
-        controls = json.load(f)
+    controls = locators.load_controls(edge_controls_path)
 except Exception as e:
     logger.warning(e)
 
 # Selenium objects
 driver  = None
+finder  = locators.Finder(lambda: driver)
 
 # Scanner object
 scanner = IPScanner()
@@ -126,24 +123,26 @@ def connect(timeout=60, recover=False, url = 'https://127.0.0.1:7501/'):
             options = webdriver.ChromeOptions()
             options.add_experimental_option('w3c', False)
             options.add_argument("ignore-certificate-errors")
-            driver = webdriver.Chrome(constants.CHROME_DRIVER, chrome_options=options)
+            session = webdriver_pool.get().acquire("edge", url, options)
         except WindowsError:
             logger.warning(f"Unable to locate {constants.CHROME_DRIVER}")
             return False
         except SessionNotCreatedException as e:
             logger.warning(f"Unable to instantiate chrome driver: {e}")
             return False
+        driver = session.driver
 
         start_time = time.time()
-        while time.time() - start_time <= timeout:
-            try:
-                driver.get(url)
-                break
-            except:
-                logger.warning(f"Unable to open web page. Retrying...")
-        else:
-            logger.warning(f"Unable to open web page within {timeout} seconds.")
-            return False
+        if session.fresh or "Passport EDGE" not in driver.title: # A warm session already has the page open
+            while time.time() - start_time <= timeout:
+                try:
+                    driver.get(url)
+                    break
+                except:
+                    logger.warning(f"Unable to open web page. Retrying...")
+            else:
+                logger.warning(f"Unable to open web page within {timeout} seconds.")
+                return False
 
         # Verify Edge page loads
         if "Passport EDGE" not in driver.title:
@@ -156,17 +155,19 @@ def connect(timeout=60, recover=False, url = 'https://127.0.0.1:7501/'):
         logger.debug(f"Already connected to a chrome driver instance")
         return True
 
-def close():
+def close(quit=False):
     """
-    Closes chrome driver instance.
+    Hides chrome driver instance, keeping it warm for the next connect.
     Args:
-        None
+        quit: (bool) Quit Chrome instead of hiding it.
     Returns:
         True if success; otherwise, False
     """
     try:
         global driver
-        driver.close()
+        if quit or not webdriver_pool.get().release(driver):
+            driver.close()
+            webdriver_pool.get().discard(driver)
         driver = None
         return True
     except Exception as e:
@@ -175,7 +176,7 @@ def close():
 
 def get_to_mws(sign_in=True):
     """
-    Closes chrome instance and navigates to the MWS.
+    Hides chrome instance and navigates to the MWS.
     Args:
         None
     Returns:
@@ -2617,6 +2618,15 @@ def click_tender_key(key, timeout=default_timeout):
     else:
         return click_key(PAYMENT['type'] % key.lower())
 
+def invalidate_key_index():
+    """
+    Forget the layout of the speed and dept key pages. Keys are found by their text on
+    any page here, so there is no index to forget. Kept for the same interface as the classic POS.
+    Args: None
+    Returns: None
+    """
+    pass
+
 @test_func
 def click_speed_key(key, timeout=key_timeout, case_sens=False):
     """
@@ -2889,40 +2899,7 @@ def click_key(xpath, timeout=default_timeout):
         True
     """
     logger.debug(f"Clicking the element with XPATH {xpath}")
-    start_time = time.time()
-    try:
-        try:
-            element = WebDriverWait(driver, timeout).until(
-                EC.presence_of_element_located((By.XPATH, xpath)))
-        except TimeoutException:
-            logger.warning(f"Element with xpath {xpath} was not found within {timeout} seconds.")
-            return False
-
-        driver.execute_script("arguments[0].scrollIntoView(true);", element)
-    
-        try:
-            element = WebDriverWait(driver, timeout - (time.time()-start_time)).until(
-                EC.element_to_be_clickable((By.XPATH, xpath)))
-        except TimeoutException:
-            logger.warning(f"Element with xpath {xpath} was found but not clickable within {timeout} seconds.")
-            return False   
-
-        while True:
-            try:
-                element.click()
-                break
-            except ElementClickInterceptedException as e:
-                if time.time() - start_time > timeout:
-                    logger.warning(f"Element with xpath {xpath} was found but obscured by another element.")
-                    logger.warning(f"Selenium message: {e}") # This exception actually contains useful information
-                    return False
-
-        return True
-    except StaleElementReferenceException:
-        # Account for situations where the element is present but gets overwritten with an identical element
-        # This can happen when switching function key menus, for example
-        logger.debug("Element became stale after we grabbed it. Restarting the click process.")
-        return click_key(xpath, timeout=timeout - (start_time - time.time()))
+    return finder.click(xpath, timeout)
 
 """
 Click functions that are only for cross compatibility with WPF POS
@@ -3079,7 +3056,7 @@ def click_pwd_key(key, timeout=default_timeout):
 """
 Prompt Helper Functions.
 """
-def _is_element_present(locator, timeout=prompt_timeout, type = By.XPATH):
+def _is_element_present(locator, timeout=prompt_timeout, type = None):
     """
     Helper function. Waits for the element/button to be present on the screen.
     Args:
@@ -3093,14 +3070,10 @@ def _is_element_present(locator, timeout=prompt_timeout, type = By.XPATH):
         >>> _is_element_present(SOME_INVALID_LOCATOR)
         False
     """
-    try:
-        WebDriverWait(driver, timeout).until(lambda x: x.find_element(type, locator).is_displayed())
+    if finder.is_present(locator, timeout, type):
         return True
-    except TimeoutException:
-        logger.debug("Element with locator [%s] is not present within %s seconds." % (locator, timeout))
-        return False
-    except StaleElementReferenceException: # Sometimes raised if the DOM is modified while we check visibility. Just try again
-        return _is_element_present(locator, timeout, type)
+    logger.debug("Element with locator [%s] is not present within %s seconds." % (locator, timeout))
+    return False
 
 def _is_till_closed(timeout=prompt_timeout):
     """
@@ -3320,14 +3293,13 @@ def _handle_qualifier(qualifier):
         logger.warning(f"Unable to find the qualifier {qualifier}.")
         return False
 
-def _get_text(locator, timeout=default_timeout, type = By.XPATH):
+def _get_text(locator, timeout=default_timeout, type = None):
     """
     Helper function. Returns the element's text.
-    Utilizes _find_element()
     Args:
         locator (str): Element's locator
         timeout (int): How long to wait for the window and element to be available.
-        type: the type to use: By.CSS_SELECTOR or By.XPATH
+        type: the type to use: By.CSS_SELECTOR or By.XPATH. Defaults to the locator's own type
     Returns:
         Returns string with text of the element upon success or None otherwise
     Examples:
@@ -3337,44 +3309,34 @@ def _get_text(locator, timeout=default_timeout, type = By.XPATH):
         None
     """
     # logger.debug("Entered _get_text() method")
-    button = _find_element(locator, type = type, timeout = timeout)
-    if button:
-        try:
-            return button.text
-        except StaleElementReferenceException: # Element changed after we found it. Try again
-            return _get_text(locator, timeout, type)
-    return None
+    return finder.get_text(locator, timeout, type)
 
-def _get_texts(locator, timeout=default_timeout, type = By.XPATH):
+def _get_texts(locator, timeout=default_timeout, type = None):
     """
-    Helper function. Returns the element's text.
-    Utilizes _find_elements()
+    Helper function. Returns the text of every element matching the locator, read in one call to the browser.
     Args:
         locator (str): Element's locator
         timeout (int): How long to wait for the window and element to be available.
-        type: the type to use: By.CSS_SELECTOR or By.XPATH
+        type: the type to use: By.CSS_SELECTOR or By.XPATH. Defaults to the locator's own type
     Returns:
-        Returns string with text of the element upon success or None otherwise
+        Returns list of strings with the text of the elements upon success or None otherwise
     Examples:
-        >>> _get_text(SOME_VALID_LOCATOR)
-        'Generic Item'
-        >>> _get_text(SOME_INVALID_LOCATOR)
+        >>> _get_texts(SOME_VALID_LOCATOR)
+        ['Generic Item', '$5.00']
+        >>> _get_texts(SOME_INVALID_LOCATOR)
         None
     """
     # logger.debug("Entered _get_texts() method")
-    elts = _find_elements(locator, type = type, timeout = timeout)
-    if elts:
-        return [elt.text for elt in elts]
-    return None
+    return finder.get_texts(locator, timeout, type)
 
-def _find_element(locator, timeout=1, type = By.XPATH):
+def _find_element(locator, timeout=1, type = None):
     """
     Helper function. Searches the DOM to find the element you are looking for.
     If multiple elements will match, use _find_elements instead.
     Args:
         locator (str): Element's locator (CSS or XPATH)
         timeout (int): How long to wait for the window and element to be available.
-        type: the locator type (By.CSS_SELECTOR or By.XPATH)
+        type: the locator type (By.CSS_SELECTOR or By.XPATH). Defaults to the locator's own type
     Returns:
         (WebElement) The element matching the locator.
     Examples:
@@ -3383,24 +3345,15 @@ def _find_element(locator, timeout=1, type = By.XPATH):
         >>> _find_element(SOME_INVALID_LOCATOR)
         None
     """
-    elements = _find_elements(locator, timeout, type)
-    if elements:
-        if len(elements) > 1:
-            logger.warning(f"There is more than one element matching the locator {locator}."
-                            "Try a more specific locator, or use _find_elements if this is expected.")
-            return None
-        return elements[0]
-    else:
-        logger.warning("Could not find element with the locator [%s]"%(locator))
-        return None
+    return finder.find_element(locator, timeout, type)
 
-def _find_elements(locator, timeout=1, type = By.XPATH):
+def _find_elements(locator, timeout=1, type = None):
     """
     Helper function. Searches the DOM to find the elements you are looking for.
     Args:
         locator (str): Element's locator (CSS or XPATH)
         timeout (int): How long to wait for the window and element to be available.
-        type: the locator type (By.CSS_SELECTOR or By.XPATH)
+        type: the locator type (By.CSS_SELECTOR or By.XPATH). Defaults to the locator's own type
     Returns:
         The list of selenium webelements or None
     Examples:
@@ -3410,13 +3363,7 @@ def _find_elements(locator, timeout=1, type = By.XPATH):
         None
     """
     # logger.debug("Looking for elements with locator [%s]"%(locator))
-    try:
-        return WebDriverWait(driver, timeout).until(EC.visibility_of_any_elements_located((type, locator)))
-    except TimeoutException:
-        logger.warning(f"No elements with locator {locator} were visible within {timeout} seconds.")
-        return None
-    except StaleElementReferenceException: # Sometimes raised if the DOM is modified while we check visibility. Just try again
-        return _find_elements(locator, timeout, type)
+    return finder.find_elements(locator, timeout, type)
 
 def _enter_new_password(password):
     """
@@ -13,7 +13,7 @@ from app import employee, network_site_config, register_setup
 from app import feature_activation, register_grp_maint, store_close
 from app import express_lane_maint
 #Import util modules
-from app import system, server, runas
+from app import system, runas
 #Import framework modules
 from app import mws, Navi, pos
 #Import simulator modules
@@ -101,7 +101,7 @@ class Initial_setup:
             errors += "\nFailed to import configuration via Extraction Tool."
         self.reapply_forecourt_config()
         errors += self.setup_edh()
-        # if not crindsim.setup_edh(4, server.server.get_site_info()['ip']): TODO: Once setup_edh has verification, add this back
+        # if not crindsim.setup_edh(4, system.profile().simulator_ips['ip']): TODO: Once setup_edh has verification, add this back
         #     errors += "\nFailed to add reg keys for CRIND Sim on EDH."
         system.save_snapshot()
 
@@ -124,7 +124,7 @@ class Initial_setup:
             errors += "\nFailed to enable EDH security."
         if not edh.setup():
             errors += "\nFailed to set receipt printer port and enable car wash controller."
-        crindsim.setup_edh(4, server.server.get_site_info()['ip'])
+        crindsim.setup_edh(4, system.profile().simulator_ips['ip'])
 
         return errors
 
@@ -538,7 +538,7 @@ class Initial_setup:
         KC = FC.find('KioskConfig')
         Kiosk = KC.find('Kiosk')
         Kiosk_IP = Kiosk.find('IPAddress')
-        Kiosk_IP.text = server.server.get_site_info()['ip']
+        Kiosk_IP.text = system.profile().simulator_ips['ip']
 
         return tree
 
@@ -13,21 +13,24 @@ Date Modified: 10/9/2018
 from pywinauto import Application
 import pywinauto
 from win32gui import FindWindow
-from PIL import ImageGrab
+from PIL import ImageGrab, ImageChops
 import time
 import logging
 import json
+import os
 import re
-import winreg
+from collections.abc import Mapping
+from types import MappingProxyType
 
 # In-House Modules
 from app import OCR, system
-from app.util import constants
+from app.util import constants, waits
 
 file_path = constants.CONTROLS_WPF
 current_menu = None
 current_tab = None # This is only set when select_tab is called - won't be accurate for a newly loaded menu
 controls = None
+controls_path = None # Path of the current menu's controls in the index, i.e. ('site configuration', 'NBS')
 process = None
 process2 = None
 process_conn = None
@@ -35,6 +38,10 @@ process_conn = None
 default_timeout = 10
 log = logging.getLogger()
 
+# controls.json is parsed once per process and reloaded when the file changes.
+# _controls_map holds (mtime, frozen controls tree, control index).
+_controls_map = None
+
 def connect(menu):
     """Initialize the connection to the current MWS menu."""
     #Load the controls file and set the current_menu, controls, and process values
@@ -43,7 +50,7 @@ def connect(menu):
     create_connection()
 
 def load_controls(menu):
-    global current_menu, controls, process, process2
+    global current_menu, controls, controls_path, process, process2
 
     if menu == None:
         log.warning("Attempted to load controls for 'None'")
@@ -67,31 +74,7 @@ def load_controls(menu):
             menu = 'speedkey maintenance'
 
     current_menu = menu
-    #Load the controls.json file
-    with open(file_path) as controls_file:
-        controls = json.load(controls_file)
-    try:
-        controls = controls[menu]
-    except KeyError:
-        log.error(menu+" has not been added to the controls.json file")
-        raise MWSMapException(f"{menu} is not mapped in controls.json.")
-
-    # Handle network menus
-    try:
-        network = controls['network']
-    except KeyError:
-        network = False
-    if network:
-        log.debug("Loading controls for network menu")
-        brand = system.get_brand()
-        for key in controls.keys():
-            if brand.upper() in key.upper():
-                try:
-                    controls = controls[key]
-                except KeyError:
-                    log.error("Failed to find the brand network controls")
-                    raise MWSMapException(f"{brand} does not have a map for {menu} in controls.json.")
-        log.debug("Reading the process from the controls.json file")
+    controls_path, controls = resolve_menu(menu)
     try:
         #Read the process from the controls file
         process = controls['process']
@@ -108,6 +91,101 @@ def load_controls(menu):
     current_tab = None # Reset current tab
     return controls
 
+def get_controls_map():
+    """
+    Get the parsed contents of controls.json and the control index built from it.
+    The file is only read again if it has been modified since it was last loaded.
+    Args: None
+    Returns: (tuple) The read-only controls tree, and a dict mapping each menu/tab path
+             (tuple) to a dict of control name -> tuple of matching control IDs.
+    Example:
+        >>> tree, index = get_controls_map()
+        >>> index[('store options', 'General')]['Store Number']
+        (33,)
+    """
+    global _controls_map
+    mtime = os.path.getmtime(file_path)
+    if _controls_map is None or _controls_map[0] != mtime:
+        log.debug(f"Loading controls from {file_path}")
+        with open(file_path) as controls_file:
+            tree = json.load(controls_file)
+        _controls_map = (mtime, freeze(tree), build_control_index(tree))
+    return _controls_map[1], _controls_map[2]
+
+def freeze(data):
+    """
+    Recursively convert a parsed JSON object into read-only equivalents
+    (dicts to mapping proxies, lists to tuples).
+    Args:
+        data: The parsed JSON object.
+    Returns: The read-only version of data.
+    """
+    if type(data) is dict:
+        return MappingProxyType({key: freeze(value) for key, value in data.items()})
+    elif type(data) is list:
+        return tuple(freeze(value) for value in data)
+    return data
+
+def build_control_index(tree):
+    """
+    Flatten the controls tree so get_control can resolve a control with one lookup.
+    For every menu/tab path, each control name maps to the value directly at that
+    level if there is one. Otherwise it maps to every control ID with that name
+    in lower levels, in the same order search_dict would find them. Names with
+    more than one ID are ambiguous unless a tab is specified.
+    Args:
+        tree: (dict) The parsed contents of controls.json.
+    Returns: (dict) Path (tuple) -> {control name: tuple of control IDs}
+    """
+    index = {}
+    def walk(node, path):
+        found = {}
+        for key, value in node.items():
+            if type(value) is not dict:
+                found[key] = [value]
+        for key, value in node.items():
+            if type(value) is dict:
+                for name, values in walk(value, path + (key,)).items():
+                    found.setdefault(name, []).extend(values)
+        index[path] = {name: (node[name],) if name in node else tuple(values)
+                       for name, values in found.items()}
+        for name in node:
+            index[path].setdefault(name, (node[name],))
+        return found
+    walk(tree, ())
+    return index
+
+def resolve_menu(menu):
+    """
+    Find the controls for a menu, including the brand specific controls for network menus.
+    Args:
+        menu: (str) The name of the menu in controls.json (lowercase).
+    Returns: (tuple) The path of the menu's controls in the control index, and the controls themselves.
+    Throws:
+        MWSMapException: If the menu or its brand controls are not mapped.
+    """
+    tree, _ = get_controls_map()
+    try:
+        menu_controls = tree[menu]
+    except KeyError:
+        log.error(menu+" has not been added to the controls.json file")
+        raise MWSMapException(f"{menu} is not mapped in controls.json.")
+    path = (menu,)
+
+    # Handle network menus
+    if menu_controls.get('network', False):
+        log.debug("Loading controls for network menu")
+        brand = system.get_brand()
+        brand_keys = [key for key in menu_controls.keys() if brand.upper() in key.upper()]
+        if len(brand_keys) > 1:
+            log.error("Failed to find the brand network controls")
+            raise MWSMapException(f"{brand} does not have a map for {menu} in controls.json.")
+        elif brand_keys:
+            path += (brand_keys[0],)
+            menu_controls = menu_controls[brand_keys[0]]
+        log.debug("Reading the process from the controls.json file")
+    return path, menu_controls
+
 def create_connection():
     global process_conn
     p = get_active_window()
@@ -136,11 +214,7 @@ def is_high_resolution():
         >>> is_high_resolution()
         True
     """
-    try:
-        resolution_subkey = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, constants.RES_SUBKEY, 0, winreg.KEY_ALL_ACCESS)
-        return not bool(int(winreg.QueryValueEx(resolution_subkey, 'UseLowerResolution')[0]))
-    except FileNotFoundError:
-        return False
+    return system.profile().high_resolution
 
 #@TODO: Move to test_harness?
 class MWSMapException(Exception):
@@ -153,25 +227,35 @@ class ConnException(Exception):
         system.takescreenshot()
         self.message = msg
 
+def _ui_events(proc_name="Eclipse.exe"):
+    """
+    Get a trigger for waits.poll that wakes when a process's windows change.
+    Args:
+        proc_name: (str) The process whose windows are being waited on.
+    Returns:
+        WinEventTrigger: The trigger, or None if the process isn't running (the wait just polls).
+    """
+    if not proc_name:
+        return None
+    registry = system.processes()
+    pids = [pid for name in registry.find(proc_name) for pid in registry.running.get(name, ())]
+    return waits.win_event_trigger(min(pids)) if pids else None
+
 def get_active_window(timeout=45):
     """Return a pywinauto connection to the currently active MWS window."""
     if not system.process_wait(process, timeout):
         log.warning("%s did not start within %s seconds."
                                     %(process, str(timeout)))
         return None
-    start_time = time.time()
-    while time.time() - start_time < timeout:
-        try:
-            app = Application().connect(path = process)
-            break
-        except pywinauto.application.ProcessNotFoundError:
-            continue
-    else:
+    end = waits.deadline(timeout)
+    app = waits.poll(lambda: Application().connect(path = process), end, until=lambda r: r is not None,
+                     exceptions=(pywinauto.application.ProcessNotFoundError,), name="get_active_window.connect")
+    if app is None:
         log.warning(f"Process {process} was not found within {timeout} seconds.")
         return False
 
     activate_coords = [4,170]
-    while time.time() - start_time < timeout:
+    def activate():
         for window in app.windows():
             if window.is_visible() and float(window.style()) > 0:
                 pywinauto.mouse.click(coords=activate_coords)
@@ -181,9 +265,13 @@ def get_active_window(timeout=45):
                         return active
                 except RuntimeError:
                     log.debug(f"{window} not active after clicking {activate_coords}.")
-                    pass
-    else:
-        log.warning(f"{process} was found, but couldn't activate and retrieve its window within {timeout} seconds.")    
+        return None
+
+    active = waits.poll(activate, end, until=lambda r: r is not None,
+                        trigger=_ui_events(process), name="get_active_window.activate")
+    if active is None:
+        log.warning(f"{process} was found, but couldn't activate and retrieve its window within {timeout} seconds.")
+    return active
 
 def init_sub_menu2():
     """Connect to a submenu with a different process name from the top-level menu."""
@@ -248,48 +336,51 @@ def get_control(control, tab=None, timeout=default_timeout):
         else:
             raise ControlNotFoundError(f"{control} maps to an invalid control id type: {type(ctrl_id)}")
 
-    data = controls
     # Look in desired submenu if specified
+    path = controls_path
     if tab is not None:
         if type(tab) is not list:
             tab = [tab]
-        for t in tab:
-            data = data[t]
-
-    # Get control ID
-    try:
-        resolved_control = data[control] # Prioritize a top level control
-    except KeyError:
-        resolved_control = search_dict(data, control) # Search through lower levels
-        if len(resolved_control) == 0:
-            raise ControlNotFoundError("Control name %s was not found." % control)
-        elif len(resolved_control) > 1:
-            raise ControlAmbiguousError("%s matched multiple control IDs: %s. Please specify the "
-                                        "tab parameter for the desired control." % (control, resolved_control))
-        resolved_control = resolved_control[0]
+        path += tuple(tab)
+    _, index = get_controls_map()
+    if path not in index:
+        raise KeyError(f"{path[-1]} is not a submenu of {current_menu} in controls.json.")
+
+    # Get control ID. A top level control takes priority over lower levels.
+    resolved_control = index[path].get(control, ())
+    if len(resolved_control) == 0:
+        raise ControlNotFoundError("Control name %s was not found." % control)
+    elif len(resolved_control) > 1:
+        raise ControlAmbiguousError("%s matched multiple control IDs: %s. Please specify the "
+                                    "tab parameter for the desired control." % (control, list(resolved_control)))
+    resolved_control = resolved_control[0]
 
     ctrl_wrapper = get_ctrl_wrapper(resolved_control)
 
-    start_time = time.time()
-    while time.time() - start_time <= timeout:
+    end = waits.deadline(timeout)
+    last_e = None
+    def connect_ctrl():
+        nonlocal ctrl_wrapper, last_e
         try:
             ctrl_wrapper.control_id()
-            break
+            return True
         except:
-            create_connection()           
+            create_connection()
             try:
                 ctrl_wrapper = get_ctrl_wrapper(resolved_control)
                 ctrl_wrapper.control_id()
-                break
+                return True
             except:
-                init_sub_menu2()                
+                init_sub_menu2()
                 try:
                     ctrl_wrapper = get_ctrl_wrapper(resolved_control)
                     ctrl_wrapper.control_id()
-                    break
+                    return True
                 except Exception as e:
                     last_e = e
-    else:
+                    return False
+
+    if not waits.poll(connect_ctrl, end, trigger=_ui_events(process), name="get_control.connect"):
         log.warning(f"Couldn't get the control for {control}. Raising the most recent exception.")
         raise last_e
 
@@ -299,14 +390,9 @@ def get_control(control, tab=None, timeout=default_timeout):
         init_sub_menu2()
         ctrl_wrapper = get_ctrl_wrapper(resolved_control)
 
-    timeout = timeout - (time.time() - start_time)
-    if timeout < 0 :
-        timeout = 0 # So we won't time out without trying once
-    start_time = time.time()
-    while time.time() - start_time <= timeout:
-        if is_inbounds(ctrl_wrapper.rectangle().mid_point()):
-            break
-    else:
+    # Share the remaining time. poll tries once even if it's already used up.
+    if not waits.poll(lambda: is_inbounds(ctrl_wrapper.rectangle().mid_point()), end,
+                      trigger=_ui_events(process), name="get_control.inbounds"):
         print(f"{control} control is not currently on screen. Please ensure you are on the correct tab or try specifying the tab parameter.")
         return None
 
@@ -325,18 +411,18 @@ def search_dict(data, key):
         >>> search_dict({"General": {"Store Number": 32, "Store Name": 31}, "Password": {"Password Required": "SSCheckWndClass16"}}, "Store Name")
         31
     """
-    if type(data) is not dict:
+    if not isinstance(data, Mapping):
         return []
     values = []
     try:
         ret = data[key]
-        if type(ret) is not dict:
+        if not isinstance(ret, Mapping):
             values.append(ret)
     except KeyError:
         pass
     for submenu in data.keys():
         ret = search_dict(data[submenu], key)
-        if ret is not None and type(ret) is not dict:
+        if ret is not None and not isinstance(ret, Mapping):
             values.extend(ret)
     return values
 
@@ -699,18 +785,16 @@ def wait_for_button(button, timeout = 30):
         >>> wait_for_button("Add")
         True
     """
-    # Let's go ahead and wait in between
-    start_time = time.time()
-
     main_window = Application(backend="uia").connect(path="Eclipse.exe")['MainWindow']
 
-    while time.time() - start_time < timeout:
+    def is_visible():
         try:
-            if main_window.window(title_re=f"button(?i){button.replace(' ', '')}", control_type="Button").is_visible():
-                break
+            return main_window.window(title_re=f"button(?i){button.replace(' ', '')}", control_type="Button").is_visible()
         except pywinauto.findwindows.ElementNotFoundError:
             log.debug(f"Could not find {button} button")
-    else:
+            return False
+
+    if not waits.poll(is_visible, timeout, trigger=_ui_events(), name="wait_for_button"):
         log.error(f"Timed out waiting for {button} to appear.")
         return False
 
@@ -951,12 +1035,7 @@ def is_inbounds(coords, res=(1024, 768) if is_high_resolution() else (800, 600),
         >>> is_inbounds((938, 543), (1920, 1080))
         True
     """
-    start_time = time.time()
-    while time.time() - start_time <= timeout:
-        if coords[0] > 0 and coords[1] > 0 and coords[0] < res[0] and coords[1] < res[1]:
-            return True
-    else:
-        return False
+    return bool(waits.poll(lambda: 0 < coords[0] < res[0] and 0 < coords[1] < res[1], timeout, name="is_inbounds"))
 
 def click(name, tab=None, timeout=default_timeout):
     """
@@ -988,6 +1067,7 @@ def click(name, tab=None, timeout=default_timeout):
 def config_flexgrid(control, config, offset, tab = None, max_dist = 0, instances = {}):
     """
     Configure a FlexGrid control (like the one in Department Maintenance > Tender Restrictions) using OCR.
+    The grid is read one page at a time, top to bottom, and every change on a page is made before scrolling to the next.
     Note that Period Maintenance > Store Close Reports and similar grids are NOT FlexGrids.
     Args:
         control: (str) The name of the FlexGrid control in controls.json.
@@ -995,6 +1075,7 @@ def config_flexgrid(control, config, offset, tab = None, max_dist = 0, instances
         offset: (int/list) Pixel distance from the left edge of the FlexGrid to the left edge of the Xs,
                 or a list of offsets to configure multiple columns.
         tab: (str) The name of the tab the FlexGrid control is on. Defaults to None. It is required for some lists
+        max_dist: (int) The maximum Levenshtein distance between a field and the text read from its row.
         instances: (dict) A str: int map indicating which instance of each string to use. Needed to configure rows such as
                    "Fuel Grade Movement" whose text is present in multiple other rows. See examples.
     Returns:
@@ -1013,127 +1094,68 @@ def config_flexgrid(control, config, offset, tab = None, max_dist = 0, instances
         True
     """
     offset = [offset] if type(offset) is not list else offset
-
-    # Scroll up
-    get_control(control, tab).scroll("up", "end")
-    
-    # Object storing the coordinates of the list on the screen
-    rectangle = get_control(control, tab).get_properties()['rectangle']
-    
-    # Calculate the bbox for the list rows that are visible
-    # The height of list header is about 21px
-    # The width of field column if provided via offset
-    list_bbox = (rectangle.left, rectangle.top + 21, rectangle.left + offset[0], rectangle.bottom)
-
-    # bbox of the last row currently visible in the list
-    # The top edge of the row is about 22px up the bottom of the list 
-    bot_row_bbox = (rectangle.left, rectangle.bottom - 22, rectangle.left + offset[0], rectangle.bottom)
-
-    # Find how many rows are on the screen for scrolling purposes
-    fields = OCR.OCRRead(bbox=list_bbox).split('\n')
-
-    # Remove empty strings
-    fields = list(filter(None, fields))
+    remaining = dict(config)
+    skipped = {}
 
     # We don't have means to interact directly with FlexGrid. Use OCR instead.
-    for field, settings in config.items():
-        settings = [settings] if type(settings) is not list else settings
-        try:
-            instance = instances[field]
-        except KeyError:
-            instance = 1
-
-        row_coords = None
-
-        while row_coords is None:
-            # Obtain potential coordinates
-            row_coords = search_click_ocr(field, click_loc=OCR.LEFT, clicks=0, instance=instance, bbox=list_bbox, max_dist=max_dist)
-
-            if row_coords:
-                # Construct a bbox for the selected field to verify full match
-                field_bbox = (list_bbox[0], row_coords[1] - 10, list_bbox[2],  row_coords[1] + 8)
-
-                if field.replace(' ', '').lower() != OCR.OCRRead(bbox=field_bbox, psm=3).replace(' ', '').lower():
-                    # Try other instances
-                    row_coords = None
-                
-                    # Starting from i = 1 does repeat instance = 1 in some cases, but guarantees correct functionality
-                    for i in range(1, 12):
-                        row_coords = search_click_ocr(field, click_loc=OCR.LEFT, clicks=0, instance=i, bbox=list_bbox, max_dist=max_dist)
-
-                        if row_coords == None:
-                            # No other instances are there
-                            break
-
-                        # Construct a bbox for the selected field to verify full match
-                        field_bbox = (list_bbox[0], row_coords[1] - 10, list_bbox[2],  row_coords[1] + 8)
-
-                        if field.replace(' ', '').lower() != OCR.OCRRead(bbox=field_bbox, psm=3).replace(' ', '').lower():
-                            # Wrong entry
-                            row_coords = None
-                        else:
-                            # Target entry acquired
-                            break
-                
-            # Scroll down by the number of visible rows if nothing was found during first iteration
-            if not row_coords:
-                # Get the text from the bottom row to check if we already hit the bottom
-                bottom_row_text = OCR.OCRRead(bbox=bot_row_bbox)
-
-                for _ in range(len(fields)):
-                    get_control(control, tab).scroll("down", "line")
-            
-
-                if bottom_row_text == OCR.OCRRead(bbox=bot_row_bbox):
-                    # We are at the bottom and nothing was found
-                    log.warning(f"Couldn't find {field} in the FlexGrid.")
-                    return False
+    _config_flexgrid_pages(control, remaining, offset, tab, max_dist, instances, skipped)
+    # Fields whose requested instance wasn't the field itself fall back to the first row that is, like search_click_ocr did
+    fallback = {field: remaining.pop(field) for field in list(remaining) if field in skipped}
+    if fallback:
+        log.debug(f"Requested instances of {list(fallback)} weren't exact matches. Using the first exact match instead.")
+        _config_flexgrid_pages(control, fallback, offset, tab, max_dist, {}, {})
+        remaining.update(fallback)
 
-        for i in range(len(settings)):
-            # Check for the type of action
-            # True and False mean 'check' and 'uncheck'
-            # Other types of argument mean double click and type
-            if type(settings[i]) is bool:
-                x_coords = (row_coords[0]+offset[i], row_coords[1])
-                x_bbox = (x_coords[0], x_coords[1]-10, x_coords[0]+20, x_coords[1]+7)
-                if find_text_ocr('X', bbox=x_bbox, psm=10):
-                    if not settings[i]:
-                        log.debug(f"{field} column {i} is checked. Clicking to uncheck.")
+    get_control(control, tab).scroll("up", "end")
+    for field in remaining:
+        log.warning(f"Couldn't find {field} in the FlexGrid.")
+    return not remaining
+
+def _config_flexgrid_pages(control, remaining, offset, tab, max_dist, instances, skipped):
+    """Make the changes in remaining on the pages of a FlexGrid, removing each field from remaining once it's configured."""
+    counts = {}
+    for rows in flexgrid_pages(control, offset, tab):
+        for row in rows:
+            field = _flexgrid_field(row, remaining, instances, counts, max_dist, skipped)
+            if field is None:
+                continue
+            settings = remaining.pop(field)
+            settings = [settings] if type(settings) is not list else settings
+            for i in range(len(settings)):
+                x_coords = (row['left']+offset[i], row['y'])
+                # Check for the type of action
+                # True and False mean 'check' and 'uncheck'
+                # Other types of argument mean double click and type
+                if type(settings[i]) is bool:
+                    if row['checked'][i] != settings[i]:
+                        log.debug(f"{field} column {i} is {'checked' if row['checked'][i] else 'unchecked'}. Clicking to change it.")
                         pywinauto.mouse.click(coords=x_coords)
                     else:
-                        log.debug(f"{field} column {i} is checked. Leaving it alone.")
-                elif settings[i]:
-                    log.debug(f"{field} column {i} is unchecked. Clicking to check.")
-                    pywinauto.mouse.click(coords=x_coords)
+                        log.debug(f"{field} column {i} is already {'checked' if settings[i] else 'unchecked'}. Leaving it alone.")
                 else:
-                    log.debug(f"{field} column {i} is unchecked. Leaving it alone.")
-            else:
-                x_coords = (row_coords[0]+offset[i], row_coords[1])
-
-                # Send double click
-                pywinauto.mouse.double_click(coords=x_coords)
-
-                # Erase the input, type new input in and Send Enter
-                pywinauto.keyboard.send_keys('{BS 20}' + str(settings[i]) + '{ENTER}')
+                    # Send double click
+                    pywinauto.mouse.double_click(coords=x_coords)
 
-        get_control(control, tab).scroll("up", "end")
-
-
-    return True
+                    # Erase the input, type new input in and Send Enter
+                    pywinauto.keyboard.send_keys('{BS 20}' + str(settings[i]) + '{ENTER}')
+        if not remaining:
+            break
 
-def read_flexgrid(control, fields, offset, instances):
+def read_flexgrid(control, fields, offset, instances={}, tab=None):
     """
     Get the status of one or more fields in a FlexGrid control (like the one in Department Maintenance > Tender Restrictions) using OCR.
     Note that Period Maintenance > Store Close Reports and similar controls are NOT FlexGrids.
     Args:
         control: (str) The name of the FlexGrid control in controls.json.
-        fields: (str) The text(s) of the rows to get the status of.
+        fields: (list) The text(s) of the rows to get the status of. None gets every row.
         offset: (int/list) Pixel distance from the left edge of the FlexGrid to the left edge of the Xs.
                 Use a list of ints to get multiple columns at once.
+        tab: (str) The name of the tab the FlexGrid control is on. Defaults to None.
         instances: (dict) A str: int map indicating which instance of each string to use. Needed to configure rows such as
                    "Fuel Grade Movement" whose text is present in multiple other rows. See examples.
     Returns:
         dict: The requested fields and a list of their values. None if a requested field can't be found.
+              With fields=None, every row's text (without spaces) and its values. Only the first of rows with the same text is kept.
     Examples:
         >>> fields = ["driveOff", "houseCharges", "outsideAuxilliaryDebit", "credit"]
         >>> read_flexgrid("Tender Restrictions List", fields, department.DEPT_FG_OFFSET)
@@ -1149,28 +1171,156 @@ def read_flexgrid(control, fields, offset, instances):
         {"Fuel Grade Movement": [True, True], "Item Sales Movement": [True, False], "Tax Level Movement by Till": [False, True] }
     """
     offset = [offset] if type(offset) is not list else offset
-    ret = { field: [] for field in fields }
+    remaining = {field: None for field in fields} if fields is not None else None
+    ret = {}
+    counts = {}
+    skipped = {}
+    for rows in flexgrid_pages(control, offset, tab):
+        for row in rows:
+            if remaining is None:
+                ret.setdefault(row['text'], list(row['checked']))
+                continue
+            field = _flexgrid_field(row, remaining, instances, counts, skipped=skipped)
+            if field is not None:
+                del remaining[field]
+                ret[field] = list(row['checked'])
+        if remaining is not None and not remaining:
+            break
+    get_control(control, tab).scroll("up", "end")
+
+    # Fields whose requested instance wasn't the field itself fall back to the first row that is
+    for field in [field for field in remaining or [] if field in skipped]:
+        del remaining[field]
+        ret[field] = list(skipped[field]['checked'])
+
+    if remaining:
+        for field in remaining:
+            log.error(f"Couldn't find {field} in the FlexGrid.")
+        return None
+    return ret if fields is None else {field: ret[field] for field in fields}
+
+# FlexGrid layout, in pixels
+FG_HEADER_HEIGHT = 21    # Height of the column headers
+FG_CHECK_WIDTH = 20      # Width of the area an X is drawn in, from the column offset
+FG_CHECK_INK = 96        # How far from the cell's background a pixel must be to be part of an X
+FG_CHECK_MIN_PIXELS = 6  # Pixels of ink that make a checked box
+
+def flexgrid_pages(control, offset, tab=None):
+    """
+    Read a FlexGrid control a page at a time, from the top. The page is captured once,
+    its text read with one OCR call and its checkboxes read from the pixels of the same capture.
+    The grid is scrolled by a page between pages, so rows can be clicked while their page is current.
+    The bottom of the grid is reached when scrolling no longer moves the page.
+    Args:
+        control: (str) The name of the FlexGrid control in controls.json.
+        offset: (int/list) Pixel distance from the left edge of the row text to the left edge of the Xs,
+                or a list of offsets for multiple columns.
+        tab: (str) The name of the tab the FlexGrid control is on. Defaults to None.
+    Returns:
+        generator: A list of the new rows on each page. Each row is a dict with 'text' (without spaces),
+                   'left' and 'y' (screen coordinates of the start of its text) and 'checked' (a bool per offset).
+    Examples:
+        >>> for rows in flexgrid_pages("Tender Restrictions List", department.DEPT_FG_OFFSET):
+        ...     print([(row['text'], row['checked']) for row in rows])
+        [('cash', [False]), ('check', [False]), ('credit', [True]), ...]
+    """
+    offset = [offset] if type(offset) is not list else offset
+    grid = get_control(control, tab)
+    grid.scroll("up", "end")
+    rectangle = grid.get_properties()['rectangle']
+    page_bbox = (rectangle.left, rectangle.top + FG_HEADER_HEIGHT, rectangle.right, rectangle.bottom)
+
+    img = OCR.grabScreen(page_bbox)
+    previous, before = [], None
+    while img is not None:
+        if before is not None and _same_image(img, before):
+            return # Scrolling didn't move the page, so the last page was the bottom of the grid
+        rows = _read_flexgrid_page(img, page_bbox, offset)
+        if not rows:
+            return
+        # The last scroll stops short at the bottom of the grid, leaving some of the previous page in view
+        overlap = _flexgrid_overlap(previous, before, rows, img, page_bbox) if previous else 0
+        yield rows[overlap:]
+        previous = rows
+        # Capture again after the caller is done with the page, as it may have changed the checkboxes
+        before = OCR.grabScreen(page_bbox)
+        if before is None:
+            return
+        grid.scroll("down", "line", count=len(rows))
+        img = OCR.grabScreen(page_bbox)
+
+def _read_flexgrid_page(img, page_bbox, offset):
+    text_bbox = (page_bbox[0], page_bbox[1], page_bbox[0] + offset[0], page_bbox[3])
+    text_img = OCR.processImage(img.crop((0, 0, offset[0], img.size[1])))
+    rows = []
+    for text, left, y in OCR.imageTextLines(text_img, text_bbox):
+        checked = [_flexgrid_checked(img, (left + col_offset - page_bbox[0], y - page_bbox[1])) for col_offset in offset]
+        rows.append({'text': text, 'left': left, 'y': y, 'checked': checked})
+    return rows
+
+def _same_image(a, b):
+    return a.size == b.size and ImageChops.difference(a.convert('RGB'), b.convert('RGB')).getbbox() is None
+
+def _flexgrid_overlap(previous, before, rows, img, page_bbox):
+    """
+    How many rows at the top of a page were already on the previous one. Rows with the same text can
+    legitimately repeat, so an overlap only counts if the capture before scrolling, shifted by the
+    distance between the rows, matches the new capture.
+    """
+    prev_texts = [row['text'] for row in previous]
+    texts = [row['text'] for row in rows]
+    width, height = img.size
+    for k in range(min(len(texts), len(prev_texts)), 0, -1):
+        if prev_texts[-k:] != texts[:k]:
+            continue
+        shift = previous[-k]['y'] - rows[0]['y']
+        # OCR places a line to within a pixel or two
+        for s in (shift, shift - 1, shift + 1, shift - 2, shift + 2):
+            if 0 < s < height and _same_image(before.crop((0, s, width, height)), img.crop((0, 0, width, height - s))):
+                return k
+    return 0
+
+def _flexgrid_checked(img, coords):
+    """Whether there's an X at coords in a page capture. Counts the pixels far from the cell's background."""
+    x, y = coords
+    box = (x + 3, y - 6, x + FG_CHECK_WIDTH - 3, y + 5)
+    cell = img.crop(box).convert('RGB')
+    pixels = list(cell.getdata())
+    if not pixels:
+        return False
+    background = max(set(pixels), key=pixels.count)
+    ink = sum(1 for pixel in pixels if max(abs(a - b) for a, b in zip(pixel, background)) > FG_CHECK_INK)
+    return ink >= FG_CHECK_MIN_PIXELS
+
+def _flexgrid_field(row, fields, instances, counts, max_dist=0, skipped=None):
+    """
+    Find which of the fields a row is. Like search_click_ocr, every row containing a field's text counts as
+    an instance of it, so "Fuel Grade Movement": 4 is the fourth row with that text in it, but only a row
+    that is the whole field is returned. counts keeps how many rows have contained each field so far.
+    Args:
+        skipped: (dict) Filled with each field mapped to its first whole-row match, if that came before the
+                 requested instance. The caller falls back to it if the requested instance isn't the field itself.
+    Returns: (str) The field, or None if the row isn't one of them (or not the requested instance of it).
+    """
+    text = row['text'].lower()
     for field in fields:
-        try:
-            instance = instances[field]
-        except KeyError:
-            instance = 1
-        row_coords = search_click_ocr(field, click_loc=OCR.LEFT, clicks=0, instance=instance)
-        if row_coords is None: # Scroll down and try again
-            get_control(control).scroll("down", "end")
-            row_coords = search_click_ocr(field, click_loc=OCR.LEFT, clicks=0, instance=instance)
-            if row_coords is None:
-                log.error(f"Couldn't find {field} in the FlexGrid.")
-                return None
-        for col_offset in offset:
-            x_coords = (row_coords[0]+col_offset, row_coords[1])
-            x_bbox = (x_coords[0], x_coords[1]-10, x_coords[0]+20, x_coords[1]+7)
-            if find_text_ocr('X', bbox=x_bbox):
-                ret[field].append(True)
-            else:
-                ret[field].append(False)
-        get_control(control).scroll("up", "end")
-    return ret
+        target = field.replace(' ', '').lower()
+        whole = text == target or (max_dist and abs(len(text) - len(target)) <= max_dist
+                                   and OCR.closestMatch(text, target, max_dist)[1] <= max_dist)
+        if not whole and target not in text:
+            continue
+        counts[field] = counts.get(field, 0) + 1
+        if not whole:
+            continue
+        instance = instances.get(field, 1)
+        if counts[field] == instance:
+            return field
+        if counts[field] < instance:
+            if skipped is not None:
+                skipped.setdefault(field, row)
+        elif skipped is None or field not in skipped:
+            return field # The requested instance wasn't the field itself. This is the first row that is
+    return None
 
 def click_toolbar(button, timeout=2, main=False, main_wait=10, submenu=False):
     """
@@ -1318,17 +1468,21 @@ def verify_top_bar_text(text, timeout=10):
     app = Application(backend = 'uia').connect(path = "Eclipse.exe")
     window = app['MainWindow']
     text = text.lower()
-    start_time = time.time()
-    while time.time() - start_time < timeout:
+    msg_viewer_str = None
+    top_bar_found = False
+    def top_bar_matches():
+        nonlocal msg_viewer_str, top_bar_found
         try:
             msg_viewer_str = window.window(auto_id="scrollViewerMessage").texts()[0].lower()
         except pywinauto.findwindows.ElementNotFoundError:
             top_bar_found = False
-            continue
+            return False
         top_bar_found = True
-        if text == msg_viewer_str:
-            log.debug(f"'{text}' matches '{msg_viewer_str}' in the MWS top bar.")
-            return True
+        return text == msg_viewer_str
+
+    if waits.poll(top_bar_matches, timeout, trigger=_ui_events(), name="verify_top_bar_text"):
+        log.debug(f"'{text}' matches '{msg_viewer_str}' in the MWS top bar.")
+        return True
 
     log.info(f"'{text}' was not found in the MWS top bar within {timeout} seconds.")
     log.info(f"The last message in the top bar was {msg_viewer_str}.")
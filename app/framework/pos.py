@@ -93,6 +93,7 @@ def connect(timeout=60, recover=False):
     if not system.process_wait("RunIt.exe", timeout):
         raise POSException("The RunIt Process did not activate within %s"
                            " seconds." %(timeout))
+    invalidate_key_index()
     window = Application(backend='uia').connect(path='RunIt.exe')
     msg_bar = window["Status Line"]
     func_keys = window['POS function keys']
@@ -2131,6 +2132,7 @@ def sign_on(user_credentials=None, till_amount=None, reason=None):
         >>> sign_on(('123', 'TheWrongPassword'))
         False
     '''
+    invalidate_key_index()
     if is_signed_on():
         logger.debug("Already signed on to POS.")
         return True
@@ -2520,20 +2522,8 @@ def click_speed_key(key, timeout=default_timeout, case_sens=False):
                 logger.warning("Unable to open speed keys.")
                 return False
         speedkey.wait('exists', 2)
-        if click_key(speedkey, key, 0, case_sens):
+        if _click_paged_key(speedkey, "speed", key, case_sens):
             return True
-        else:
-            key_15 = speedkey.children()[15]
-            key_14 = speedkey.children()[14]
-            while key_15.is_visible() and key_15.texts() == ['MORE']:
-                key_15.click()
-                if click_key(speedkey, key, 0, case_sens, False):
-                    return True
-            else:
-                while key_14.is_visible() and key_14.texts() == ['BACK']:
-                    key_14.click()
-                    if click_key(speedkey, key, 0, case_sens, False):
-                        return True
     else:
         logger.warning(f"Couldn't click the speed key {key}.")
         return False
@@ -2568,24 +2558,153 @@ def click_dept_key(key, timeout=default_timeout, case_sens=False):
         except TimeoutError:
             logger.warning("Dept keys did not open within 5 seconds after clicking Dept Keys button.")
             return False
-        if click_key(dept_key, key, 1, case_sens):
+        if _click_paged_key(dept_key, "dept", key, case_sens):
             return True
-        else:
-            key_15 = dept_key.children()[15]
-            key_14 = dept_key.children()[14]
-            while key_15.is_visible() and key_15.texts() == ['MORE']:
-                key_15.click()
-                if click_key(dept_key, key, 0, case_sens, False):
-                    return True
-            else:
-                while key_14.is_visible() and key_14.texts() == ['BACK']:
-                    key_14.click()
-                    if click_key(dept_key, key, 0, case_sens, False):
-                        return True
     else:
         logger.warning(f"Couldn't click the department key {key}.")
         return False
 
+# Layout of the speed and dept key pages, by key type. Built by crawling the pages
+# the first time a key is clicked after sign on, so a key press is a jump to its page and one click.
+# Only texts and positions are kept. The key controls are looked up again for each press.
+key_index = {}
+BACK_POSITION = 14
+MORE_POSITION = 15
+
+def invalidate_key_index():
+    """
+    Forget the layout of the speed and dept key pages. Call after the keys are maintained.
+    Args: None
+    Returns: None
+    """
+    key_index.clear()
+
+def _build_key_index(window):
+    """
+    Crawl the pages of a key window and record where each key is.
+    Args:
+        window: (WindowSpecification) The speed or dept key window.
+    Returns:
+        dict: 'pages', the key texts of each page, and 'keys', key text mapped to (page, position).
+              None if the window has no BACK and MORE keys to page with.
+    """
+    children = window.children()
+    if len(children) <= MORE_POSITION:
+        logger.debug(f"Only {len(children)} keys, not indexing pages")
+        return None
+    back, more = children[BACK_POSITION], children[MORE_POSITION]
+    while back.is_visible() and back.texts() == ['BACK']:
+        back.click()
+
+    pages = []
+    while True:
+        pages.append([child.window_text() if child.is_visible() else '' for child in children])
+        if pages[-1][MORE_POSITION] != 'MORE' or len(pages) > 50:
+            break
+        more.click()
+
+    keys = {}
+    for page_num, texts in enumerate(pages):
+        for position, text in enumerate(texts):
+            if not text or (position, text) in ((BACK_POSITION, 'BACK'), (MORE_POSITION, 'MORE')):
+                continue
+            keys.setdefault(text, (page_num, position))
+    logger.debug(f"Indexed {len(keys)} keys on {len(pages)} pages")
+    return {'pages': pages, 'keys': keys}
+
+def _find_indexed_key(index, key, case_sens):
+    if key in index['keys']:
+        return index['keys'][key]
+    if not case_sens:
+        for text, location in index['keys'].items():
+            if text.lower() == key.lower():
+                return location
+    return None
+
+def _current_key_page(index, children):
+    """Work out which page is showing by matching every visible key text against each indexed page."""
+    texts = [child.window_text() if child.is_visible() else '' for child in children]
+    for page_num, page in enumerate(index['pages']):
+        if page == texts:
+            return page_num
+    return None
+
+def _search_key_pages(window, key, case_sens=False):
+    """
+    Click a key by paging through the window until it shows up, without the key index.
+    Args:
+        window: (WindowSpecification) The speed or dept key window.
+        key: (str) The text of the key.
+        case_sens: (bool) Whether to match the key text with case sensitivity.
+    Returns:
+        bool: True if the key was clicked, False if it isn't on any page.
+    """
+    if click_key(window, key, 0, case_sens):
+        return True
+    children = window.children()
+    if len(children) <= MORE_POSITION:
+        return False
+    back, more = children[BACK_POSITION], children[MORE_POSITION]
+    while more.is_visible() and more.texts() == ['MORE']:
+        more.click()
+        if click_key(window, key, 0, case_sens):
+            return True
+    while back.is_visible() and back.texts() == ['BACK']:
+        back.click()
+        if click_key(window, key, 0, case_sens):
+            return True
+    return False
+
+def _click_paged_key(window, key_type, key, case_sens=False):
+    """
+    Click a speed or dept key, jumping straight to its page.
+    Args:
+        window: (WindowSpecification) The speed or dept key window.
+        key_type: (str) Which index to use, "speed" or "dept".
+        key: (str) The text of the key.
+        case_sens: (bool) Whether to match the key text with case sensitivity.
+    Returns:
+        bool: True if the key was clicked, False if it isn't on any page.
+    """
+    key = str(key)
+    for attempt in range(2):
+        try:
+            index = key_index.get(key_type)
+            if index is None or attempt:
+                index = _build_key_index(window)
+                if index is None:
+                    break
+                key_index[key_type] = index
+            location = _find_indexed_key(index, key, case_sens)
+            if location is None:
+                continue
+            page, position = location
+
+            # Fresh wrappers for this press. The ones from the last press may be for controls that are gone
+            children = window.children()
+            current = _current_key_page(index, children)
+            if current is None:
+                break # The page showing isn't one we indexed
+            step = children[MORE_POSITION] if page > current else children[BACK_POSITION]
+            for _ in range(abs(page - current)):
+                step.click()
+
+            button = children[position]
+            text = button.window_text()
+            if text == key or (not case_sens and text.lower() == key.lower()):
+                button.click()
+                return True
+        except (ElementNotFoundError, COMError, IndexError) as e:
+            logger.debug(f"The {key_type} keys changed while pressing {key}: {e}. Rebuilding the key index.")
+            continue
+        logger.debug(f"Expected {key} at page {page} position {position} but found {text}. Rebuilding the key index.")
+    else:
+        logger.warning(f"Couldn't find the {key_type} key {key} on any page.")
+        return False
+    logger.debug(f"The {key_type} keys don't match the key index. Searching the pages for {key}.")
+    key_index.pop(key_type, None)
+    return _search_key_pages(window, key, case_sens)
+
 @test_func
 def click_message_box_key(key, timeout=default_timeout):
     """
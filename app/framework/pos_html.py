@@ -13,23 +13,19 @@ import logging, re
 import requests
 import functools
 import winreg
-from html.parser import HTMLParser
 
 # Selenium modules
 from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.support.ui import Select
-from selenium.common.exceptions import NoSuchElementException, SessionNotCreatedException, ElementClickInterceptedException, StaleElementReferenceException, WebDriverException
-from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import NoSuchElementException, SessionNotCreatedException, StaleElementReferenceException, WebDriverException
 
 # In house modules
 from app.simulators.ip_scanner import IPScanner
 from app.simulators import printersim
 from app import pinpad
 from app import mws
-from app.util import constants, system
+from app.util import constants, locators, system, waits, webdriver_pool
 from app.framework.tc_helpers import test_func, tc_fail
 
 BRAND   = system.get_brand()
@@ -51,8 +47,7 @@ json_user_credentials   = constants.USER_CREDENTIALS # Change this when we final
 pos_controls_path      = r"D:\automation\app\data\pos_controls.json" # TODO: replace this with a constant
 
 try:
-    with open(pos_controls_path) as f:
-        controls = json.load(f)
+    controls = locators.load_controls(pos_controls_path)
 except Exception as e:
     logger.warning(e)
 
@@ -67,6 +62,7 @@ class FailedToInitialize(Exception):
 
 # Selenium objects
 driver  = None
+finder  = locators.Finder(lambda: driver, trigger=lambda seconds: dom_changed(seconds))
 
 # Scanner object
 scanner = IPScanner()
@@ -139,24 +135,26 @@ def connect(timeout=120, recover=False, url = 'https://127.0.0.1:7500/', printer
             options.add_argument("start-maximized")
             options.add_argument("ignore-certificate-errors")
             options.add_experimental_option('w3c', False)
-            driver = webdriver.Chrome(constants.CHROME_DRIVER, chrome_options=options)
+            session = webdriver_pool.get().acquire("pos", url, options)
         except WindowsError:
             logger.warning(f"Unable to locate {constants.CHROME_DRIVER}")
             return False
         except SessionNotCreatedException as e:
             logger.warning(f"Unable to instantiate chrome driver: {e}")
             return False
+        driver = session.driver
 
         start_time = time.time()
-        while time.time() - start_time <= timeout:
-            try:
-                driver.get(url)
-                break
-            except:
-                logger.warning(f"Unable to open web page. Retrying...")
-        else:
-            logger.warning(f"Unable to open web page within {timeout} seconds.")
-            return False
+        if session.fresh or page_title not in driver.title: # A warm session already has the page open
+            while time.time() - start_time <= timeout:
+                try:
+                    driver.get(url)
+                    break
+                except:
+                    logger.warning(f"Unable to open web page. Retrying...")
+            else:
+                logger.warning(f"Unable to open web page within {timeout} seconds.")
+                return False
 
         # Verify CWS page loads
         if page_title not in driver.title:
@@ -188,17 +186,19 @@ def connect(timeout=120, recover=False, url = 'https://127.0.0.1:7500/', printer
         logger.debug(f"Already connected to a chrome driver instance")
         return True
 
-def close():
+def close(quit=False):
     """
-    Closes chrome driver instance and sets it to None.
+    Hides the chrome driver instance, keeping it warm for the next connect, and sets it to None.
     Args:
-        None
+        quit: (bool) Quit Chrome instead, e.g. when the POS is being restarted.
     Returns:
         None
     """
     global driver
     try:
-        driver.close()
+        if quit or not webdriver_pool.get().release(driver):
+            driver.close()
+            webdriver_pool.get().discard(driver)
     except AttributeError:
         logger.warning("[close] No Chrome driver exists to close.")
     except WebDriverException:
@@ -206,7 +206,7 @@ def close():
     except Exception as e:
         logger.warning(f"[close] Got an unknown exception while closing chrome driver. {type(e).__name__}: {e}")
     finally:
-        driver = None # Guarantee that the next connect() will start a new driver
+        driver = None # Guarantee that the next connect() gets its driver from the pool
 
 def minimize_pos():
     """
@@ -861,14 +861,15 @@ def wait_for_fuel(dispenser = 1, timeout=45):
     '''
     logger.debug(f"Selecting Dispenser #{dispenser}")
     select_dispenser(dispenser)
-    start_time = time.time()
     #Wait for the dispenser status to become 'IDLE'
-    while time.time() - start_time <= timeout:
+    def is_idle():
         diag = read_dispenser_diag()
         logger.debug(diag)
-        if 'IDLE' in diag['Status']:
-            logger.debug("Dispenser is Idle")
-            return True
+        return 'IDLE' in diag['Status']
+
+    if waits.poll(is_idle, timeout, trigger=dom_changed, name="wait_for_fuel"):
+        logger.debug("Dispenser is Idle")
+        return True
     logger.warning("Timed out waiting for the Dispenser to go Idle")
     return False
 
@@ -892,14 +893,16 @@ def wait_for_disp_status(status, dispenser = 1, timeout=60):
 
     select_dispenser(dispenser)
     last_diag = ""
-    start_time = time.time()
-    while time.time() - start_time <= timeout:
+    def has_status():
+        nonlocal last_diag
         diag = read_dispenser_diag()
         if diag != last_diag:
             logger.info(f"Current status is {diag}")
             last_diag = diag
-        if status.upper() in diag['Status'].upper():
-            return True
+        return status.upper() in diag['Status'].upper()
+
+    if waits.poll(has_status, timeout, trigger=dom_changed, name="wait_for_disp_status"):
+        return True
     logger.warning(f"Dispenser did not have status {status} within {timeout} seconds.")
     return False
 
@@ -1267,7 +1270,7 @@ def manual_entry(brand='Core', card_name='Visa', expiration_date=None, zip_code=
     return _process_payment(card_name, payload)
 
 @test_func
-def check_receipt_for(values, rcpt_num=1, dispenser=None, timeout=default_timeout):
+def check_receipt_for(values, rcpt_num=1, dispenser=None, timeout=default_timeout, printed=False, after=None):
     """
     Verify that a receipt contains a specific value or set of values. Ignores whitespace.
     Args:
@@ -1275,6 +1278,9 @@ def check_receipt_for(values, rcpt_num=1, dispenser=None, timeout=default_timeou
         rcpt_num: (int) Position of the receipt in the receipt list. Default is 1, the most recent receipt.
         dispenser: (int) Which dispenser to verify the receipt from, if any. None is indoor receipt search.
         timeout: (int) How long to repeat the search for before returning False.
+        printed: (bool) Check the receipt printer simulator's history instead of going through receipt search.
+                 rcpt_num then counts printed receipts, which skips transactions that didn't print.
+        after: (int) With printed, printer.receipt_count from before the transaction. Waits for the next receipt to print.
         verify: (bool) Whether or not to fail the current test case if this function fails. Defaults to True.
     Returns:
         bool: True if all values are verified, False if not
@@ -1285,10 +1291,23 @@ def check_receipt_for(values, rcpt_num=1, dispenser=None, timeout=default_timeou
         False
         >>> check_receipt_for(["Plus CA PUMP# 1", "5.000 GAL @ $1.000/GAL", "$5.00"], dispenser=1, rcpt_num=2)
         True
+        >>> count = printer.receipt_count
+        >>> pay()
+        >>> check_receipt_for("Generic Item $0.01", printed=True, after=count)
+        True
     """
     if type(values) is not list:
         values = [values]
 
+    if printed:
+        actual_rcpt = read_printed_receipt(rcpt_num, timeout, after)
+        lines_not_found = _missing_receipt_values(values, actual_rcpt)
+        if not lines_not_found:
+            return True
+        logger.info(f"The printed receipt is: {actual_rcpt}")
+        logger.warning(f"Did not find {lines_not_found} in the printed receipt.")
+        return False
+
     attempts = 0
     start_time = time.time()
     lines_not_found = []
@@ -1302,14 +1321,9 @@ def check_receipt_for(values, rcpt_num=1, dispenser=None, timeout=default_timeou
             click_function_key("Receipt Search", timeout, verify=False)
         select_receipt(rcpt_num, verify=False)
         actual_rcpt = read_receipt()
-        ret = True
-        for value in values:
-            value = value.replace(' ', '')
-            # List comprehension to search every line of the receipt while ignoring whitespace
-            if not any([value in line.replace(' ', '') for line in actual_rcpt]):
-                lines_not_found.append(value)
-                logger.debug("Did not find %s in the receipt." % value)
-                ret = False
+        missing = _missing_receipt_values(values, actual_rcpt)
+        lines_not_found.extend(missing)
+        ret = not missing
         attempts += 1
         if ret:
             click_function_key("Back")
@@ -1581,6 +1595,15 @@ def click_tender_key(key, timeout=default_timeout):
     else:
         return click_key(controls['pay']['type'] % key.lower(), timeout)
 
+def invalidate_key_index():
+    """
+    Forget the layout of the speed and dept key pages. Keys are found by their text on
+    any page here, so there is no index to forget. Kept for the same interface as the classic POS.
+    Args: None
+    Returns: None
+    """
+    pass
+
 @test_func
 def click_speed_key(key, timeout=key_timeout, case_sens=False):
     """
@@ -1847,16 +1870,15 @@ def read_balance(timeout=default_timeout):
     extra_totals_locator = controls['receipt journal']['extra totals']
 
     # Get text contents of the balance
-    start_time = time.time()
-    while time.time() - start_time <= timeout:
+    def read_totals():
         if not _find_element(extra_totals_locator, 0.5):
             if not click_key(balance_locator, 0.5):
                 logger.warning("Unable to expand the list of transaction totals. Some total lines may be missing.")
-        contents = get_text(balance_locator)
-        if contents:
-            break
-    else:
-        logger.warning("Unable to read balance within {timeout} seconds.")
+        return get_text(balance_locator)
+
+    contents = waits.poll(read_totals, timeout, trigger=dom_changed, name="read_balance")
+    if not contents:
+        logger.warning(f"Unable to read balance within {timeout} seconds.")
         return {}
     
     # Convert text contents into a dict
@@ -1938,6 +1960,86 @@ def read_reminder_box(timeout=default_timeout):
     """
     logger.error("read_reminder_box is not yet implemented")
 
+# Reads the journal, receipt, prompt box, keypad display and status line in one round trip.
+# Receipt lines are split per text node and stripped, matching an HTMLParser pass over the receipt's innerHTML.
+SNAPSHOT_SCRIPT = """
+    var locators = arguments[0];
+    function all(xpath) {
+        var result = document.evaluate(xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        var nodes = [];
+        for (var i = 0; i < result.snapshotLength; i++) { nodes.push(result.snapshotItem(i)); }
+        return nodes;
+    }
+    function first(xpath) {
+        return document.evaluate(xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    }
+    function text(node) { return node ? node.innerText : null; }
+    function lines(node) {
+        var out = [];
+        var walker = document.createTreeWalker(node, NodeFilter.SHOW_TEXT);
+        while (walker.nextNode()) {
+            walker.currentNode.data.split('\\n').forEach(function(line) {
+                line = line.trim();
+                if (line) { out.push(line); }
+            });
+        }
+        return out;
+    }
+    var receipt = first(locators.receipt);
+    return {
+        journal: all(locators.journal).map(text),
+        selected: text(first(locators.selected)),
+        receipt: receipt ? lines(receipt) : null,
+        prompt: {
+            header: text(first(locators.prompt_header)),
+            body: text(first(locators.prompt_body)),
+            buttons: all(locators.prompt_buttons).map(text)
+        },
+        keypad: text(first(locators.keypad)),
+        status: text(first(locators.status))
+    };
+"""
+
+def read_snapshot(until=None, timeout=default_timeout):
+    """
+    Read the transaction journal, receipt, prompt box, keypad display and status line
+    with a single script call instead of one WebDriver round trip per element.
+    Args:
+        until: (function) Check applied to each snapshot. Keep re-reading until it passes or the timeout expires.
+        timeout: (int) How long to keep re-reading for, if until is given.
+    Returns:
+        dict: The screen contents. Elements that aren't on screen are None.
+              Journal lines are lists of strings, as read_transaction_journal returns them.
+    Examples:
+        >>> read_snapshot()
+        {'journal': [['Generic Item', '$0.01']], 'selected': ['Generic Item', '$0.01'], 'receipt': None,
+         'prompt': {'header': None, 'body': None, 'buttons': []}, 'keypad': '',
+         'status': 'Press the speed keys to enter items.'}
+        >>> read_snapshot(lambda snap: snap['receipt'])['receipt']
+        ['Header', 'Store Name,  299', ...]
+    """
+    xpaths = {
+        'journal': JOURNAL['lines'],
+        'selected': JOURNAL['selected_line'],
+        'receipt': RECEIPTS['receipt'],
+        'prompt_header': PROMPT['header'],
+        'prompt_body': PROMPT['body'],
+        'prompt_buttons': PROMPT['button'],
+        'keypad': KEYPAD['display'],
+        'status': MENU_BAR['message']
+    }
+    def snapshot():
+        snap = driver.execute_script(SNAPSHOT_SCRIPT, xpaths)
+        snap['journal'] = [line.strip().split('\n') for line in snap['journal'] if line is not None]
+        if snap['selected'] is not None:
+            snap['selected'] = snap['selected'].strip().split('\n')
+        return snap
+
+    if until is None:
+        return snapshot()
+    return waits.poll(snapshot, timeout, until=lambda snap: snap is not None and until(snap),
+                      trigger=dom_changed, exceptions=(WebDriverException,), name="read_snapshot")
+
 def read_transaction_journal(element=None, only_selected=False, timeout=default_timeout):
     """
     Get the text of the transaction journal.
@@ -1954,31 +2056,18 @@ def read_transaction_journal(element=None, only_selected=False, timeout=default_
         ['Item 4', '$3.00']
     """
     if only_selected:
-        line = get_text(controls['receipt journal']['selected_line'], timeout)
-        if line is None:
-            return []
-        return line.split('\n')
+        snap = read_snapshot(lambda snap: snap['selected'], timeout)
+        return snap['selected'] if snap and snap['selected'] else []
 
+    snap = read_snapshot(lambda snap: len(snap['journal']) >= (element or 1), timeout)
+    if not snap or not snap['journal']:
+        return []
     if element:
-        line = get_text(controls['receipt journal']['line_by_instance'] % element, timeout)
-        if line is None:
+        if element > len(snap['journal']):
             return []
-        return line.split('\n')
-    
-    texts = []
-    lines = _find_elements(JOURNAL['lines'], timeout=timeout, visible_only=False)
-    if not lines:
-        return []
-    # Scroll through the list to display the text of each element
-    try:
-        for line in lines:
-            driver.execute_script("arguments[0].scrollIntoView(true);", line)
-            texts.append(line.text)    
-    except StaleElementReferenceException:
-        logger.debug("Got a stale element reference exception while reading receipt journal. Retrying.")
-        return read_transaction_journal(element=element, only_selected=only_selected, timeout=timeout) # Sometimes happens if the page updates, just try again
- 
-    return [text.split('\n') for text in texts]
+        return snap['journal'][element-1]
+
+    return snap['journal']
 
 def read_journal_watermark(timeout=default_timeout):
     """
@@ -2041,24 +2130,33 @@ def read_receipt(timeout=default_timeout):
            '                Change Due  =    $0.00    ', '', 
            'Cash                             $0.01    ', '', '', '', 'Footer']
     """
-    # Implement HTMLParser
-    class ReceiptParser(HTMLParser):
-        def __init__(self):
-            super(ReceiptParser, self).__init__()
-            self.data = []
-
-        def handle_data(self, data):
-            data = data.split("\n")
-            for el in data:
-                el = el.strip()
-                if el:
-                    self.data.append(el)
-
-    receipt_locator = RECEIPTS['receipt']
-    contents = _find_element(receipt_locator, timeout)
-    parser = ReceiptParser()
-    parser.feed(contents.get_attribute('innerHTML'))
-    return parser.data
+    snap = read_snapshot(lambda snap: snap['receipt'] is not None, timeout)
+    if not snap or snap['receipt'] is None:
+        logger.warning(f"No receipt was open within {timeout} seconds.")
+        return []
+    return snap['receipt']
+
+def read_printed_receipt(rcpt_num=1, timeout=default_timeout, after=None):
+    """
+    Get a receipt from the receipt printer simulator. Much faster than reading it through receipt search.
+    Args:
+        rcpt_num: (int) Which printed receipt to read. 1 is the most recent.
+        timeout: (int) How long to wait for a new receipt, if after is given.
+        after: (int) printer.receipt_count from before the receipt was printed. If given, waits for the next receipt.
+    Returns:
+        list: Each line of the receipt, in the same form as read_receipt
+    Examples:
+        >>> read_printed_receipt()
+        ['Header', 'Store Name,  299', '123 Somewhere St', ..., 'Footer']
+    """
+    if after is not None:
+        text = printer.wait_for_receipt(timeout, after)
+    else:
+        text = printer.get_receipt(rcpt_num)
+    if text is None:
+        logger.warning(f"The receipt printer has no receipt {after + 1 if after is not None else rcpt_num}.")
+        return []
+    return [line.strip() for line in text.split('\n') if line.strip()]
 
 def read_keypad_entry(timeout=default_timeout):
     """
@@ -3043,7 +3141,7 @@ def click_key(xpath, timeout=default_timeout):
     Click the HTML element in self checkout that matches the given XPATH.
     Args:
         xpath: XPATH for the desired key. See console_controls.json for pre-mapped paths.
-        timeout: How many seconds to wait for the desired key to be available.
+        timeout: How many seconds to wait for the desired key to be available, or a waits.Deadline to share.
     Returns: (bool) True if success, False if failure
     Examples:
         >>> click_key(controls['function keys']["User Options"])
@@ -3052,40 +3150,7 @@ def click_key(xpath, timeout=default_timeout):
         True
     """
     logger.debug(f"Clicking the element with XPATH {xpath}")
-    start_time = time.time()
-    try:
-        try:
-            element = WebDriverWait(driver, timeout).until(
-                EC.presence_of_element_located((By.XPATH, xpath)))
-        except TimeoutException:
-            logger.warning(f"Element with xpath {xpath} was not found within {timeout} seconds.")
-            return False
-
-        driver.execute_script("arguments[0].scrollIntoView(true);", element)
-    
-        try:
-            element = WebDriverWait(driver, timeout - (time.time()-start_time)).until(
-                EC.element_to_be_clickable((By.XPATH, xpath)))
-        except TimeoutException:
-            logger.warning(f"Element with xpath {xpath} was found but not clickable within {timeout} seconds.")
-            return False   
-
-        while True:
-            try:
-                element.click()
-                break
-            except ElementClickInterceptedException as e:
-                if time.time() - start_time > timeout:
-                    logger.warning(f"Element with xpath {xpath} was found but obscured by another element.")
-                    logger.warning(f"Selenium message: {e}") # This exception actually contains useful information
-                    return False
-
-        return True
-    except StaleElementReferenceException:
-        # Account for situations where the element is present but gets overwritten with an identical element
-        # This can happen when switching function key menus, for example
-        logger.debug("Element became stale after we grabbed it. Restarting the click process.")
-        return click_key(xpath, timeout=timeout - (start_time - time.time()))
+    return finder.click(xpath, timeout)
 
 """
 Helper Functions.
@@ -3134,6 +3199,12 @@ def _process_payment(card_name, payload, decline_transaction_flag, timeout=5):
 
     return True
 
+def dom_changed(seconds):
+    """
+    Trigger for waits.poll. Returns as soon as the POS page changes, or after the given seconds.
+    """
+    return waits.dom_mutation_trigger(driver)(seconds)
+
 def _is_signed_on(timeout=default_timeout):
     """
     Helper function. Checks to see if the user is signed into HTML POS or not.
@@ -3179,6 +3250,18 @@ def _handle_qualifier(qualifier):
         return False
     return click_keypad("Enter", verify=False)
 
+def _missing_receipt_values(values, receipt):
+    """
+    Get the values that aren't in any line of a receipt, ignoring whitespace.
+    """
+    missing = []
+    for value in values:
+        value = value.replace(' ', '')
+        if not any(value in line.replace(' ', '') for line in receipt):
+            logger.debug("Did not find %s in the receipt." % value)
+            missing.append(value)
+    return missing
+
 def _strip_currency(amount):
     """
     Helper function. Strips dollar sign and decimal from a currency string.
@@ -3229,14 +3312,13 @@ def _locate_journal_item(item=None, instance=1, timeout=default_timeout):
         return None
 
 
-def get_text(locator, timeout=default_timeout, type = By.XPATH):
+def get_text(locator, timeout=default_timeout, type = None):
     """
     Helper function. Returns the element's text.
-    Utilizes _find_element()
     Args:
         locator (str): Element's locator
         timeout (int): How long to wait for the window and element to be available.
-        type: the type to use: By.CSS_SELECTOR or By.XPATH
+        type: the type to use: By.CSS_SELECTOR or By.XPATH. Defaults to the locator's own type
     Returns:
         Returns string with text of the element upon success or None otherwise
     Examples:
@@ -3246,54 +3328,40 @@ def get_text(locator, timeout=default_timeout, type = By.XPATH):
         None
     """
     logger.debug("Entered _get_text() method")
-    button = _find_element(locator, type = type, timeout = timeout)
-    if button:
-        try:
-            return button.text
-        except StaleElementReferenceException: # Element changed after we found it. Try again
-            return get_text(locator, timeout, type)
-    return None
+    return finder.get_text(locator, timeout, type)
 
 def _get_text(*args, **kwargs):
     return get_text(*args, **kwargs)
 
-def get_texts(locator, timeout=default_timeout, type = By.XPATH):
+def get_texts(locator, timeout=default_timeout, type = None):
     """
-    Helper function. Returns the element's text.
-    Utilizes _find_elements()
+    Helper function. Returns the text of every element matching the locator, read in one call to the browser.
     Args:
         locator (str): Element's locator
         timeout (int): How long to wait for the window and element to be available.
-        type: the type to use: By.CSS_SELECTOR or By.XPATH
+        type: the type to use: By.CSS_SELECTOR or By.XPATH. Defaults to the locator's own type
     Returns:
-        Returns string with text of the element upon success or None otherwise
+        Returns list of strings with the text of the elements upon success or None otherwise
     Examples:
-        >>> _get_text(SOME_VALID_LOCATOR)
-        'Generic Item'
-        >>> _get_text(SOME_INVALID_LOCATOR)
+        >>> _get_texts(SOME_VALID_LOCATOR)
+        ['Generic Item', '$5.00']
+        >>> _get_texts(SOME_INVALID_LOCATOR)
         None
     """
-    logger.debug("Entered _get_text() method")
-    elts = _find_elements(locator, type = type, timeout = timeout)
-    if elts:
-        try:
-            return [elt.text for elt in elts]
-        except StaleElementReferenceException: # Elements changed after we found them. Try again
-            return get_texts(locator, timeout, type)
-
-    return None
+    logger.debug("Entered _get_texts() method")
+    return finder.get_texts(locator, timeout, type)
 
 def _get_texts(*args, **kwargs):
     return get_texts(*args, **kwargs)
 
-def _find_element(locator, timeout=1, type = By.XPATH):
+def _find_element(locator, timeout=1, type = None):
     """
     Helper function. Finds the element matching the given locator.
     If more than one element matches, use _find_elements instead.
     Args:
         locator (str): Element's locator (CSS or XPATH)
         timeout (int): How long to wait for the window and element to be available.
-        type: the locator type (By.CSS_SELECTOR or By.XPATH)
+        type: the locator type (By.CSS_SELECTOR or By.XPATH). Defaults to the locator's own type
     Returns:
         WebElement: The found element.
     Examples:
@@ -3302,24 +3370,15 @@ def _find_element(locator, timeout=1, type = By.XPATH):
         >>> _find_element(SOME_INVALID_LOCATOR)
         None
     """
-    elements = _find_elements(locator, timeout, type)
-    if elements:
-        if len(elements) > 1:
-            logger.warning(f"There is more than one element matching the locator {locator}."
-                            "Try a more specific locator, or use _find_elements if this is expected.")
-            return None
-        return elements[0]
-    else:
-        logger.warning("Could not find element with the locator [%s]"%(locator))
-        return None
+    return finder.find_element(locator, timeout, type)
 
-def _find_elements(locator, timeout=1, type = By.XPATH, visible_only=True):
+def _find_elements(locator, timeout=1, type = None, visible_only=True):
     """
     Helper function. Searches the DOM to find the elements you are looking for.
     Args:
         locator (str): Element's locator (CSS or XPATH)
         timeout (int): How long to wait for the element to be visible/existent.
-        type: the locator type (By.CSS_SELECTOR or By.XPATH)
+        type: the locator type (By.CSS_SELECTOR or By.XPATH). Defaults to the locator's own type
         visible_only: (bool) If True, return only visible elements.
     Returns:
         The list of selenium webelements or None
@@ -3329,17 +3388,10 @@ def _find_elements(locator, timeout=1, type = By.XPATH, visible_only=True):
         >>> _find_element(SOME_INVALID_LOCATOR)
         None
     """
-    condition = EC.visibility_of_any_elements_located((type, locator)) if visible_only else EC.presence_of_all_elements_located((type, locator))
-    try:
-        logger.debug("Looking for elements with locator [%s]"%(locator))
-        return WebDriverWait(driver, timeout).until(condition)
-    except TimeoutException:
-        logger.warning(f"No elements with locator {locator} were visible within {timeout} seconds")
-        return None
-    except StaleElementReferenceException: # Sometimes raised if the DOM is modified while we check visibility. Just try again
-        return _find_elements(locator, timeout, type)
+    logger.debug("Looking for elements with locator [%s]"%(locator))
+    return finder.find_elements(locator, timeout, type, visible_only)
 
-def is_element_present(locator, timeout=prompt_timeout, type = By.XPATH):
+def is_element_present(locator, timeout=prompt_timeout, type = None):
     """
     Helper function. Waits for the element/button to be present on the screen.
     Args:
@@ -3354,14 +3406,10 @@ def is_element_present(locator, timeout=prompt_timeout, type = By.XPATH):
         False
     """
     logger.debug("Checking if the element with locator [%s] is present"%(locator))
-    try:
-        WebDriverWait(driver, timeout).until(lambda x: x.find_element(type, locator).is_displayed())
+    if finder.is_present(locator, timeout, type):
         return True
-    except TimeoutException:
-        logger.debug("Element with locator [%s] is not present within %s seconds." % (locator, timeout))
-        return False
-    except StaleElementReferenceException: # Sometimes raised if the DOM is modified while we check visibility. Just try again
-        return is_element_present(locator, timeout, type)
+    logger.debug("Element with locator [%s] is not present within %s seconds." % (locator, timeout))
+    return False
 
 def _is_element_present(*args, **kwargs):
     return is_element_present(*args, **kwargs)
\ No newline at end of file
@@ -11,6 +11,7 @@ except ImportError:
 
 import os
 import sys
+import logging
 import subprocess
 import tempfile
 import shlex
@@ -22,6 +23,7 @@ from functools import wraps
 from pkgutil import find_loader
 from distutils.version import LooseVersion
 from os.path import realpath, normpath, normcase
+from threading import Lock
 
 numpy_installed = find_loader('numpy') is not None
 if numpy_installed:
@@ -32,8 +34,22 @@ pandas_installed = find_loader('pandas') is not None
 if pandas_installed:
     import pandas as pd
 
+tesserocr_installed = find_loader('tesserocr') is not None
+if tesserocr_installed:
+    import tesserocr
+
 # CHANGE THIS IF TESSERACT IS NOT IN YOUR PATH, OR IS NAMED DIFFERENTLY
 tesseract_cmd = 'D:/automation/Program Files/Tesseract-OCR/tesseract.exe'
+# How text and boxes are read. 'subprocess' runs tesseract_cmd for every call.
+# 'api' keeps Tesseract loaded in this process through tesserocr and passes
+# images in memory. 'auto' uses the API when tesserocr is installed and falls
+# back to the subprocess otherwise.
+engine = 'auto'
+API_EXTENSIONS = {'txt', 'box'}
+log = logging.getLogger()
+_apis = {}
+_apis_lock = Lock()
+_api_failed = False
 RGB_MODE = 'RGB'
 OSD_KEYS = {
     'Page number': ('page_num', int),
@@ -197,6 +213,89 @@ def run_tesseract(input_filename,
         raise TesseractError(proc.returncode, get_errors(error_string))
 
 
+def parse_api_config(config):
+    '''
+    Splits a command line config into the tessdata dir, psm and variables
+    the API needs. Returns None if the config has options the API can't apply.
+    '''
+    args = shlex.split(config)
+    options = {'path': None, 'psm': None, 'variables': {}}
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg in ('--psm', '-psm') and i + 1 < len(args):
+            options['psm'] = int(args[i + 1])
+            i += 2
+        elif arg == '--tessdata-dir' and i + 1 < len(args):
+            options['path'] = args[i + 1]
+            i += 2
+        elif arg == '-c' and i + 1 < len(args) and '=' in args[i + 1]:
+            name, value = args[i + 1].split('=', 1)
+            options['variables'][name] = value
+            i += 2
+        elif arg in ('batch.nochop', 'makebox'):
+            # Config files for box output. GetBoxText covers these.
+            i += 1
+        else:
+            return None
+    return options
+
+
+def get_api(path, lang, psm, variables=None):
+    '''
+    Returns a (lock, PyTessBaseAPI) pair for the settings given. Each pair is
+    created once and kept so tessdata stays loaded between calls. Variables
+    (-c name=value) are part of the key and set when the API is created, so
+    one call's variables never carry over to a call made without them.
+    '''
+    variables = dict(variables or {})
+    key = (path, lang, psm, frozenset(variables.items()))
+    with _apis_lock:
+        if key not in _apis:
+            kwargs = {'lang': lang or 'eng'}
+            if path is not None:
+                kwargs['path'] = path
+            if psm is not None:
+                kwargs['psm'] = psm
+            if variables:
+                kwargs['variables'] = variables
+            _apis[key] = (Lock(), tesserocr.PyTessBaseAPI(**kwargs))
+        return _apis[key]
+
+
+def run_api(image, extension, lang=None, config=''):
+    '''
+    Runs OCR through the tesserocr API. Returns None if the API can't be used
+    for this call so the caller can fall back to the subprocess.
+    '''
+    global _api_failed
+    if engine == 'subprocess' or _api_failed or extension not in API_EXTENSIONS:
+        return None
+    if not tesserocr_installed:
+        if engine == 'api':
+            log.warning('tesserocr is not installed. Running tesseract as a subprocess.')
+            _api_failed = True
+        return None
+    if isinstance(image, str):
+        return None
+
+    options = parse_api_config(config)
+    if options is None:
+        return None
+
+    try:
+        lock, api = get_api(options['path'], lang, options['psm'], options['variables'])
+        with lock:
+            api.SetImage(prepare(image))
+            if extension == 'box':
+                return api.GetBoxText(0)
+            return api.GetUTF8Text()
+    except Exception as e:
+        log.warning(f'Tesseract API failed, running tesseract as a subprocess from now on: {e}')
+        _api_failed = True
+        return None
+
+
 def run_and_get_output(image,
                        extension,
                        lang=None,
@@ -204,6 +303,12 @@ def run_and_get_output(image,
                        nice=0,
                        return_bytes=False):
 
+    output = run_api(image, extension, lang, config)
+    if output is not None:
+        if return_bytes:
+            return output.encode('utf-8')
+        return output.strip()
+
     temp_name, input_filename = '', ''
     try:
         temp_name, input_filename = save_image(image)
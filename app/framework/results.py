@@ -2,6 +2,12 @@
 Description: Module holds classes for reporting results of automated runs both
 locally and remotely.
 
+Each test case is appended to a JSON Lines file as it finishes, and uploads
+go through a background queue. The HTML report is rendered once by
+Results.finalize, or on demand from the .jsonl file:
+
+    python app/framework/results.py output/standalone/Regression_results_1.jsonl
+
 Original Author: Kyle Schneiderman
 Date Created: 11/22/2016
 Edited by: Conor McWain
@@ -9,17 +15,25 @@ Date Edited: 3/17/2020
 """
 import requests, datetime, logging, os
 import string, random
+import atexit, json, queue, sys, threading, time
 
 from jinja2 import Environment, FileSystemLoader
 
 log = logging.getLogger()
 
+# Upload settings
+upload_buffer_size = 1000 # Oldest pending uploads are dropped past this
+upload_batch_size  = 20
+upload_timeout     = 10
+upload_retries     = 3
+upload_flush_wait  = 30 # Seconds finalize waits for pending uploads
+
 class Results:
     global indiv_tag
     indiv_tag = False
 
     def initilize(self, brand, version, attempt_num, title = "Regression", location=".\\output\\standalone"):
-        global configuration, run_token, env, data
+        global configuration, run_token, env, data, store, uploader, finalized
 
         log.info(f"Logging results here: {location}")
         # First, any configurations are stored here
@@ -46,6 +60,13 @@ class Results:
             'tests': []
         }
 
+        # output/<test_suite_name>/<build_name>/*_<attempt_num>.jsonl
+        store = ResultStore(f"{configuration['results_loc']}/{data['title']}_results_{data['attempt_num']}.jsonl")
+        store.append({'type': 'run', 'token': run_token,
+                      **{key: data[key] for key in ('brand', 'title', 'date', 'version', 'attempt_num')}})
+        uploader = Uploader(configuration['web_route'])
+        finalized = False
+
     def record(self, test_id, script_name, description, result, run_time, single_tc = False):
         """
         Records the result of a test case into a locally stored results file, as well as on web server
@@ -70,15 +91,17 @@ class Results:
         log.info("Recording result")
         #Gather the information about the test execution
         runTime = run_time.split(":")
-        data['tests'].append({
+        test = {
             'test_id': test_id,
             'script_name': script_name,
             'description': description,
             'run_time': run_time,
             'result': result.capitalize()
-        })
+        }
+        data['tests'].append(test)
         data['runtime'] = data['runtime'] + datetime.timedelta(hours=int(runTime[0]), minutes=int(runTime[1]), seconds=int(runTime[2]))
         #Determine if we want to increment the pass/fail counter by one
+        counted = True
         if single_tc:
             #If logging TCs within methods this will prevent duplicate counting when we log the method
             indiv_tag = True
@@ -88,48 +111,261 @@ class Results:
             if indiv_tag:
                 log.debug("Already logged a test for this method. Not adding to the count.")
                 indiv_tag = False
+                counted = False
             else:
                 data[result] += 1
 
         log.info(f"Adding test: {test_id}, {script_name}, {description}, {run_time}, {result.capitalize()}")
+        store.append({'type': 'test', 'counted': counted, 'count_as': result, **test})
+        self._upload(test_id, script_name, description, result, run_time)
 
-        # We need to go ahead and send a request to the web server
-        try:
-            r = requests.post(configuration['web_route'], data={
-                'token': run_token,
-                'brand': data['brand'],
-                'case': test_id,
-                'name': script_name,
-                'title': data['title'],
+    def merge(self, records, upload=True):
+        """
+        Add results recorded elsewhere, such as on other sites by the suite scheduler.
+
+        Args:
+            records: (list) Test records as written to a .jsonl results file. A "site"
+                     key, if present, is shown in front of the description.
+            upload: (bool) Whether to send the records to the results server. Turn this off
+                    if the harness that ran them already uploaded them.
+
+        Returns:
+            None
+
+        Examples:
+            >>> x.merge([{'test_id': 'test_1', 'script_name': 'Dept_Maint.py', 'description': 'Add a dept',
+            ...           'run_time': '00:00:12', 'result': 'Pass', 'site': 'site2'}])
+        """
+        for record in records:
+            result = record.get('count_as', record['result'].lower())
+            description = record['description']
+            if record.get('site'):
+                description = f"[{record['site']}] {description}"
+            test = {
+                'test_id': record['test_id'],
+                'script_name': record['script_name'],
                 'description': description,
-                'version': data['version'],
-                'result': result.lower(),
-                'run_time': (int(runTime[0])*3600 + int(runTime[1]) * 60 + int(runTime[2]))
-            })
-        except requests.exceptions.RequestException as e:
-            log.error('Results were not uploaded to server')
-            log.error(str(e))
+                'run_time': record['run_time'],
+                'result': result.capitalize()
+            }
+            h, m, s = (int(part) for part in record['run_time'].split(':'))
+            data['tests'].append(test)
+            data['runtime'] = data['runtime'] + datetime.timedelta(hours=h, minutes=m, seconds=s)
+            counted = record.get('counted', True)
+            if counted:
+                data[result] += 1
+            store.append({'type': 'test', 'counted': counted, 'count_as': result, **test})
+            if upload:
+                self._upload(test['test_id'], test['script_name'], description, result, record['run_time'])
+
+    def _upload(self, test_id, script_name, description, result, run_time):
+        runTime = run_time.split(":")
+
+        # Queue the upload. A slow or unreachable server shouldn't hold up the next test.
+        uploader.put({
+            'token': run_token,
+            'brand': data['brand'],
+            'case': test_id,
+            'name': script_name,
+            'title': data['title'],
+            'description': description,
+            'version': data['version'],
+            'result': result.lower(),
+            'run_time': (int(runTime[0])*3600 + int(runTime[1]) * 60 + int(runTime[2]))
+        })
+
+    def finalize(self):
+        """
+        Finish uploading results and write the HTML report. Safe to call more than once.
+
+        Returns:
+            str: The path of the HTML report, or None if results were never initialized.
+
+        Examples:
+            >>> x.finalize()
+            '.\\output\\standalone/Regression_results_1.html'
+        """
+        global finalized
+        if 'uploader' not in globals():
+            return None
+        if finalized:
+            return f"{configuration['results_loc']}/{data['title']}_results_{data['attempt_num']}.html"
+        finalized = True
+        if not uploader.close(upload_flush_wait):
             data['notes']['connection'] = 'Results were not uploaded to server'
+            store.append({'type': 'note', 'key': 'connection', 'value': data['notes']['connection']})
 
-        # Does the directory already exist?
-        template = env.get_template('results.template.html')
         # output/<test_suite_name>/<build_name>/*_<attempt_num>.html
         filename = f"{configuration['results_loc']}/{data['title']}_results_{data['attempt_num']}.html"
-        log.info(f"Attempting to save file: {filename}")
+        render(data, filename, env)
+        return filename
+
+class ResultStore:
+    """
+    Append-only JSON Lines file of run results. Each record is written and
+    flushed as it comes in, so a crashed run still leaves every finished case on disk.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        _make_dirs(path)
+        open(path, 'w').close() # A rerun of the same attempt replaces its results
+
+    def append(self, record):
+        line = json.dumps(record, default=str)
+        with self.lock:
+            with open(self.path, 'a') as f:
+                f.write(line + '\n')
+
+def load(path):
+    """
+    Rebuild the template data for a run from its .jsonl results file.
+
+    Args:
+        path: (string) Path to the .jsonl file
+
+    Returns:
+        dict: The data Results.finalize renders
+
+    Examples:
+        >>> load("output/standalone/Regression_results_1.jsonl")['pass']
+        42
+    """
+    data = {
+        'fail': 0,
+        'pass': 0,
+        'runtime': datetime.datetime.strptime('00:00:00', '%H:%M:%S'),
+        'notes': {},
+        'tests': []
+    }
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            kind = record.pop('type')
+            if kind == 'run':
+                data.update(record)
+            elif kind == 'note':
+                data['notes'][record['key']] = record['value']
+            elif kind == 'test':
+                if record.pop('counted'):
+                    data[record['count_as']] += 1
+                record.pop('count_as')
+                h, m, s = (int(part) for part in record['run_time'].split(':'))
+                data['runtime'] += datetime.timedelta(hours=h, minutes=m, seconds=s)
+                data['tests'].append(record)
+    return data
+
+def render(data, filename, env=None):
+    """
+    Render the results template to an HTML file.
+
+    Args:
+        data: (dict) The template data, from Results or load()
+        filename: (string) Where to write the HTML
+        env: (jinja2.Environment) Environment to load the template from. Defaults to .\\templates\\
+
+    Returns:
+        None
+    """
+    env = env or Environment(loader=FileSystemLoader('.\\templates\\'))
+    template = env.get_template('results.template.html')
+    log.info(f"Attempting to save file: {filename}")
+    _make_dirs(filename)
+
+    # Great, let's output our results
+    with open(filename, 'w+') as f:
+        f.write(template.render(data))
+
+def _make_dirs(filename):
+    # Does the directory already exist?
+    if not os.path.exists(os.path.dirname(filename)):
+        try:
+            os.makedirs(os.path.dirname(filename))
+        except OSError as e:
+            log.error("There was an error creating the directory for results storage")
+            log.error(str(e))
+
+class Uploader:
+    """
+    Posts results to the results server from a background thread.
+    Pending results are sent in batches over one keep-alive session, and
+    each one is retried with backoff before it's given up on.
+    """
+    def __init__(self, route):
+        self.route = route
+        self.pending = queue.Queue(maxsize=upload_buffer_size)
+        self.session = requests.Session()
+        self.failed = 0
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._run, name="ResultsUploader", daemon=True)
+        self.thread.start()
+
+    def put(self, payload):
+        while True:
+            try:
+                self.pending.put_nowait(payload)
+                return
+            except queue.Full:
+                # Keep the newest results. Drop the oldest rather than blocking the test run.
+                try:
+                    self.pending.get_nowait()
+                    self.pending.task_done()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def close(self, timeout):
+        """
+        Wait up to timeout seconds for pending uploads, then stop the thread.
+        Returns: (bool) True if every result was uploaded.
+        """
+        if self.thread.is_alive():
+            try:
+                self.pending.put(None, timeout=timeout)
+                self.thread.join(timeout)
+            except queue.Full:
+                pass
+        if self.thread.is_alive():
+            log.error(f"Results server didn't accept pending results within {timeout} seconds. {self.pending.qsize()} were not uploaded.")
+            return False
+        if self.dropped:
+            log.error(f"{self.dropped} results were dropped from the upload queue.")
+        return not (self.failed or self.dropped)
+
+    def _run(self):
+        while True:
+            batch = [self.pending.get()]
+            while len(batch) < upload_batch_size:
+                try:
+                    batch.append(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+            for payload in batch:
+                if payload is None:
+                    self.session.close()
+                    return
+                self._send(payload)
+                self.pending.task_done()
 
-        #filename = configuration['results_loc'] + "\\" + data['version'] + "\\results\\" + data['version'] + '_' + data['date'] + "\\" + data['title'] + '.html'
-        if not os.path.exists(os.path.dirname(filename)):
+    def _send(self, payload):
+        for attempt in range(upload_retries):
             try:
-                os.makedirs(os.path.dirname(filename))
-            except OSError as e:
-                log.error("There was an error creating the directory for results storage")
-                log.error(str(e))
+                self.session.post(self.route, data=payload, timeout=upload_timeout).raise_for_status()
+                return True
+            except requests.exceptions.RequestException as e:
+                log.debug(f"Upload of {payload['case']} failed (attempt {attempt+1}): {e}")
+                if attempt < upload_retries - 1:
+                    time.sleep(2 ** attempt)
+        log.error(f"Results were not uploaded to server: {payload['case']}")
+        self.failed += 1
+        return False
 
-        # Great, let's output our results
-        with open(filename, 'w+') as f:
-            f.write(template.render(data))
-            f.close()
+# Write the report even if the harness exits without finalizing
+atexit.register(Results().finalize)
 
-#TEST CODE
+# Render a report from a results file, e.g. from a run that didn't finish
 if __name__ ==  "__main__":
-    print("Hello there")
+    path = sys.argv[1]
+    render(load(path), os.path.splitext(path)[0] + '.html')
@@ -3,7 +3,7 @@ import requests
 from requests.auth import HTTPBasicAuth
 import json
 import logging
-from app import constants
+from app.util import constants
 
 log = logging.getLogger(__name__)
 
@@ -49,7 +49,8 @@ class Simulator(object):
             else:
                 payload = {
                     "success" : False,
-                    "payload" : "Error. Recieved status code of %s" %(get_request.status_code)
+                    "payload" : "Error. Recieved status code of %s" %(get_request.status_code),
+                    "status" : get_request.status_code
                 }
                 return payload
         except Exception as e:
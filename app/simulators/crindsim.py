@@ -5,14 +5,18 @@ __author__ = "Jesse Thomas"
 
 import logging, ast, time
 import json
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from app.util.runas import run_sqlcmd
 from app.framework import EDH
-from app.util import server, constants
+from app.util import constants, system
 from app.simulators.basesim import Simulator
-from app.framework.tc_helpers import test_func
+from app.framework.tc_helpers import test_func, tc_fail
 
 # Global Variables:
 log = logging.getLogger(__name__)
+max_dispensers = 32 # Connections kept open to the sim, so every dispenser can have a request in flight
+keypad_string_route = "/presskeypadkeys" # Enters a whole string of keys in one request, where the sim has it
 
 # region TODO Notes
 """
@@ -26,7 +30,7 @@ def init_crindsim():
     Docker Manager application running on the Server.
     """
     # TODO : We need to write the IP to some JSON file.
-    ip_addr = server.server.get_site_info()['ip']
+    ip_addr = system.profile().simulator_ips['ip']
     return CrindSim(endpoint=f"http://{ip_addr}/")
 
 
@@ -34,6 +38,10 @@ class CrindSim(Simulator):
 
     def __init__(self, endpoint):  # -> CrindSim:
         super().__init__(endpoint, "crindsim")  # -> Looks like the name is static.
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_dispensers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.keypad_strings = None # Whether the sim takes a whole string of keys. None until it's been tried
 
     def close(self, dispenser=1):
         """
@@ -382,6 +390,44 @@ class CrindSim(Simulator):
         log.warning(result['payload'])
         return False
 
+    @test_func
+    def enter_keypad(self, keys, dispenser=1, enter=True):
+        """
+        Enters a string of keys on the keypad of the selected dispenser, in one request if the sim
+        supports it, or one key at a time if it doesn't or the request fails.
+
+        Args:
+            keys: (str) The keys to enter, e.g. a PIN or odometer reading.
+            dispenser: (int) The number of the dispenser in which the keys will be entered.
+            enter: (bool) Whether to press Enter afterwards.
+            verify: (bool) Whether or not to fail the current test case if this function fails. Defaults to True.
+
+        Returns:
+            True/False: (bool) True if every key was pressed. False otherwise.
+
+        Examples:
+            >>> enter_keypad("1234")
+                True
+            >>> enter_keypad("98765", 3)
+                True
+        """
+        keys = str(keys)
+        log.info(f"Enter {keys} on the keypad of dispenser #{dispenser}")
+        if self.keypad_strings is not False and len(keys) > 1:
+            result = self.get(f"{keypad_string_route}/{keys}/{dispenser}")
+            if result['success']:
+                self.keypad_strings = True
+                return self.press_keypad("Enter", dispenser, verify=False) if enter else True
+            if result.get('status') in (404, 405):
+                log.debug("The sim has no keypad string route. Pressing keys one at a time.")
+                self.keypad_strings = False
+            else:
+                log.warning(f"Couldn't enter {keys} in one request, pressing keys one at a time: {result['payload']}")
+        for key in keys:
+            if not self.press_keypad(key, dispenser, verify=False):
+                return False
+        return self.press_keypad("Enter", dispenser, verify=False) if enter else True
+
     @test_func
     def press_softkey(self, key, dispenser=1):
         """
@@ -650,7 +696,8 @@ class CrindSim(Simulator):
 
     def crind_sale(self, card_name="Visa", brand="Core", debit="no", pin="1234", carwash="no", selection="1",
                    receipt="yes", target_type="auth", target_amount="10.00", grade=1, dispenser=1, 
-                   vehicle_number="1234", id_number="1234", customer_code="1234", odometer="1234", driver_id="1234",  timeout=60):
+                   vehicle_number="1234", id_number="1234", customer_code="1234", odometer="1234", driver_id="1234",  timeout=60,
+                   poll_interval=1, timeline=None):
         """
         Run a crind sale and answers all prompts. 
         NOTE: Support for Zip, Crind Merch not currently implemented
@@ -674,6 +721,8 @@ class CrindSim(Simulator):
             driver_id: (str) Fleet prompt for driver id/ driver number
             odometer: (str) Fleet prompt for odometer
             timeout: (int) The time given for the transaction to complete.
+            poll_interval: (float) Seconds between reads of the display.
+            timeline: (list) If given, (seconds since start, event) is appended for each prompt answered.
         Returns:
             True/False: (bool) True if CRIND sale was successful. False if there was any error.
 
@@ -691,86 +740,66 @@ class CrindSim(Simulator):
             >>> crind_sale("MCFleet", dispenser = "not a dispenser")
                 False
         """
-        start_time = time.time()
-        # Loop verifies that crindsim is in idle state before starting transaction
-        while time.time() - start_time < timeout:
-            if "insert card" in self.get_display_text().lower():
-                break
-        else:
-            log.warning("Unable to run transaction because CRIND is not at IDLE")
+        record = self._recorder(timeline, dispenser)
+        if not self._wait_for_idle(dispenser, timeout, poll_interval):
             return False
 
         # Loop that gets current crind display and answers any prompts
         start_time2 = time.time()
         previous_display = []
         while time.time() - start_time2 < timeout:
-            display = self.get_display_text().lower()
+            display = self.get_display_text(dispenser).lower()
             if not display == previous_display:
                 log.debug(display)
             if "insert card" in display:
                 self.swipe_card(card_name, brand, dispenser)
-                log.debug("swiped " + card_name)
+                record("swiped " + card_name)
             elif "please see cashier" in display:
                 log.warning("Customer instructed to see cashier")
+                record("see cashier")
                 return False
             elif "vehicle number" in display:
-                for digit in vehicle_number:
-                    self.press_keypad(digit, dispenser)
-                self.press_keypad("Enter", dispenser)
-                log.debug("Vehicle Number Entered")
+                self._enter_prompt(vehicle_number, dispenser, "Vehicle Number", record)
             elif "id number" in display:
-                for digit in id_number:
-                    self.press_keypad(digit, dispenser)
-                self.press_keypad("Enter", dispenser)
-                log.debug("ID Number Entered")
+                self._enter_prompt(id_number, dispenser, "ID Number", record)
             elif "customer code" in display:
-                for digit in customer_code:
-                    self.press_keypad(digit, dispenser)
-                self.press_keypad("Enter", dispenser)
-                log.debug("Customer Code Entered")
+                self._enter_prompt(customer_code, dispenser, "Customer Code", record)
             elif "driver" in display:
-                for digit in driver_id:
-                    self.press_keypad(digit, dispenser)
-                self.press_keypad("Enter", dispenser)
-                log.debug("Driver ID Entered")
+                self._enter_prompt(driver_id, dispenser, "Driver ID", record)
             elif "odometer reading" in display:
-                for digit in odometer:
-                    self.press_keypad(digit, dispenser)
-                self.press_keypad("Enter", dispenser)
-                log.debug("Odometer Entered")
+                self._enter_prompt(odometer, dispenser, "Odometer", record)
             elif "debit" in display:
                 self.press_softkey(debit, dispenser)
-                log.debug("Pressed " + debit + " for debit prompt")
+                record("Pressed " + debit + " for debit prompt")
             elif "pin" in display:
-                for digit in pin:
-                    self.press_keypad(digit, dispenser)
-                self.press_keypad("Enter", dispenser)
-                log.debug("PIN Entered")
+                self._enter_prompt(pin, dispenser, "PIN", record)
             elif "carwash" in display:
                 self.press_softkey(carwash, dispenser)
-                log.debug("pressed " + carwash + " for carwash")
+                record("pressed " + carwash + " for carwash")
             elif "make selection" in display:
                 self.press_softkey(selection, dispenser)
-                log.debug("wash selected")
-            elif "lift handle" in display and self.get_mode().lower() == "manual":
+                record("wash selected")
+            elif "lift handle" in display and self.get_mode(dispenser).lower() == "manual":
                 self.fuel_manually(grade, target_type, target_amount, dispenser)
+                record(f"fueled grade {grade}")
             elif "receipt?" in display:
                 self.press_softkey(receipt, dispenser)
-                log.debug("pressed " + receipt + " for receipt")
+                record("pressed " + receipt + " for receipt")
             elif "thank you" in display:
-                log.debug("sale complete")
+                record("sale complete")
                 return True
             previous_display = display
 
-            time.sleep(1)
+            time.sleep(poll_interval)
         log.warning("Transaction did not complete before timeout")
+        record("timed out")
         return False
 
     def commercial(self, card_name="NGFC", brand="Exxon", selection="tractor", need_def="no", 
                    tractor_grade=1, tractor_target_type="auth", tractor_target_amount="10.00", 
                    reefer_grade=1, reefer_target_type="auth", reefer_target_amount="10.00",
                    def_grade=3, def_target_type="auth", def_target_amount="10.00",
-                   receipt="yes", additional_product = "no", dispenser=1, timeout=60):
+                   receipt="yes", additional_product = "no", dispenser=1, timeout=60, poll_interval=1, timeline=None):
         """
         Run a commercial fuel sale at the crind and answers all prompts.
 
@@ -792,6 +821,8 @@ class CrindSim(Simulator):
             additional_product: (str) Answer to additional product prompt
             dispenser: (int) The number of the dispenser that the card will be swiping at.
             timeout: (int) The time given for the transaction to complete.
+            poll_interval: (float) Seconds between reads of the display.
+            timeline: (list) If given, (seconds since start, event) is appended for each prompt answered.
         Returns:
             True/False: (bool) True if CRIND sale was successful. False if there was any error or if the customer was told to go inside.
 
@@ -811,54 +842,54 @@ class CrindSim(Simulator):
         """
         
         #set crindsim mode to manual as auto mode will not allow grades to be changed for commercial fueling
-        self.set_mode("manual")
-        start_time = time.time()
-        # Loop verifies that crindsim is in idle state before starting transaction
-        while time.time() - start_time < timeout:
-            if "insert card" in self.get_display_text().lower():
-                break
-        else:
-            log.warning("Unable to run transaction because CRIND is not at IDLE")
+        self.set_mode("manual", dispenser)
+        record = self._recorder(timeline, dispenser)
+        if not self._wait_for_idle(dispenser, timeout, poll_interval):
             return False
 
         # Loop that gets current crind display and answers any prompts
         start_time2 = time.time()
         previous_display = []
         while time.time() - start_time2 < timeout:
-            display = self.get_display_text().lower()
+            display = self.get_display_text(dispenser).lower()
             if not display == previous_display:
                 log.debug(display)
             if "insert card" in display:
                 self.swipe_card(card_name, brand, dispenser)
-                log.debug("swiped " + card_name)
+                record("swiped " + card_name)
             elif "please see cashier" in display:
                 log.warning("Customer instructed to see cashier")
+                record("see cashier")
                 return False
             elif "make selection" in display:
                 self.press_softkey(selection, dispenser)
-                log.debug(selection + " selected")
+                record(selection + " selected")
             elif "need def?" in display:
                 self.press_softkey(need_def, dispenser)
-                log.debug(need_def + " entered for Need DEF?")
+                record(need_def + " entered for Need DEF?")
             elif "additional products" in display:
-                self.press_softkey(additional_product)
-                log.debug(additional_product + " selected for Additional Products?")
+                self.press_softkey(additional_product, dispenser)
+                record(additional_product + " selected for Additional Products?")
             elif "ready to fuel tractor" in display:
                 self.fuel_manually(tractor_grade, tractor_target_type, tractor_target_amount, dispenser)
+                record("fueled tractor")
             elif "ready to fuel def" in display:
                 self.fuel_manually(def_grade, def_target_type, def_target_amount, dispenser)
+                record("fueled DEF")
             elif "ready to fuel reefer" in display:
                 self.fuel_manually(reefer_grade, reefer_target_type, reefer_target_amount, dispenser)
+                record("fueled reefer")
             elif "receipt?" in display:
                 self.press_softkey(receipt, dispenser)
-                log.debug("pressed " + receipt + " for receipt")
+                record("pressed " + receipt + " for receipt")
             elif "thank you" in display:
-                log.debug("sale complete")
+                record("sale complete")
                 return True
             previous_display = display
 
-            time.sleep(1)
+            time.sleep(poll_interval)
         log.warning("Transaction did not complete before timeout")
+        record("timed out")
         return False
 
     def fuel_manually(self, grade= 1, target_type="auth", amount="10.00", dispenser=1, dispense_time = 5):       
@@ -885,16 +916,87 @@ class CrindSim(Simulator):
                 True
         """
         if target_type == "auth":
-            self.set_sales_target("auth")     
+            self.set_sales_target("auth", dispenser=dispenser)
         else:
-            self.set_sales_target(target_type, amount)
+            self.set_sales_target(target_type, amount, dispenser)
         self.select_grade(grade, dispenser)
-        self.lift_handle()
-        self.open_nozzle()
+        self.lift_handle(dispenser)
+        self.open_nozzle(dispenser)
         time.sleep(dispense_time)
-        self.lower_handle()
+        self.lower_handle(dispenser)
         return True
 
+    def run_sales(self, sales, timeout=120, poll_interval=1):
+        """
+        Run outside sales on several dispensers at once. Each dispenser answers its own prompts
+        in its own worker, and all of them share this sim's pooled connections.
+
+        Args:
+            sales: (list) A dict per sale of the arguments for crind_sale, including its dispenser.
+                   Set 'scenario' to "commercial" for a commercial sale instead.
+            timeout: (int) The time given for each sale to complete.
+            poll_interval: (float) Seconds between reads of each dispenser's display.
+        Returns:
+            list: A dict per sale, in the same order, with 'dispenser', 'success', 'duration' in seconds,
+                  and 'timeline', the (seconds since start, event) of each prompt answered.
+
+        Examples:
+            >>> run_sales([{'dispenser': d, 'card_name': "Visa"} for d in range(1, 17)])
+                [{'dispenser': 1, 'success': True, 'duration': 31.2, 'timeline': [(0.4, 'swiped Visa'), ...]}, ...]
+            >>> run_sales([{'dispenser': 1}, {'dispenser': 2, 'scenario': "commercial", 'selection': "reefer"}])
+                [{'dispenser': 1, 'success': True, ...}, {'dispenser': 2, 'success': True, ...}]
+        """
+        dispensers = [sale.get('dispenser', 1) for sale in sales]
+        if len(set(dispensers)) < len(dispensers):
+            log.warning(f"More than one sale for the same dispenser in {dispensers}. Only one sale can run per dispenser.")
+            return [{'dispenser': d, 'success': False, 'duration': 0, 'timeline': []} for d in dispensers]
+
+        def run(sale):
+            sale = dict(sale)
+            scenario = getattr(self, sale.pop('scenario', "crind_sale"))
+            result = {'dispenser': sale.get('dispenser', 1), 'success': False, 'duration': None, 'timeline': []}
+            start = time.perf_counter()
+            try:
+                result['success'] = bool(scenario(timeout=timeout, poll_interval=poll_interval, timeline=result['timeline'], **sale))
+            except Exception as e:
+                log.warning(f"Sale on dispenser #{result['dispenser']} failed: {e}")
+                result['timeline'].append((round(time.perf_counter() - start, 3), f"failed: {e}"))
+            result['duration'] = round(time.perf_counter() - start, 3)
+            return result
+
+        log.info(f"Running {len(sales)} outside sales on dispensers {dispensers}")
+        with ThreadPoolExecutor(max_workers=min(len(sales), max_dispensers) or 1, thread_name_prefix="CrindSale") as pool:
+            results = list(pool.map(run, sales))
+        passed = [r for r in results if r['success']]
+        log.info(f"{len(passed)}/{len(results)} outside sales completed")
+        return results
+
+    def _wait_for_idle(self, dispenser, timeout, poll_interval):
+        """Wait for the dispenser to show the idle prompt. Returns: (bool) Whether it did."""
+        start_time = time.time()
+        while time.time() - start_time < timeout:
+            if "insert card" in self.get_display_text(dispenser).lower():
+                return True
+            time.sleep(min(poll_interval, 0.25))
+        log.warning(f"Unable to run transaction because CRIND #{dispenser} is not at IDLE")
+        return False
+
+    def _enter_prompt(self, keys, dispenser, name, record):
+        """Answer a keypad prompt of a sale. Fails the test case if any key can't be pressed, as pressing them one by one did."""
+        if not self.enter_keypad(keys, dispenser, verify=False):
+            record(f"{name} not entered")
+            tc_fail(f"Unable to enter the {name} on dispenser #{dispenser}")
+        record(f"{name} Entered")
+
+    def _recorder(self, timeline, dispenser):
+        """Get a function that logs an event of a sale and adds it to the timeline, if there is one."""
+        start = time.perf_counter()
+        def record(event):
+            log.debug(f"Dispenser #{dispenser}: {event}")
+            if timeline is not None:
+                timeline.append((round(time.perf_counter() - start, 3), event))
+        return record
+
     @staticmethod
     def setup_edh(num_dispensers, ip="10.80.31.210"):
         """
@@ -4,10 +4,11 @@ Created on Apr 17, 2018
 @author: ejuan
 '''
 
-import socket
-import sys
 import logging
-import os
+import threading
+import time
+
+from app.simulators import peripheral_loop
 
 # Log object
 log = logging.getLogger()
@@ -22,71 +23,117 @@ class IPScanner():
         self.TCP_IP = ip # assumes that this will be run from the MWS
         self.TCP_PORT = 10001
         
-        # TODO : We will wait up to 10 seconds everytime any module is imported that needs this. Need to think of a solution for this.
         self.scanner_time_out = 10  # seconds
-
-        # Opens a connection so the MWS can connects to it on port 10001
-        # self.open_connection()
+        self.endpoint = None
 
     def open_connection(self):
         """
-        Attempts to connect to the MWS and waits `self.scanner_time_out` amount of seconds for success
+        Starts listening for the MWS, if not already, and waits `self.scanner_time_out` amount of seconds for it to connect.
+        Listening carries on in the background, so the MWS can connect or reconnect at any time.
         Args:
             None
         Return:
             True, if success; otherwise, False
         """
-        try:
-            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            s.settimeout(self.scanner_time_out)  # seconds
-
-            s.bind((self.TCP_IP, self.TCP_PORT))
-            s.listen(1)
+        if self.endpoint is None:
+            try:
+                self.endpoint = peripheral_loop.get_loop().listen(self.TCP_IP, self.TCP_PORT,
+                                                                  on_connect=self._connected,
+                                                                  on_disconnect=self._disconnected)
+            except OSError as e:
+                log.warning(f"Failed to create socket: {e}")
+                return False
 
-            log.debug("Listening for connections on : " +
-                    str(self.TCP_IP) + ":" + str(self.TCP_PORT))
-            self.conn, addr = s.accept()
-            log.debug("Connection from: " + str(addr))
-            return True
+        if not self.endpoint.wait_connected(self.scanner_time_out):
+            log.warning(f"No connections made in {self.scanner_time_out} seconds")
+            return False
+        return True
 
-        except socket.error as e:
-            log.warning(f"Failed to create socket: {e}")     
-            return False       
+    @property
+    def connected(self):
+        """Whether the MWS is connected. Kept up to date by the socket's connect, disconnect and error events."""
+        return self.endpoint is not None and self.endpoint.connected.is_set()
 
-        except socket.timeout:
-            log.warning(f"No connections made in {self.scanner_time_out} seconds")
-            return False        
-   
     def scan(self, barcode):
         """
-        Scans the bar
-         that the connection was established and try to send the data
+        Scans the barcode. Waits for the MWS to connect first if it hasn't yet.
+        Args:
+            barcode: (str) The barcode to scan.
+        Return:
+            True, if the barcode was sent; otherwise, False
         """
-        connected = os.system(f"netstat -ano | findstr {self.TCP_PORT}")
-        if connected != 0: # Not connected
-            self.open_connection()
-        try:
-            self.barcode = barcode + '\r'
-            log.debug("Attempting to send:" + barcode)
-            self.conn.send(str.encode(self.barcode))
-            log.debug("scanner information sent")
-            return True
-
-        except AttributeError:
-            '''In case that the connection was not established before
-                re-attempt to connect'''
-            if self.open_connection():
-                try:
-                    log.debug("Attemting to send:" + barcode)
-                    self.conn.send(str.encode(self.barcode))
-                    log.debug("scanner information sent")
-                    return True
-                except:
-                    return False
-            else:
+        if not self.connected:
+            if not self.open_connection():
                 # Return False if the MWS does not connect to the Scanner
                 return False
-
-        except:
+        self.barcode = barcode + '\r'
+        log.debug("Attempting to send:" + barcode)
+        if not self.endpoint.send(str.encode(self.barcode)):
             # Return False if the scanner can not send the data
             return False
+        log.debug("scanner information sent")
+        return True
+
+    def scan_many(self, barcodes, inter_scan_delay=0, timeout=None):
+        """
+        Scan several barcodes over the one connection. Each scan is queued without
+        waiting for the previous one to be written.
+        Args:
+            barcodes: (list) The barcodes to scan, in order.
+            inter_scan_delay: (float) Seconds to wait between scans. Use this if the POS needs time to add each item.
+            timeout: (int) Seconds to wait for the last scans to be written. Defaults to scanner_time_out.
+        Return:
+            list: A dict per barcode with 'barcode', 'sent' (bool) and 'latency', the seconds from
+                  queuing the scan until the connection accepted it (None if it wasn't sent).
+        Examples:
+            >>> scanner.scan_many(['1', '00001234'], inter_scan_delay=0.5)
+            [{'barcode': '1', 'sent': True, 'latency': 0.0004}, {'barcode': '00001234', 'sent': True, 'latency': 0.0003}]
+        """
+        results = [{'barcode': barcode, 'sent': False, 'latency': None} for barcode in barcodes]
+        written = threading.Condition()
+        pending = 0
+
+        def acknowledge(result, start, ok):
+            nonlocal pending
+            with written:
+                result['sent'] = ok
+                result['latency'] = time.perf_counter() - start if ok else None
+                pending -= 1
+                written.notify_all()
+
+        for i, barcode in enumerate(barcodes):
+            if i and inter_scan_delay:
+                time.sleep(inter_scan_delay)
+            if not self.connected:
+                if not self.open_connection():
+                    log.warning(f"Scanner lost its connection. {len(barcodes) - i} barcodes were not scanned.")
+                    break
+            start = time.perf_counter()
+            with written:
+                pending += 1
+            if not self.endpoint.send(str.encode(barcode + '\r'),
+                                      lambda ok, result=results[i], start=start: acknowledge(result, start, ok)):
+                with written:
+                    pending -= 1
+
+        with written:
+            written.wait_for(lambda: pending == 0, self.scanner_time_out if timeout is None else timeout)
+
+        latencies = [result['latency'] for result in results if result['sent']]
+        if latencies:
+            log.debug(f"Scanned {len(latencies)}/{len(barcodes)} barcodes. Latency avg {sum(latencies)/len(latencies):.4f}s, max {max(latencies):.4f}s")
+        return results
+
+    def close(self):
+        """
+        Stop listening and close the connection.
+        """
+        if self.endpoint is not None:
+            self.endpoint.close()
+            self.endpoint = None
+
+    def _connected(self, addr):
+        log.debug(f"Scanner connected to {addr}")
+
+    def _disconnected(self):
+        log.warning("Scanner connection dropped. Waiting for the MWS to reconnect.")
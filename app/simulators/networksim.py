@@ -5,8 +5,7 @@ import json
 import logging
 
 from app.simulators import basesim
-from app.util import system, server
-from app import constants
+from app.util import system, constants
 from app import runas
 
 log = logging.getLogger()
@@ -1018,7 +1017,7 @@ def init_networksim():
     # TODO : We need to write the IP to some JSON file.
 
     network_file = constants.STANDARD_NETWORK
-    primary_ip = server.server.get_site_info()['network']
+    primary_ip = system.profile().simulator_ips['network']
     brand = system.get_brand().upper()
     networksim = None
 
@@ -0,0 +1,108 @@
+"""
+Name: parsersim
+Description: A local stand-in for the network message parser API, for trying out
+             translations and verifications without the parser server. It serves
+             both the single message route and the batch route of app.util.translator.
+
+Date created: 10/18/2026
+Modified By:
+Date Modified:
+"""
+
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+log = logging.getLogger()
+
+class ParserSim():
+    """
+    Translates messages with a function, or from canned translations.
+    Examples:
+        >>> sim = ParserSim().start()
+        >>> sim.add("Request[1]> [0100...]", {'Message Type': {'value': '0100'}})
+        >>> Translator(sim.url).translate("Request[1]> [0100...]")
+        {'Message Type': {'value': '0100'}}
+        >>> sim.stop()
+    """
+    def __init__(self, parse=None, host='127.0.0.1', port=0):
+        """
+        Args:
+            parse: (function) Takes a raw message and returns its translation as a dict, or None
+                   if it can't be parsed. Defaults to looking the message up in the canned translations
+            host: (str) Address to listen on
+            port: (int) Port to listen on. 0 picks a free one
+        """
+        self.parse = parse or self.responses_get
+        self.responses = {}
+        self.requests = 0 # HTTP requests served
+        self.parsed = 0   # Messages parsed
+        self.lock = threading.Lock()
+        sim = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+                with sim.lock:
+                    sim.requests += 1
+                if self.path.rstrip('/').endswith('/batch'):
+                    try:
+                        messages = json.loads(body)
+                    except ValueError:
+                        return self._reply(400, {'error': 'Expected a JSON list of messages'})
+                    return self._reply(200, [sim._parse(message) for message in messages])
+                translation = sim._parse(body)
+                if translation is None:
+                    return self._reply(422, {'error': 'Unable to parse message'})
+                self._reply(200, translation)
+
+            def _reply(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                log.debug("ParserSim: " + format % args)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        """The parser route to use in place of constants.PARSER_API"""
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/parser/"
+
+    def add(self, message, translation):
+        """Add a canned translation for a message."""
+        self.responses[message] = translation
+
+    def responses_get(self, message):
+        return self.responses.get(message)
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.server.serve_forever, name="ParserSim", daemon=True)
+            self.thread.start()
+            log.debug(f"Parser simulator listening on {self.url}")
+        return self
+
+    def stop(self):
+        if self.thread is not None:
+            self.server.shutdown()
+            self.thread = None
+        self.server.server_close()
+
+    def _parse(self, message):
+        with self.lock:
+            self.parsed += 1
+        try:
+            return self.parse(message)
+        except Exception as e:
+            log.warning(f"ParserSim failed to parse {message}: {e}")
+            return None
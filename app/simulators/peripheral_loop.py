@@ -0,0 +1,376 @@
+"""
+One I/O loop for the simulated peripherals (receipt printer, IP and serial scanners).
+A single thread waits on every endpoint with selectors, so any number of registers'
+peripherals can be simulated from one process without a polling thread per device.
+
+TCP endpoints listen without blocking: the POS can connect, disconnect and reconnect
+at any time. Serial ports are registered with the selector where the OS allows it.
+Windows can only select on sockets, so there each serial port gets a blocking reader
+that hands its data to the loop instead of polling.
+"""
+
+import collections
+import logging
+import selectors
+import socket
+import sys
+import threading
+
+log = logging.getLogger("PeripheralLoop")
+
+class PeripheralLoop():
+    """
+    Owns the sockets and serial ports of the simulated peripherals and calls back with their data.
+    All callbacks run on the loop thread.
+    Examples:
+        >>> loop = PeripheralLoop().start()
+        >>> printer = loop.listen('127.0.0.1', 9100, on_data=print)
+        >>> printer.send(b'\\x14')
+    """
+    def __init__(self):
+        self._selector = selectors.DefaultSelector()
+        self._calls = collections.deque()
+        self._waker, self._wake_sender = socket.socketpair()
+        self._waker.setblocking(False)
+        self._wake_sender.setblocking(False)
+        self._selector.register(self._waker, selectors.EVENT_READ, self._drain_waker)
+        self._thread = None
+        self._stop_flag = False
+
+    def start(self):
+        """Start the loop thread, if it isn't already running. Returns: (PeripheralLoop) self"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_flag = False
+            self._thread = threading.Thread(target=self._run, name="PeripheralLoop", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the loop thread. Endpoints stay registered and resume if the loop is started again."""
+        self._stop_flag = True
+        self._wake()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def call_soon(self, func, *args):
+        """Run func(*args) on the loop thread. Safe to call from any thread."""
+        self._calls.append((func, args))
+        self._wake()
+
+    def listen(self, host, port, on_data=None, on_connect=None, on_disconnect=None):
+        """
+        Listen for a TCP connection from the POS.
+        Args:
+            host: (str) IP address to listen on.
+            port: (int) Port to listen on.
+            on_data: (function) Called with each chunk of bytes received.
+            on_connect: (function) Called with the peer address when the POS connects.
+            on_disconnect: (function) Called with no arguments when the connection drops.
+        Returns: (TcpEndpoint) The endpoint. It keeps listening for a new connection after a disconnect.
+        Raises:
+            OSError: If the port is already in use.
+        """
+        endpoint = TcpEndpoint(self, host, port, on_data, on_connect, on_disconnect)
+        endpoint._open()
+        return endpoint
+
+    def attach(self, sock, on_data=None, on_disconnect=None):
+        """
+        Add an already connected socket, such as one end of a socket.socketpair().
+        Args:
+            sock: (socket) The connected socket.
+            on_data: (function) Called with each chunk of bytes received.
+            on_disconnect: (function) Called with no arguments when the peer closes it.
+        Returns: (SocketEndpoint) The endpoint.
+        """
+        endpoint = SocketEndpoint(self, on_data, on_disconnect)
+        self.call_soon(endpoint._attach, sock)
+        return endpoint
+
+    def serial(self, conn, on_data=None):
+        """
+        Add an open serial port.
+        Args:
+            conn: (serial.Serial) The port. Its timeout is changed to block, as it will be read only when data is ready.
+            on_data: (function) Called with each chunk of bytes received. If None, the port is only written to.
+        Returns: (SerialEndpoint) The endpoint.
+        """
+        return SerialEndpoint(self, conn, on_data)
+
+    # Private functions
+
+    def _wake(self):
+        try:
+            self._wake_sender.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass # Already has a wake-up pending, or the loop is gone
+
+    def _drain_waker(self, mask):
+        try:
+            while self._waker.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _run(self):
+        while not self._stop_flag:
+            while self._calls:
+                func, args = self._calls.popleft()
+                try:
+                    func(*args)
+                except Exception as e:
+                    log.error(f"{type(e).__name__} in {getattr(func, '__qualname__', func)}: {e}")
+            for key, mask in self._selector.select():
+                try:
+                    key.data(mask)
+                except Exception as e:
+                    log.error(f"{type(e).__name__} handling {key.fileobj}: {e}")
+
+    def _register(self, fileobj, events, handler):
+        try:
+            self._selector.modify(fileobj, events, handler)
+        except KeyError:
+            self._selector.register(fileobj, events, handler)
+
+    def _unregister(self, fileobj):
+        try:
+            self._selector.unregister(fileobj)
+        except (KeyError, ValueError):
+            pass
+
+class SocketEndpoint():
+    """
+    A connected socket driven by the loop. Sends are queued and written when the socket is ready.
+    """
+    def __init__(self, loop, on_data=None, on_disconnect=None):
+        self.loop = loop
+        self.on_data = on_data
+        self.on_disconnect = on_disconnect
+        self.conn = None
+        self.connected = threading.Event()
+        self._out = collections.deque()
+
+    def send(self, data, on_sent=None):
+        """
+        Queue bytes to send. Safe to call from any thread.
+        Args:
+            data: (bytes) The data to send.
+            on_sent: (function) Called on the loop thread with True once all of data has been
+                     written to the connection, or False if the connection closes first.
+        Returns: (bool) False if there is no connection to send on.
+        """
+        if not self.connected.is_set():
+            return False
+        self._out.append([bytes(data), on_sent])
+        self.loop.call_soon(self._want_write)
+        return True
+
+    def wait_connected(self, timeout=None):
+        """Block until connected. Returns: (bool) Whether it's connected."""
+        return self.connected.wait(timeout)
+
+    def close(self):
+        """Close the connection. Safe to call from any thread."""
+        self.loop.call_soon(self._close)
+
+    def _attach(self, sock):
+        sock.setblocking(False)
+        self.conn = sock
+        self.loop._register(sock, selectors.EVENT_READ, self._ready)
+        self.connected.set()
+
+    def _want_write(self):
+        if self.conn is not None and self._out:
+            self.loop._register(self.conn, selectors.EVENT_READ | selectors.EVENT_WRITE, self._ready)
+
+    def _ready(self, mask):
+        if mask & selectors.EVENT_READ:
+            try:
+                data = self.conn.recv(65536)
+            except BlockingIOError:
+                data = None
+            except OSError as e:
+                log.warning(f"Connection error: {e}")
+                data = b''
+            if data == b'':
+                self._drop()
+                return
+            if data and self.on_data:
+                self.on_data(data)
+        if mask & selectors.EVENT_WRITE and self.conn is not None:
+            self._flush()
+
+    def _flush(self):
+        while self._out:
+            chunk, on_sent = self._out[0]
+            try:
+                sent = self.conn.send(chunk)
+            except BlockingIOError:
+                return
+            except OSError as e:
+                log.warning(f"Send failed: {e}")
+                self._drop()
+                return
+            if sent < len(chunk):
+                self._out[0][0] = chunk[sent:]
+                return
+            self._out.popleft()
+            if on_sent:
+                on_sent(True)
+        self.loop._register(self.conn, selectors.EVENT_READ, self._ready)
+
+    def _drop(self):
+        self._close()
+        if self.on_disconnect:
+            self.on_disconnect()
+
+    def _close(self):
+        if self.conn is not None:
+            self.loop._unregister(self.conn)
+            self.conn.close()
+            self.conn = None
+        self.connected.clear()
+        while self._out:
+            _, on_sent = self._out.popleft()
+            if on_sent:
+                on_sent(False)
+
+class TcpEndpoint(SocketEndpoint):
+    """
+    A listening socket that accepts one connection at a time. A new connection
+    replaces the old one, and a dropped one is waited for again without blocking.
+    """
+    def __init__(self, loop, host, port, on_data=None, on_connect=None, on_disconnect=None):
+        super().__init__(loop, on_data, on_disconnect)
+        self.host = host
+        self.port = port
+        self.on_connect = on_connect
+        self.listener = None
+        self.listening = threading.Event()
+
+    def close(self):
+        """Close the connection and stop listening."""
+        self.loop.call_soon(self._close_listener)
+
+    def _open(self):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            listener.bind((self.host, self.port))
+        except OSError:
+            listener.close()
+            raise
+        listener.listen(1)
+        listener.setblocking(False)
+        self.listener = listener
+        self.loop.call_soon(self.loop._register, listener, selectors.EVENT_READ, self._accept)
+        self.listening.set()
+        log.debug(f"Listening for connections on: {self.host}:{self.port}")
+
+    def _accept(self, mask):
+        try:
+            conn, addr = self.listener.accept()
+        except BlockingIOError:
+            return
+        if self.conn is not None:
+            log.debug(f"New connection on {self.port} replaces the current one.")
+            self._close()
+        log.debug(f"Connection from: {addr}")
+        self._attach(conn)
+        if self.on_connect:
+            self.on_connect(addr)
+
+    def _close_listener(self):
+        self._close()
+        if self.listener is not None:
+            self.loop._unregister(self.listener)
+            self.listener.close()
+            self.listener = None
+        self.listening.clear()
+
+class SerialEndpoint():
+    """
+    A serial port whose incoming data is delivered on the loop thread.
+    Writes go straight to the port from the calling thread; pyserial allows
+    reading and writing from different threads.
+    """
+    def __init__(self, loop, conn, on_data=None):
+        self.loop = loop
+        self.conn = conn
+        self.on_data = on_data
+        self._reader = None
+        if on_data is None:
+            return
+        if sys.platform != 'win32' and hasattr(conn, 'fileno'):
+            conn.timeout = 0
+            loop.call_soon(loop._register, conn, selectors.EVENT_READ, self._ready)
+        else:
+            conn.timeout = None # Block until data arrives, instead of waking every timeout to poll
+            self._reader = threading.Thread(target=self._read_blocking, name=f"Serial-{conn.port}", daemon=True)
+            self._reader.start()
+
+    def send(self, data):
+        """Write bytes to the port. Returns: (bool) True once written."""
+        self.conn.write(data)
+        return True
+
+    def close(self):
+        """Stop reading and close the port."""
+        if self._reader is not None:
+            self.conn.cancel_read()
+        else:
+            self.loop.call_soon(self.loop._unregister, self.conn)
+        self.conn.close()
+
+    def _ready(self, mask):
+        data = self.conn.read(self.conn.in_waiting or 1)
+        if data:
+            self.on_data(data)
+
+    def _read_blocking(self):
+        while self.conn.is_open:
+            try:
+                data = self.conn.read(1) # Blocks until there's data or cancel_read
+                if not data:
+                    return # cancelled
+                data += self.conn.read(self.conn.in_waiting)
+            except Exception as e:
+                log.debug(f"Stopped reading {self.conn.port}: {e}")
+                return
+            self.loop.call_soon(self.on_data, data)
+
+def delimited(on_frame, delimiter=b'\r'):
+    """
+    Wrap a frame callback so it can be used as on_data for a delimited protocol.
+    Args:
+        on_frame: (function) Called with each complete frame, without the delimiter.
+        delimiter: (bytes) The end of a frame.
+    Returns: (function) An on_data callback that buffers partial frames.
+    Examples:
+        >>> loop.attach(sock, on_data=delimited(frames.append))
+    """
+    buffer = bytearray()
+    def on_data(data):
+        buffer.extend(data)
+        while True:
+            end = buffer.find(delimiter)
+            if end < 0:
+                return
+            frame = bytes(buffer[:end])
+            del buffer[:end + len(delimiter)]
+            on_frame(frame)
+    return on_data
+
+_loop = None
+_loop_lock = threading.Lock()
+
+def get_loop():
+    """
+    Get the shared peripheral loop, starting it on first use.
+    Returns: (PeripheralLoop) The running loop.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = PeripheralLoop()
+        return _loop.start()
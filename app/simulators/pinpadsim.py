@@ -311,7 +311,7 @@ def init_pinpadsim():
     Creates an instance of the pinpadsim using the IP given from the
     Docker Manager application running on the Server.
     """
-    ip_addr = server.server.get_site_info()['ip']
+    ip_addr = system.profile().simulator_ips['ip']
 
     with open(constants.STANDARD_CONFIG, 'r') as fp:
         json_data = json.load(fp)
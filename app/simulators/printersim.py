@@ -2,13 +2,37 @@
 Receipt printer simulator for Passport POS.
 Converted from C# code originally written by Lucas Daniel.
 It supports both serial and TCP/IP communications,
-can send printer statuses, and stores the last printed receipt as plain text.
+can send printer statuses, and keeps a history of printed receipts as plain text.
 """
 
+from collections import deque, namedtuple
 from enum import IntFlag
-from app import runas, system, constants
+from app import runas, system
+from app.util import constants
+from app.simulators import peripheral_loop
 from pywinauto.keyboard import send_keys
-import serial, logging, threading, sys, socket, time, winreg
+import serial, logging, threading, sys, time, winreg
+import codecs, re
+
+# Control bytes that start a command. Everything between them is receipt text.
+ESC = 0x1B
+GS  = 0x1D
+US  = 0x1F
+DLE = 0x10
+DEL = 0x7F
+_COMMAND_START = re.compile(rb'[\x10\x1b\x1d\x1f\x7f]')
+
+# Parameter bytes taken by ESC and GS commands. Anything not listed is assumed to take none.
+ESC_PARAMS = {ord(c): n for c, n in {'@': 0, '2': 0, '!': 1, '-': 1, '3': 1, 'E': 1, 'G': 1, 'J': 1, 'M': 1,
+                                     'R': 1, 'a': 1, 'd': 1, 't': 1, '{': 1, 'c': 2, 'p': 3}.items()}
+GS_PARAMS  = {ord(c): n for c, n in {'!': 1, 'B': 1, 'H': 1, 'I': 1, 'V': 1, 'a': 1, 'b': 1, 'f': 1, 'h': 1,
+                                     'r': 1, 'w': 1, 'L': 2, 'W': 2}.items()}
+
+# How many printed receipts to keep
+max_receipts = 100
+
+# A printed receipt. number counts up from 1 for each receipt this sim has printed.
+Receipt = namedtuple('Receipt', ['number', 'text', 'started', 'printed'])
 
 class PrinterStatus(IntFlag):
     DRAWER_OPEN = 0x04
@@ -31,26 +55,16 @@ class PrinterSim():
     ip_mode = False
     port = None
     connected = False
-    receipt_text = ""
 
     # Private variables
     _serial_port = None
-    _tcp_conn = None
+    _endpoint = None
 
     _status = 0
-    _storing_graphics = False
     _status_enabled = False
-    _graphics_bytes = 0
 
-    _graphics_data = b""
-    _data = ""
     _encoding = "UTF-8"
 
-    _cut_position = -1
-
-    _data_processor = None
-    _stop_flag = False
-
     """
     Printer status properties. Get/set these as booleans.
     """
@@ -163,20 +177,36 @@ class PrinterSim():
         self.log = logging.getLogger("PrinterSim")
         self.port = port
         self.ip_mode = ip_mode
+
+        self._pending = b"" # Start of a command that hasn't fully arrived yet
+        self._skip = 0 # Bytes left of a command we're discarding, e.g. graphics data
+        self._decoder = codecs.getincrementaldecoder(self._encoding)(errors='replace')
+        self._current = [] # Text runs of the receipt being printed
+        self._started = None
+        self._receipts = deque(maxlen=max_receipts)
+        self._receipt_count = 0
+        self._receipt_printed = threading.Condition()
+
         self.start(port, ip_mode)
 
     # Public functions
     def start(self, port=10, ip_mode=False):
         """
-        Dispatch a thread to handle incoming serial messages from the POS.
+        Hand the printer's port to the shared peripheral loop, which passes incoming messages from the POS to be processed.
         Args:
             port: (int) The number of the COM port to communicate on.
             ip_mode: (bool) If true, run in TCP/IP mode instead of serial. The value of port will be ignored.
         Returns: None
         """
-        if ip_mode:           
-            self._data_processor = threading.Thread(target=self._await_tcp_data, name="ReceiptPrinter", daemon=True)
-            self._data_processor.start()
+        loop = peripheral_loop.get_loop()
+        if ip_mode:
+            try:
+                self._endpoint = loop.listen('127.0.0.1', 9100, on_data=self._process_data,
+                                             on_connect=lambda addr: self.log.debug(f"[PrinterSim] Connection from: {addr}"),
+                                             on_disconnect=lambda: self.log.warning("Receipt printer connection reset. Waiting for the POS to reconnect."))
+            except OSError as e:
+                self.log.warning(f"[PrinterSim] Failed to create socket: {e}")
+                raise
 
         else:  
             try:
@@ -189,227 +219,205 @@ class PrinterSim():
                 self.log.error(f"Could not initialize serial printer sim. Ensure that COM{port} is available and not already in use.")
                 raise
 
-            self._serial_port.timeout = 0.1
+            self._endpoint = loop.serial(self._serial_port, on_data=self._process_data)
 
-            self._data_processor = threading.Thread(target=self._await_serial_data, name="ReceiptPrinter", daemon=True)
-            self._data_processor.start()
-
-    def get_receipt(self):
+    @property
+    def receipt_text(self):
         """
-        Get the most recent receipt.
-        Args: None
-        Returns: (str) The text of the last printed receipt.
+        The receipt being printed, or the last printed receipt if nothing has been printed since the cut.
         """
-        # TODO: Store and provide access to more than just the most recent receipt, if users desire it
-        # TODO: Figure out a way to represent rich text formatting
-        return self.receipt_text
+        with self._receipt_printed:
+            current = ''.join(self._current)
+            if current.strip() or not self._receipts:
+                return current
+            return self._receipts[-1].text
 
-    def stop(self): 
+    @property
+    def receipt_count(self):
         """
-        Kill data processing thread and close open ports.
+        How many receipts have been printed since the sim started.
         """
-        self._stop_flag = True
-        self._data_processor.join()
-
-        if self._serial_port != None:
-            self._serial_port.close()
-            self._serial_port = None
-        if self._tcp_conn != None:
-            self._tcp_conn.close()
-            self._tcp_conn = None
+        return self._receipt_count
 
-    # Private functions
-
-    def __del__(self):
-        self.stop()
-
-    def _await_serial_data(self):
+    def get_receipt(self, n=1):
         """
-        Wait for serial communications from the POS and pass them to be processed.
+        Get a printed receipt.
+        Args:
+            n: (int) Which receipt to get. 1 is the most recent, 2 the one before it, and so on.
+        Returns: (str) The text of the receipt, or None if it's older than the history kept.
+        Examples:
+            >>> printer.get_receipt()
+            '       Store Name,  299\n...'
+            >>> printer.get_receipt(500)
+            None
         """
-        while True:
-            if self._stop_flag:
-                break
-            data = self._serial_port.read(4096)
-            if len(data) == 0:
-                continue
-            if type(data) == str: # Unsure if this is needed. Pyserial doc says it returns bytes "when available".
-                data = data.encode(self._encoding) 
-            self._process_data(data)
+        # TODO: Figure out a way to represent rich text formatting
+        receipt = self.get_receipt_info(n)
+        return receipt.text if receipt else None
 
-    def _await_tcp_data(self):
+    def get_receipt_info(self, n=1):
         """
-        Wait for TCP communications from the POS and pass them to be processed.
+        Get a printed receipt with its number and timestamps.
+        Args:
+            n: (int) Which receipt to get. 1 is the most recent.
+        Returns: (Receipt) number, text, started and printed (time.time() values), or None if it isn't in the history.
         """
-        self._connect_tcp()
+        with self._receipt_printed:
+            if n < 1 or n > len(self._receipts):
+                return None
+            return self._receipts[-n]
 
-        while True:
-            if self._stop_flag:
-                break
-            buffer = bytearray(4096)
-            try:
-                bytes_read = self._tcp_conn.recv_into(buffer)
-            except ConnectionResetError:
-                self.log.warning("Receipt printer connection reset. Attempting to recreate connection.")
-                self._connect_tcp()
-                continue
-
-            self._process_data(buffer[:bytes_read-1])
-
-    def _connect_tcp(self, ip='127.0.0.1', port=9100):
+    def wait_for_receipt(self, timeout=10, after=None):
         """
-        Create a socket and listen for a connection from the POS.
+        Wait for a receipt to finish printing.
         Args:
-            ip: (str) The IP address to use for the socket.
-            port: (int) The port to use for the socket.
-        Returns: None
+            timeout: (int) How many seconds to wait.
+            after: (int) Wait for a receipt numbered higher than this. Take receipt_count before
+                   the action that prints, so a receipt that prints quickly isn't missed.
+                   Defaults to receipt_count when called.
+        Returns: (str) The text of the first receipt after the given number, or None if none printed in time.
+        Examples:
+            >>> count = printer.receipt_count
+            >>> pos.pay()
+            >>> printer.wait_for_receipt(after=count)
+            '       Store Name,  299\n...'
         """
-        try:
-            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            #s.settimeout(5)  # seconds
+        with self._receipt_printed:
+            if after is None:
+                after = self._receipt_count
+            if not self._receipt_printed.wait_for(lambda: self._receipt_count > after, timeout):
+                return None
+            # Receipts are numbered consecutively, so the one we want is this far back
+            back = self._receipt_count - after
+            if back > len(self._receipts):
+                return self._receipts[0].text # Already rotated out; give the oldest we have
+            return self._receipts[-back].text
 
-            s.bind((ip, port))
-            s.listen(1)
+    def stop(self): 
+        """
+        Stop receiving data and close open ports.
+        """
+        if self._endpoint != None:
+            self._endpoint.close()
+            self._endpoint = None
+            self._serial_port = None
 
-            self.log.debug(f"[PrinterSim] Listening for connections on: {ip}:{port}")
-            self._tcp_conn, addr = s.accept()
-            self.log.debug("[PrinterSim] Connection from: " + str(addr))
+    # Private functions
 
-        except socket.error as e:
-            self.log.warning(f"[PrinterSim] Failed to create socket: {e}")     
-            raise
+    def __del__(self):
+        self.stop()
 
     def _process_data(self, data):
         """
         Process and respond to an incoming message from the POS.
+        Commands can be split across messages; an incomplete one is kept until the rest arrives.
         Args:
             data: (bytes) The data to process.
         Returns: None
         """
         self.log.debug(f"Process data {data}")
-        self._data += data.decode('utf-8')
 
         self.connected = True # Use this to know when we can continue with POS operations without error popups
 
+        if self._skip:
+            skipped = min(self._skip, len(data))
+            self._skip -= skipped
+            data = data[skipped:]
+        data = self._pending + data
+        view = memoryview(data)
+
         i = 0
-        while (i < len(self._data)):
-            if (self._storing_graphics and len(self._graphics_data) < self._graphics_bytes):
-                bytes_to_take = min(len(data) - i, self._graphics_bytes - len(self._graphics_data))
-                self._graphics_data += str(self._data)[i:bytes_to_take]
-                i += bytes_to_take
+        while i < len(data):
+            match = _COMMAND_START.search(data, i)
+            end = match.start() if match else len(data)
+            if end > i:
+                # Write the whole run of text up to the next command at once
+                self._write_text(self._decoder.decode(view[i:end]))
+                i = end
+                continue
 
-                if self._graphics_bytes == len(self._graphics_data):
-                    self._storing_graphics = False
+            used = self._process_command(data, i)
+            if used == 0:
+                break # Incomplete command, wait for the rest
+            i += used
 
+        self._pending = data[i:]
+
+    def _process_command(self, data, i):
+        """
+        Process the ESC/POS command starting at data[i].
+        Args:
+            data: (bytes) The data being processed.
+            i: (int) Index of the command's first byte.
+        Returns: (int) How many bytes the command used, or 0 if it hasn't fully arrived.
+        """
+        available = len(data) - i
+        command = data[i]
+
+        if command == DLE: # transmit real-time status
+            return 3 if available >= 3 else 0
+        elif command == DEL:
+            return 1
+        elif available < 2:
+            return 0
+        elif command == US:
+            self.log.debug(f"Ignore FS [{data[i+1]}]")
+            return 2
+
+        data_byte = data[i+1]
+        if command == GS and data_byte == ord('('): # GS ( <fn> pL pH <data>, e.g. graphics
+            if available < 5:
+                return 0
+            length = 5 + data[i+3] + (data[i+4] << 8)
+            self.log.debug(f"Ignore GS ( {chr(data[i+2])} ({length} bytes)")
+            if available < length:
+                self._skip = length - available
+                return available
+            return length
+
+        length = 2 + (ESC_PARAMS if command == ESC else GS_PARAMS).get(data_byte, 0)
+        if command == GS and data_byte == ord('V') and available > 2 and data[i+2] > 49:
+            length += 1 # cut modes B and up take a feed amount
+        if available < length:
+            return 0
+        self._run_command(command, chr(data_byte), data[i+2:i+length])
+        return length
+
+    def _run_command(self, command, data_byte, params):
+        """
+        Act on a complete ESC or GS command.
+        Args:
+            command: (int) ESC or GS.
+            data_byte: (str) The character identifying the command.
+            params: (bytes) The command's parameters.
+        Returns: None
+        """
+        if command == ESC:
+            if data_byte == '@': # initialize printer
+                self.log.debug("Initializing printer")
+                self._status_enabled = False
+            elif data_byte == 'p': # generate pulse
+                # Drawer state is left as-is; tests open and close it through drawer_open
+                self.log.debug(f"Pulse drawer [{params[0]}]")
+            elif data_byte == 'd': # print and feed
+                self._write_text("\n")
             else:
-                if ord(self._data[i]) == 0x1B: # ESC
-                    i += 1
-                    data_byte = self._data[i]
-                    i += 1
-
-                    if data_byte == '@': # initialize printer
-                        self.log.debug("Initializing printer")
-                        self._graphics_bytes = 0
-                        self._graphics_data = ""
-                        self._status_enabled = False
-                    elif data_byte == 'p': # generate pulse
-                        drawer = self._data[i]
-                        i += 1
-                        self.log.debug(f"Opening drawer [{drawer}]")
-                        self.drawer_open = (drawer == 1)
-                        i += 2 # ignore pulse duration
-                    elif data_byte == 'E': # emphasized on/off
-                        self.log.debug(f"Set bold [{ord(self._data[i])}] (not yet supported)")
-                        i += 1
-                        # TODO: How to represent bolded text without a GUI?
-                    elif data_byte == '-': # underline on/off
-                        self.log.debug(f"Set underline [{ord(self._data[i])}] (not yet supported)")
-                        i += 1
-                        # TODO: How to represent underlined text without a GUI?
-                    elif data_byte == '!': # select print modes
-                        mode = self._data[i]
-                        i += 1
-                        self.log.debug(f"Set mode [{ord(mode)}]] (not yet supported)")
-                        # TODO set_bold((mode & 0x08) != 0)
-                        # TODO set_large((mode & 0x10) != 0)
-                        # TODO set_underline((mode & 0x80) != 0)
-                        # TODO: How to represent bold/large/underline text without a GUI?
-                    elif data_byte == 'd': # print and feed
-                        self._write_text("\n")
-                        i += 1
-                    else:
-                        self.log.debug(f"Ignore ESC [{self._data[i-1]}]")
-
-
-                elif ord(self._data[i]) == 0x1D: # GS   
-                    i += 1
-                    data_byte = self._data[i]
-                    i += 1
-
-                    if data_byte == 'a': # enable/disable automatic status back (ASB)
-                        # Easier to ask for forgiveness than for permission
-                        try:
-                            self.log.debug(f"Set ASB [{ord(self._data[i])}]")
-                            self._status_enabled = self._data[i] != 0 # being lazy, all or nothing, not letting you pick what status you want
-                        except IndexError:
-                            self._status_enabled = False #Since the bit at that index does not exist, we assume failure here
-
-                        # if it's enabled, send it
-                        if self._status_enabled:
-                            self._send_status()
-                    elif data_byte == 'B': # reverse print mode on/off
-                        self.log.debug(f"Set reverse [{ord(self._data[i])}]")
-                        #self.set_reverse(self._data[i] == 1) # There is no method set_reverse currently implemented
-                        i += 1
-                    elif data_byte == 'V': # select cut mode and cut paper
-                        self.log.debug("Cut paper")
-
-                        # not processing partial vs full cut and line feeds, just read the data
-                        if (ord(self._data[i]) > 49):
-                            i +=1
-
-                        i += 1
-                        self._cut_paper()
-                    elif data_byte == '(':
-                        i += 1
-                        data_byte = self._data[i]
-                        i += 1
-
-                        if data_byte == 'L': # graphics command
-                            self.graphics_length = (self._data[i+1] << 8) + self._data[i]
-                            m = self._data[i+2]
-                            fn = self._data[i+3]
-                            i += 4
-                            if fn == '2':
-                                # function 50, print stored data
-                                self.log.debug("Print stored graphics data")
-                            elif fn == 'p':
-                                # store graphics
-                                self.log.debug("Store graphics data")
-                                self._storing_graphics = True
-                                self._graphics_data = ""
-                                self._graphics_bytes = self._graphics_length - 10
-                                i += 10
-                            else:
-                                self.log.error(f"Ignore graphics function [{fn}]")
-                        else:
-                            self.log.error(f"Ignore unexpected command after ( [{self._data[i]}]")
-                    else:
-                        self.log.debug(f"Ignore GS [{self._data[i-1]}]")
-                elif ord(self._data[i]) == 0x1F: # FS
-                    self.log.debug("Ignore FS [{self._data[i+1]}]")
-                    i += 2
-                elif ord(self._data[i]) == 0x10: # transmit real-time status
-                    i += 3
-                elif ord(self._data[i]) == 0x7f: # del
-                    i += 1 # ignore it
-                else:
-                    self._write_text(self._data[i])
-                    i += 1
-
-            #i += 1
-
-        self._data = ""
+                # TODO: How to represent bold/large/underline text without a GUI?
+                self.log.debug(f"Ignore ESC [{data_byte}] {list(params)}")
+
+        else:
+            if data_byte == 'a': # enable/disable automatic status back (ASB)
+                self.log.debug(f"Set ASB [{params[0]}]")
+                self._status_enabled = params[0] != 0 # being lazy, all or nothing, not letting you pick what status you want
+                # if it's enabled, send it
+                if self._status_enabled:
+                    self._send_status()
+            elif data_byte == 'V': # select cut mode and cut paper
+                # not processing partial vs full cut and line feeds
+                self.log.debug("Cut paper")
+                self._cut_paper()
+            else:
+                self.log.debug(f"Ignore GS [{data_byte}] {list(params)}")
 
     def _send_status(self):
         """
@@ -419,11 +427,8 @@ class PrinterSim():
             if self._status_enabled:
                 status = self._status.to_bytes(4, sys.byteorder)
 
-                if (self._serial_port != None):
-                    self._serial_port.write(status)
-
-                if (self._tcp_conn != None):
-                    self._tcp_conn.send(status)
+                if (self._endpoint != None):
+                    self._endpoint.send(status)
 
         except Exception as e:
             self.log.error(type(e).__name__ + ": " + str(e))
@@ -432,23 +437,30 @@ class PrinterSim():
         """
         Write text to the current receipt.
         # TODO: Find a way to represent text formatting
-        # TODO: Store past receipts if it's a desired feature
         Args:
             text: (str) The text to add to the receipt.
         Returns: None
         """
         self.log.log(1, f"Writing receipt: {text}") # Extremely spammy, only enable for debugging purposes
-        # If paper has been cut and we are not writing whitespace, clear text up to the cut position
-        if (self._cut_position > 0 and not any([c.isspace() for c in text])):
-            self.receipt_text = self.receipt_text[self._cut_position-1:]
-            self._cut_position = -1
-        self.receipt_text += text;
-        
+        with self._receipt_printed:
+            if self._started is None:
+                self._started = time.time()
+            self._current.append(text)
+
     def _cut_paper(self):
         """
-        Set cut position at the end of the current receipt, signaling to clear receipt text next time we write a receipt.
+        Finish the current receipt and add it to the history.
         """
-        self._cut_position = len(self.receipt_text)
+        with self._receipt_printed:
+            text = ''.join(self._current)
+            self._current = []
+            if not text.strip():
+                self._started = None
+                return # Nothing printed since the last cut
+            self._receipt_count += 1
+            self._receipts.append(Receipt(self._receipt_count, text, self._started, time.time()))
+            self._started = None
+            self._receipt_printed.notify_all()
 
 def setup():
     """
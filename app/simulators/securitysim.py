@@ -110,6 +110,6 @@ def init_securitysim():
         >> security = securitysim.init_securitysim()
         
         """
-    ip_addr = server.server.get_site_info()['ip']
+    ip_addr = system.profile().simulator_ips['ip']
     security = SecuritySim(endpoint=f"http://{ip_addr}/")
     return security
\ No newline at end of file
@@ -1,5 +1,7 @@
 import serial, logging
 
+from app.simulators import peripheral_loop
+
 log = logging.getLogger()
 
 class SerialScanner():
@@ -24,9 +26,11 @@ class SerialScanner():
         except serial.SerialException:
             log.error(f"Could not initialize serial barcode scanner sim. Ensure that COM{port} is available and not already in use.")
             raise
+        # The scanner only writes, so this just puts the port with the other simulated peripherals
+        self.endpoint = peripheral_loop.get_loop().serial(self.conn)
 
     def __del__(self):
-        self.conn.close()
+        self.endpoint.close()
 
     def scan(self, code):
         """
@@ -41,7 +45,7 @@ class SerialScanner():
             >>> scan('00001234')
             >>> scan('227182005009')
         """
-        self.conn.write(b'%s\r' % code.encode())
+        self.endpoint.send(b'%s\r' % code.encode())
 
     def scan_pe_code(self, code, price):
         """
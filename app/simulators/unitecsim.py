@@ -11,7 +11,7 @@ import logging, ast, time
 import json
 from app.util.runas import run_sqlcmd
 from app.framework import EDH
-from app.util import server, constants
+from app.util import constants, system
 from app.simulators.basesim import Simulator
 from app.framework.tc_helpers import test_func
 
@@ -24,7 +24,7 @@ def init_unitecsim():
     Docker Manager application running on the Server.
     """
     # TODO : We need to write the IP to some JSON file.
-    ip_addr = server.server.get_site_info()['ip']
+    ip_addr = system.profile().simulator_ips['ip']
     return UnitecSim(endpoint=f"http://{ip_addr}/")
 
 class UnitecSim(Simulator):
@@ -12,6 +12,7 @@ STANDARD_FORECOURT          = r"D:\Automation\app\data\ForecourtStandard.json"
 STANDARD_NETWORK            = r"D:\Automation\app\data\NetworkStandard.json"
 BRAND_ID                    = r"D:\Automation\app\data\brandIDs.json"
 PARSER_API                  = r"http://10.4.38.122:3000/parser/"
+TRANSLATION_CACHE           = r"D:\Automation\output\translation_cache.jsonl"
 
 # Control/Locator files
 CONTROLS_WPF                = r"D:\Automation\app\data\controls.json"
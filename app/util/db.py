@@ -0,0 +1,336 @@
+"""
+Name: db
+Description: Pooled access to the site's SQL Server databases. Queries run over
+             kept-open ODBC connections instead of launching sqlcmd.exe for each one,
+             take their values as parameters, and return rows whose columns can be
+             read by name.
+
+             Trusted connections are opened as passport\\EDH by default, the identity
+             runas.run_sqlcmd used, so the EDH tables and xp_cmdshell work as before.
+
+             The driver is pluggable: anything that returns a DB-API connection will do,
+             e.g. sqlite_connect() to try queries without a site. Keep queries portable
+             (max() instead of top 1, the limit argument instead of top (n)) so they run on both.
+
+Date created: 10/18/2026
+Modified By:
+Date Modified:
+"""
+
+import collections
+import contextlib
+import logging
+import queue
+import sqlite3
+import threading
+from pkgutil import find_loader
+
+pyodbc_installed = find_loader('pyodbc') is not None
+if pyodbc_installed:
+    import pyodbc
+
+win32security_installed = find_loader('win32security') is not None
+if win32security_installed:
+    import win32security
+
+log = logging.getLogger()
+
+# Connection settings
+default_server   = "passporteps"
+default_database = "network"
+odbc_driver      = "SQL Server"
+pool_size        = 4  # Idle connections kept open per database
+login_timeout    = 50 # Seconds, same as sqlcmd -l 50
+# Windows account trusted connections are opened as, (user, domain, password). Same as runas.run_sqlcmd
+default_windows_login = ("EDH", "passport", "EDH")
+
+class DatabaseError(Exception):
+    def __init__(self, arg):
+        log.error(arg)
+        self.message = arg
+        super().__init__(arg)
+
+def odbc_connect(server, database, user=None, password=None, windows_login=default_windows_login):
+    """
+    Get a function that opens ODBC connections to a SQL Server database.
+    Args:
+        server: (str) The SQL Server host
+        database: (str) The database to use
+        user: (str) SQL login. Defaults to a trusted connection
+        password: (str) Password for the SQL login
+        windows_login: (tuple) (user, domain, password) of the Windows account to open the trusted
+                       connection as. None uses the account running the tests
+    Returns:
+        function: Opens and returns a new connection
+    Examples:
+        >>> Database(connect=odbc_connect("POSSERVER01", "GlobalSTORE", windows_login=None))
+        Database(POSSERVER01/GlobalSTORE)
+    """
+    if not pyodbc_installed:
+        raise DatabaseError("pyodbc is not installed. Install it with: pip install pyodbc")
+    connstr = f"Driver={{{odbc_driver}}};Server={server};Database={database};"
+    if user:
+        connstr += f"UID={user};PWD={password};"
+        windows_login = None
+    else:
+        connstr += "Trusted_Connection=yes;"
+    def connect():
+        # The login happens when the connection opens, so it keeps the identity after we revert
+        with impersonate(windows_login):
+            return pyodbc.connect(connstr, timeout=login_timeout)
+    connect.description = f"{server}/{database}" + (f" as {windows_login[1]}\\{windows_login[0]}" if windows_login else "")
+    return connect
+
+@contextlib.contextmanager
+def impersonate(windows_login):
+    """
+    Act as another Windows account on this thread for the duration of the block.
+    Args:
+        windows_login: (tuple) (user, domain, password), or None to stay as the current account
+    Examples:
+        >>> with impersonate(default_windows_login):
+        ...     conn = pyodbc.connect(connstr)
+    """
+    if not windows_login:
+        yield
+        return
+    if not win32security_installed:
+        raise DatabaseError("pywin32 is needed to connect as another Windows account. Install it with: pip install pywin32")
+    user, domain, password = windows_login
+    try:
+        token = win32security.LogonUser(user, domain, password, win32security.LOGON32_LOGON_INTERACTIVE,
+                                        win32security.LOGON32_PROVIDER_DEFAULT)
+    except win32security.error as e:
+        raise DatabaseError(f"Unable to log on as {domain}\\{user}: {e}") from e
+    try:
+        win32security.ImpersonateLoggedOnUser(token)
+        try:
+            yield
+        finally:
+            win32security.RevertToSelf()
+    finally:
+        token.Close()
+
+def sqlite_connect(path=":memory:"):
+    """
+    Get a function that opens SQLite connections, to stand in for the site database.
+    Args:
+        path: (str) The database file. The default in-memory database is shared by all of the pool's connections
+    Returns:
+        function: Opens and returns a new connection
+    Examples:
+        >>> test_db = Database(connect=sqlite_connect())
+        >>> test_db.execute("create table NetworkMessages (NetworkMessageId int, NetworkPSPid text, NetworkMessage text)")
+    """
+    uri = "file::memory:?cache=shared" if path == ":memory:" else f"file:{path}"
+    keep_alive = sqlite3.connect(uri, uri=True, check_same_thread=False) # The shared in-memory database lives while a connection is open
+    def connect():
+        return sqlite3.connect(uri, uri=True, check_same_thread=False)
+    connect.description = path
+    connect.keep_alive = keep_alive
+    return connect
+
+class Database:
+    """
+    A pool of connections to one database. Safe to share between threads.
+    Values are passed as parameters, using ? placeholders, rather than formatted into the SQL.
+    Examples:
+        >>> network = Database()
+        >>> network.query("select * from NetworkMessages where NetworkPSPid = ? order by 1 desc", "23", limit=2)
+        [Row(NetworkMessageId=2354, NetworkPSPid='23', ...), Row(NetworkMessageId=2353, NetworkPSPid='23', ...)]
+        >>> network.scalar("select max(NetworkMessageId) from NetworkMessages")
+        2354
+    """
+    def __init__(self, server=default_server, database=default_database, user=None, password=None, connect=None,
+                 windows_login=default_windows_login):
+        self.connect = connect or odbc_connect(server, database, user, password, windows_login)
+        self.name = getattr(self.connect, 'description', f"{server}/{database}")
+        self._idle = queue.LifoQueue(maxsize=pool_size)
+        self._row_types = {}
+
+    @contextlib.contextmanager
+    def connection(self):
+        """
+        Borrow a connection from the pool. It's committed and returned to the pool
+        when the block finishes, or rolled back and closed if the block raises.
+        Examples:
+            >>> with network.connection() as conn:
+            ...     conn.cursor().execute("update SMIStatus set OptionValue = '1' where OptionID = '0'")
+        """
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                conn = self.connect()
+            except Exception as e:
+                raise DatabaseError(f"Unable to connect to {self.name}: {e}") from e
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            with contextlib.suppress(Exception):
+                conn.rollback()
+                conn.close()
+            raise
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def query(self, sql, *params, limit=None):
+        """
+        Run a query.
+        Args:
+            sql: (str) The query, with ? for each parameter
+            params: Values for the parameters
+            limit: (int) Only fetch this many rows. Use it instead of top (n), which SQLite doesn't have
+        Returns:
+            list: The rows, as named tuples with the query's column names
+        Examples:
+            >>> network.query("select NetworkMessage from NetworkMessages where NetworkMessageId > ?", 2350)
+            [Row(NetworkMessage='Request[1]> [...]'), ...]
+            >>> network.query("select * from NetworkMessages order by 1 desc", limit=2)
+            [Row(NetworkMessageId=2354, ...), Row(NetworkMessageId=2353, ...)]
+        """
+        with self._cursor(sql, params) as cursor:
+            if cursor.description is None:
+                return []
+            row_type = self._row_type(cursor.description)
+            rows = cursor.fetchall() if limit is None else cursor.fetchmany(int(limit))
+            return [row_type._make(row) for row in rows]
+
+    def scalar(self, sql, *params):
+        """
+        Run a query and get the first column of its first row.
+        Returns:
+            The value, or None if there were no rows
+        Examples:
+            >>> network.scalar("select count(*) from NetworkMessages where NetworkPSPid = ?", "23")
+            118
+        """
+        with self._cursor(sql, params) as cursor:
+            if cursor.description is None:
+                return None
+            row = cursor.fetchone()
+            return row[0] if row is not None else None
+
+    def execute(self, sql, *params):
+        """
+        Run a statement that doesn't return rows.
+        Returns:
+            int: The number of rows affected
+        Examples:
+            >>> network.execute("update SMIStatus set OptionValue = ? where OptionID = ?", "1", "0")
+            1
+        """
+        with self._cursor(sql, params) as cursor:
+            return cursor.rowcount
+
+    def execute_many(self, sql, param_rows):
+        """
+        Run a statement once for each set of parameters, in one round of the pool and one transaction.
+        Args:
+            sql: (str) The statement, with ? for each parameter
+            param_rows: (list) A list of parameter tuples
+        Returns:
+            int: The number of rows affected, if the driver reports it
+        Examples:
+            >>> network.execute_many("insert into EncryptionConfig (configid, value) values (?, ?)", [(6, 1), (7, 0)])
+            2
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.executemany(sql, list(param_rows))
+            except Exception as e:
+                raise DatabaseError(f"Batch failed on {self.name}: {e}\n{sql}") from e
+            return cursor.rowcount
+
+    def batch(self, statements):
+        """
+        Run several statements in one transaction. If any fails, none are kept.
+        Args:
+            statements: (list) SQL strings, or (sql, params) tuples
+        Returns:
+            list: The number of rows each statement affected
+        Examples:
+            >>> network.batch([("update RBS_GlobalInfo set TID = ?", ("001",)), "update SMIStatus set OptionValue = '1'"])
+            [1, 1]
+        """
+        counts = []
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            for statement in statements:
+                sql, params = (statement, ()) if isinstance(statement, str) else statement
+                try:
+                    cursor.execute(sql, tuple(params))
+                except Exception as e:
+                    raise DatabaseError(f"Batch failed on {self.name}: {e}\n{sql}") from e
+                counts.append(cursor.rowcount)
+        return counts
+
+    def cmdshell(self, command):
+        """
+        Run a command on the database server through xp_cmdshell.
+        Args:
+            command: (str) The command line
+        Returns:
+            list: The lines of output, without trailing spaces. Blank lines are empty strings
+        Examples:
+            >>> network.cmdshell(r"if exist D:\\Automation\\app\\data\\Configured_Site echo found ")
+            ['found', '']
+        """
+        return [(row[0] or '').rstrip() for row in self.query("exec xp_cmdshell ?", command)]
+
+    def close(self):
+        """Close the pool's idle connections."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    @contextlib.contextmanager
+    def _cursor(self, sql, params):
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql, params)
+            except Exception as e:
+                raise DatabaseError(f"Query failed on {self.name}: {e}\n{sql}") from e
+            yield cursor
+
+    def _row_type(self, description):
+        columns = tuple(column[0] for column in description)
+        row_type = self._row_types.get(columns)
+        if row_type is None:
+            row_type = collections.namedtuple('Row', columns, rename=True)
+            self._row_types[columns] = row_type
+        return row_type
+
+    def __repr__(self):
+        return f"Database({self.name})"
+
+_databases = {}
+_databases_lock = threading.Lock()
+
+def get(database=default_database, server=default_server, windows_login=default_windows_login):
+    """
+    Get the shared pool for a database, creating it on first use.
+    Args:
+        database: (str) The database to use
+        server: (str) The SQL Server host
+        windows_login: (tuple) (user, domain, password) to connect as. Defaults to passport\\EDH. None uses the current account
+    Returns:
+        Database: The pool
+    Examples:
+        >>> db.get().scalar("select max(NetworkMessageId) from NetworkMessages")
+        2354
+        >>> db.get("GlobalSTORE", "POSSERVER01", windows_login=None)
+        Database(POSSERVER01/GlobalSTORE)
+    """
+    key = (server.lower(), database.lower(), windows_login[:2] if windows_login else None)
+    with _databases_lock:
+        if key not in _databases:
+            _databases[key] = Database(server, database, windows_login=windows_login)
+        return _databases[key]
@@ -0,0 +1,323 @@
+"""
+Name: locators
+Description: The element lookups shared by the Selenium drivers (pos_html, edge,
+             console, checkout). Controls are loaded from the *_controls.json files
+             as Locators, which know whether they're XPath or CSS and keep that
+             through % formatting. A Finder waits with waits.poll instead of
+             building a WebDriverWait per call, retries stale elements a bounded
+             number of times, checks visibility and reads text for many elements
+             in one execute_script, and revalidates the element it found last
+             for a locator instead of searching the DOM again.
+
+Date created: 10/18/2026
+Modified By:
+Date Modified:
+"""
+
+import json
+import logging
+
+from selenium.webdriver.common.by import By
+from selenium.common.exceptions import (ElementClickInterceptedException, StaleElementReferenceException,
+                                        WebDriverException)
+
+from app.util import waits
+
+log = logging.getLogger()
+
+# Settings
+max_stale_retries = 3 # Times an element that went stale is looked up again before giving up
+cache_size = 256      # Elements remembered, by locator
+
+# Scripts run in the page. Each takes a list of elements so any number are handled in one call.
+_VISIBLE = """
+function visible(e) {
+    if (!e.isConnected || !(e.offsetWidth || e.offsetHeight || e.getClientRects().length)) { return false; }
+    return window.getComputedStyle(e).visibility !== 'hidden';
+}
+"""
+_VISIBLE_JS = _VISIBLE + "return arguments[0].map(visible);"
+_CLICKABLE_JS = _VISIBLE + "return visible(arguments[0]) && !arguments[0].disabled;"
+_TEXTS_JS = "return arguments[0].map(function (e) { return e.innerText; });"
+_MATCHES_JS = _VISIBLE + """
+var e = arguments[0], by = arguments[1], locator = arguments[2], found = [];
+if (by === 'xpath') {
+    var snap = document.evaluate(locator, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    for (var i = 0; i < snap.snapshotLength; i++) { found.push(snap.snapshotItem(i)); }
+} else {
+    found = Array.prototype.slice.call(document.querySelectorAll(locator));
+}
+return found.length === 1 && found[0] === e && (!arguments[3] || visible(e));
+"""
+_READ_JS = _VISIBLE + """
+return arguments[0].map(function (loc) {
+    var found = [];
+    if (loc[0] === 'xpath') {
+        var snap = document.evaluate(loc[1], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        for (var i = 0; i < snap.snapshotLength; i++) { found.push(snap.snapshotItem(i)); }
+    } else {
+        found = Array.prototype.slice.call(document.querySelectorAll(loc[1]));
+    }
+    return found.filter(visible).map(function (e) { return e.innerText; });
+});
+"""
+
+def locator_type(locator):
+    """
+    Work out whether a locator is XPath or CSS.
+    Returns:
+        str: By.XPATH or By.CSS_SELECTOR
+    Examples:
+        >>> locator_type("//button[@id='login_enter']")
+        'xpath'
+        >>> locator_type(".keypad > button")
+        'css selector'
+    """
+    start = locator.lstrip()
+    return By.XPATH if start.startswith(('/', '(', './', '..')) else By.CSS_SELECTOR
+
+class Locator(str):
+    """
+    A locator that knows its type. Filling in a template with % gives a Locator of the same type.
+    Examples:
+        >>> key = Locator("//button[text()='%s']")
+        >>> (key % "Cash").by
+        'xpath'
+    """
+    def __new__(cls, value, by=None):
+        self = super().__new__(cls, value)
+        self.by = by or locator_type(value)
+        return self
+
+    def __mod__(self, args):
+        return Locator(str.__mod__(self, args), self.by)
+
+def compile_controls(controls):
+    """
+    Turn every string in a controls map into a Locator.
+    Args:
+        controls: (dict/list/str) Controls loaded from a *_controls.json file
+    Returns:
+        The same structure, with Locators for strings
+    """
+    if isinstance(controls, dict):
+        return {key: compile_controls(value) for key, value in controls.items()}
+    if isinstance(controls, list):
+        return [compile_controls(value) for value in controls]
+    if isinstance(controls, str):
+        return Locator(controls)
+    return controls
+
+def load_controls(path):
+    """
+    Load a *_controls.json file with its locators compiled.
+    Args:
+        path: (str) The controls file
+    Returns:
+        dict: The controls, with Locators for strings
+    Examples:
+        >>> controls = load_controls(constants.CONTROLS_EDGE)
+        >>> controls['keypad']['1'].by
+        'xpath'
+    """
+    with open(path) as f:
+        return compile_controls(json.load(f))
+
+class Finder:
+    """
+    Finds elements for one driver module. The driver is read through a function,
+    as the modules replace theirs on connect and close.
+    Examples:
+        >>> finder = Finder(lambda: driver)
+        >>> finder.click(controls['function keys']['speed keys'])
+        True
+        >>> finder.read_texts([controls['receipt']['items'], controls['receipt']['total']])
+        {"//div[@id='receipt']//span": ['Generic Item', ...], ...}
+    """
+    def __init__(self, get_driver, trigger=None):
+        """
+        Args:
+            get_driver: (function) Returns the module's current WebDriver
+            trigger: (function) Trigger for waits.poll, to re-check as soon as the page changes
+        """
+        self.get_driver = get_driver
+        self.trigger = trigger
+        self.handles = {}
+        self.driver = None # The driver the remembered elements belong to
+
+    def find_elements(self, locator, timeout=1, type=None, visible_only=True, warn=True):
+        """
+        Find the elements matching a locator, waiting for at least one.
+        Args:
+            locator: (str) XPath or CSS locator
+            timeout: (float/Deadline) Seconds to wait for a match
+            type: (str) By.XPATH or By.CSS_SELECTOR. Defaults to the locator's own type
+            visible_only: (bool) Only count visible elements
+            warn: (bool) Log a warning if nothing matches
+        Returns:
+            list: The elements, or None if none matched in time
+        """
+        by = self._by(locator, type)
+        driver = self.get_driver()
+        def attempt():
+            elements = driver.find_elements(by, locator)
+            if elements and visible_only:
+                flags = driver.execute_script(_VISIBLE_JS, elements)
+                elements = [element for element, visible in zip(elements, flags) if visible]
+            return elements or None
+        elements = waits.poll(attempt, timeout, trigger=self.trigger,
+                              exceptions=(StaleElementReferenceException,), name="find_elements")
+        if elements is None and warn:
+            log.warning(f"No elements with locator {locator} were {'visible' if visible_only else 'present'} within {self._seconds(timeout)} seconds")
+        return elements
+
+    def find_element(self, locator, timeout=1, type=None, visible_only=True, unique=True, warn=True):
+        """
+        Find the element matching a locator. The element found last time is reused if it
+        still matches, checked with one script call instead of searching again.
+        Args:
+            locator: (str) XPath or CSS locator
+            timeout: (float/Deadline) Seconds to wait for a match
+            type: (str) By.XPATH or By.CSS_SELECTOR. Defaults to the locator's own type
+            visible_only: (bool) Only count visible elements
+            unique: (bool) Fail if more than one element matches. If False, the first is used
+            warn: (bool) Log a warning if nothing matches
+        Returns:
+            WebElement: The element, or None
+        """
+        by = self._by(locator, type)
+        key = (by, str(locator), visible_only)
+        driver = self.get_driver()
+        if driver is not self.driver:
+            self.forget()
+            self.driver = driver
+        cached = self.handles.get(key)
+        if cached is not None:
+            try:
+                if driver.execute_script(_MATCHES_JS, cached, by, str(locator), visible_only):
+                    return cached
+            except (StaleElementReferenceException, WebDriverException):
+                pass
+            self.handles.pop(key, None)
+
+        elements = self.find_elements(locator, timeout, by, visible_only, warn=False)
+        if not elements:
+            if warn:
+                log.warning("Could not find element with the locator [%s]"%(locator))
+            return None
+        if unique and len(elements) > 1:
+            log.warning(f"There is more than one element matching the locator {locator}."
+                        "Try a more specific locator, or use _find_elements if this is expected.")
+            return None
+        if len(self.handles) >= cache_size:
+            self.handles.clear()
+        if len(elements) == 1:
+            self.handles[key] = elements[0]
+        return elements[0]
+
+    def get_texts(self, locator, timeout=1, type=None, visible_only=True):
+        """
+        Get the text of every element matching a locator, read in one script call.
+        Returns:
+            list: The texts, or None if nothing matched
+        """
+        for _ in range(max_stale_retries):
+            elements = self.find_elements(locator, timeout, type, visible_only)
+            if not elements:
+                return None
+            try:
+                return [(text or '').strip() for text in self.get_driver().execute_script(_TEXTS_JS, elements)]
+            except StaleElementReferenceException:
+                log.debug(f"Elements with locator {locator} changed while being read. Looking again.")
+        return None
+
+    def get_text(self, locator, timeout=1, type=None, visible_only=True, unique=True):
+        """
+        Get the text of the element matching a locator.
+        Returns:
+            str: The text, or None if nothing matched
+        """
+        for _ in range(max_stale_retries):
+            element = self.find_element(locator, timeout, type, visible_only, unique)
+            if element is None:
+                return None
+            try:
+                return element.text
+            except StaleElementReferenceException:
+                log.debug(f"Element with locator {locator} changed while being read. Looking again.")
+        return None
+
+    def read_texts(self, locators, type=None):
+        """
+        Read the visible text of several locators at once, in one script call.
+        Args:
+            locators: (list) XPath or CSS locators
+            type: (str) By.XPATH or By.CSS_SELECTOR for all of them. Defaults to each locator's own type
+        Returns:
+            dict: Each locator mapped to a list of the texts of its visible elements
+        """
+        pairs = [['xpath' if self._by(locator, type) == By.XPATH else 'css', str(locator)] for locator in locators]
+        results = self.get_driver().execute_script(_READ_JS, pairs)
+        return {locator: [(text or '').strip() for text in texts] for locator, texts in zip(locators, results)}
+
+    def is_present(self, locator, timeout=0.5, type=None):
+        """
+        Wait for an element matching a locator to be visible.
+        Returns:
+            bool: True if one was visible in time
+        """
+        return self.find_elements(locator, timeout, type, visible_only=True, warn=False) is not None
+
+    def click(self, locator, timeout=10, type=None):
+        """
+        Scroll to the element matching a locator and click it once it's clickable,
+        retrying while it's obscured or re-rendered.
+        Args:
+            locator: (str) XPath or CSS locator
+            timeout: (float/Deadline) Seconds to wait for the element to be found and clicked
+            type: (str) By.XPATH or By.CSS_SELECTOR. Defaults to the locator's own type
+        Returns:
+            bool: True if it was clicked
+        """
+        end = waits.deadline(timeout)
+        driver = self.get_driver()
+        problem = None
+        for _ in range(max_stale_retries):
+            element = self.find_element(locator, end, type, visible_only=False, unique=False, warn=False)
+            if element is None:
+                log.warning(f"Element with locator {locator} was not found within {self._seconds(timeout)} seconds.")
+                return False
+            try:
+                driver.execute_script("arguments[0].scrollIntoView(true);", element)
+                if not waits.poll(lambda: driver.execute_script(_CLICKABLE_JS, element), end,
+                                  trigger=self.trigger, name="clickable"):
+                    log.warning(f"Element with locator {locator} was found but not clickable within {self._seconds(timeout)} seconds.")
+                    return False
+                def try_click():
+                    nonlocal problem
+                    try:
+                        element.click()
+                        return True
+                    except ElementClickInterceptedException as e:
+                        problem = e
+                        return False
+                if waits.poll(try_click, end, trigger=self.trigger, name="click"):
+                    return True
+                log.warning(f"Element with locator {locator} was found but obscured by another element.")
+                log.warning(f"Selenium message: {problem}") # This exception actually contains useful information
+                return False
+            except StaleElementReferenceException:
+                # The element can be replaced by an identical one, e.g. when switching function key menus
+                log.debug("Element became stale after we grabbed it. Looking it up again.")
+        log.warning(f"Element with locator {locator} kept going stale. Gave up after {max_stale_retries} tries.")
+        return False
+
+    def forget(self):
+        """Drop the remembered elements. Done automatically when the module's driver changes."""
+        self.handles.clear()
+
+    def _by(self, locator, type):
+        return type or getattr(locator, 'by', None) or locator_type(locator)
+
+    def _seconds(self, timeout):
+        return timeout.timeout if isinstance(timeout, waits.Deadline) else timeout
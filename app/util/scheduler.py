@@ -0,0 +1,302 @@
+"""
+Name: scheduler
+Description: Runs the scripts in a suite across a pool of identically imaged sites.
+             Scripts are handed out longest first, using how long they took in
+             previous runs, so the whole suite finishes as early as possible.
+             A script's setup, tests and teardown always run together on one site,
+             and scripts listed in a suite's "affinity" groups share a site.
+
+             This module doesn't touch Passport itself, so the scheduling can be
+             exercised with LocalAgents that just call a function.
+
+Date created: 10/18/2026
+Modified By:
+Date Modified:
+"""
+
+import glob
+import heapq
+import json
+import logging
+import os
+import subprocess
+import threading
+import time
+import uuid
+
+log = logging.getLogger()
+
+default_estimate = 300 # Seconds to assume for a script with no history
+history_weight   = 0.5 # Weight of the latest run in a script's estimated duration
+
+class DurationHistory:
+    """
+    How long each script has taken, kept as a moving average in a JSON file.
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.durations = {}
+        if path and os.path.isfile(path):
+            try:
+                with open(path) as f:
+                    self.durations = json.load(f)
+            except ValueError as e:
+                log.warning(f"Ignoring unreadable duration history {path}: {e}")
+
+    def estimate(self, script):
+        """
+        Get the expected duration of a script.
+        Args:
+            script: (str) The script file name
+        Returns:
+            float: Seconds. Scripts with no history get the average of the known ones.
+        Examples:
+            >>> DurationHistory().estimate("Dept_Maint.py")
+            300
+        """
+        if script in self.durations:
+            return self.durations[script]
+        if self.durations:
+            return sum(self.durations.values()) / len(self.durations)
+        return default_estimate
+
+    def update(self, script, seconds):
+        previous = self.durations.get(script)
+        if previous is None:
+            self.durations[script] = seconds
+        else:
+            self.durations[script] = history_weight * seconds + (1 - history_weight) * previous
+
+    def save(self):
+        if not self.path:
+            return
+        with open(self.path, 'w') as f:
+            json.dump(self.durations, f, indent=4, sort_keys=True)
+
+def entry_script(entry):
+    """Get the script name of a suite entry, which is either a name or {name: [tests]}."""
+    return [*entry][0] if type(entry) == dict else entry
+
+def entry_tests(entry):
+    """Get the tests to run for a suite entry. An empty list runs all of them."""
+    return entry[entry_script(entry)] if type(entry) == dict else []
+
+class Job:
+    """
+    One or more suite entries that must run in order on the same site.
+    """
+    def __init__(self, index, entries):
+        self.index = index
+        self.entries = entries
+
+    @property
+    def name(self):
+        return ' + '.join(entry_script(entry) for entry in self.entries)
+
+    def estimate(self, history):
+        return sum(history.estimate(entry_script(entry)) for entry in self.entries)
+
+    def __repr__(self):
+        return f"Job({self.name})"
+
+def build_jobs(feature_list, affinity=[]):
+    """
+    Group suite entries into jobs.
+    Args:
+        feature_list: (list) The suite_features of a suite file
+        affinity: (list) Lists of script names that must run on the same site, in suite order
+    Returns:
+        list: Jobs, in suite order
+    Examples:
+        >>> build_jobs(["A.py", {"B.py": ["test_1"]}, "C.py"], [["A.py", "C.py"]])
+        [Job(A.py + C.py), Job(B.py)]
+    """
+    groups = {}
+    for group_num, group in enumerate(affinity):
+        for script in group:
+            groups[script] = group_num
+
+    jobs = []
+    grouped = {}
+    for entry in feature_list:
+        group_num = groups.get(entry_script(entry))
+        if group_num is None:
+            jobs.append(Job(len(jobs), [entry]))
+        elif group_num in grouped:
+            grouped[group_num].entries.append(entry)
+        else:
+            grouped[group_num] = Job(len(jobs), [entry])
+            jobs.append(grouped[group_num])
+    return jobs
+
+def plan(jobs, agents, history):
+    """
+    Assign jobs to agents, longest processing time first: each job, longest first,
+    goes to the agent with the least work so far.
+    Args:
+        jobs: (list) The jobs to assign
+        agents: (list) The agents to run them on
+        history: (DurationHistory) Source of estimated durations
+    Returns:
+        tuple: Agent name mapped to its list of jobs, and the estimated seconds until all finish
+    Examples:
+        >>> plan(build_jobs(["A.py", "B.py", "C.py"]), [LocalAgent("site1", f), LocalAgent("site2", f)], DurationHistory())
+        ({'site1': [Job(A.py), Job(C.py)], 'site2': [Job(B.py)]}, 600)
+    """
+    assignment = {agent.name: [] for agent in agents}
+    loads = [(0, num, agent.name) for num, agent in enumerate(agents)]
+    heapq.heapify(loads)
+    for job in sorted(jobs, key=lambda job: -job.estimate(history)):
+        load, num, name = heapq.heappop(loads)
+        assignment[name].append(job)
+        heapq.heappush(loads, (load + job.estimate(history), num, name))
+    return assignment, max(load for load, _, _ in loads) if loads else 0
+
+def run(jobs, agents, history):
+    """
+    Run jobs across agents. Each agent takes the longest remaining job whenever
+    it's free, so a site that runs fast or slow doesn't leave the others waiting.
+    Args:
+        jobs: (list) The jobs to run
+        agents: (list) The agents to run them on
+        history: (DurationHistory) Estimates to order jobs by. Updated with the measured durations.
+    Returns:
+        list: Result dicts from every agent, in suite order, each with the site it ran on
+    """
+    pending = sorted(jobs, key=lambda job: -job.estimate(history))
+    lock = threading.Lock()
+    finished = {}
+
+    def work(agent):
+        while True:
+            with lock:
+                if not pending:
+                    return
+                job = pending.pop(0)
+            log.info(f"{agent.name} is starting {job.name}")
+            job_results = []
+            for entry in job.entries:
+                script = entry_script(entry)
+                start_time = time.time()
+                try:
+                    entry_results = agent.run_entry(entry)
+                except Exception as e:
+                    log.error(f"{agent.name} failed to run {script}: {e}")
+                    entry_results = [failed_result(script, f"Site {agent.name} failed to run the script: {e}")]
+                elapsed = time.time() - start_time
+                for result in entry_results:
+                    result['site'] = agent.name
+                job_results.extend(entry_results)
+                with lock:
+                    history.update(script, elapsed)
+            with lock:
+                finished[job.index] = job_results
+            log.info(f"{agent.name} finished {job.name}")
+
+    threads = [threading.Thread(target=work, args=(agent,), name=f"Agent-{agent.name}") for agent in agents]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return [result for index in sorted(finished) for result in finished[index]]
+
+def failed_result(script, description):
+    return {'test_id': script, 'script_name': script, 'description': description,
+            'run_time': "00:00:00", 'result': "fail"}
+
+class Agent:
+    """
+    A site that can run suite entries. Subclasses implement run_entry.
+    """
+    def __init__(self, name):
+        self.name = name
+
+    def run_entry(self, entry):
+        """
+        Run one suite entry.
+        Args:
+            entry: (str/dict) A script name, or {script name: [tests to run]}
+        Returns:
+            list: Result dicts with test_id, script_name, description, run_time and result ("pass"/"fail")
+        """
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name})"
+
+class LocalAgent(Agent):
+    """
+    Runs entries by calling a function in this process. Use it to try out
+    schedules with fake sites, or to run a suite in-process.
+    Examples:
+        >>> fake = LocalAgent("fake1", lambda entry: [failed_result(entry_script(entry), "not run")])
+        >>> run(build_jobs(["A.py"]), [fake], DurationHistory())
+        [{'test_id': 'A.py', 'script_name': 'A.py', 'description': 'not run', 'run_time': '00:00:00', 'result': 'fail', 'site': 'fake1'}]
+    """
+    def __init__(self, name, func):
+        super().__init__(name)
+        self.func = func
+
+    def run_entry(self, entry):
+        return self.func(entry)
+
+class CommandAgent(Agent):
+    """
+    Runs entries on another site by running a command, such as psexec launching
+    test_harness.py there, and reads the results file the remote harness writes.
+    Args:
+        name: (str) Name of the site, used in logs and the merged report
+        command: (str) Command to run. {script}, {tests} and {results_dir} are filled in. Pass
+                 {results_dir} to the remote harness as -var results_dir:{results_dir}
+        share: (str) The remote automation directory, as seen from this machine
+        timeout: (int) Seconds to let one script run before giving up on it
+    Examples:
+        >>> CommandAgent("site2", r"psexec \\\\site2 -w D:\\automation python test_harness.py "
+        ...              r"-run {script} {tests} -var results_dir:{results_dir}", r"\\\\site2\\automation")
+        CommandAgent(site2)
+    """
+    def __init__(self, name, command, share, timeout=4*3600):
+        super().__init__(name)
+        self.command = command
+        self.share = share
+        self.timeout = timeout
+        self.run_token = uuid.uuid4().hex[:8]
+
+    def run_entry(self, entry):
+        script = entry_script(entry)
+        tests = entry_tests(entry)
+        results_dir = f"output/scheduler/{self.run_token}/{uuid.uuid4().hex[:8]}"
+        command = self.command.format(script=script, results_dir=results_dir,
+                                      tests=f"-tests {','.join(tests)}" if tests else "")
+        log.debug(f"{self.name}: {command}")
+        completed = subprocess.run(command, shell=True, timeout=self.timeout,
+                                   stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        if completed.returncode != 0:
+            log.warning(f"{self.name} exited with {completed.returncode} running {script}: {completed.stdout[-500:]}")
+
+        results = []
+        for path in glob.glob(os.path.join(self.share, results_dir, '*.jsonl')):
+            with open(path) as f:
+                for line in f:
+                    record = json.loads(line) if line.strip() else {}
+                    if record.pop('type', None) == 'test':
+                        results.append(record)
+        if not results:
+            results.append(failed_result(script, f"No results came back from {self.name}"))
+        return results
+
+def load_agents(path):
+    """
+    Create CommandAgents from a site farm file.
+    Args:
+        path: (str) JSON file with a "sites" list. Each site has name, command, share and optionally timeout
+    Returns:
+        list: The agents
+    Examples:
+        >>> load_agents("scripts/sites.json")
+        [CommandAgent(site1), CommandAgent(site2)]
+    """
+    with open(path) as f:
+        farm = json.load(f)
+    return [CommandAgent(**site) for site in farm['sites']]
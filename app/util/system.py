@@ -16,14 +16,14 @@ from pywinauto.keyboard import send_keys
 from pywinauto import Application
 import shutil
 import subprocess
+import threading
 import time
-import win32com.client
 import win32gui, win32process, win32con
 from win32gui import FindWindow
 from winreg import HKEY_LOCAL_MACHINE, KEY_ALL_ACCESS, OpenKey, QueryValueEx
 
 # In house modules
-from app.util import constants
+from app.util import constants, db, waits
 
 log = logging.getLogger()
 
@@ -121,19 +121,142 @@ def collect_logs(difference=10):
     return True
 
 def get_version():
-    pp_subkey = constants.PASSPORT_SUBKEY
-    reg_key = OpenKey(HKEY_LOCAL_MACHINE, pp_subkey, 0, KEY_ALL_ACCESS)
-
-    pp_version = QueryValueEx(reg_key, 'Version')[0]
-    version = pp_version.strip()
-    return version
+    return profile().version
 
 def get_brand():
-    pp_subkey = constants.PASSPORT_SUBKEY
-    reg_key = OpenKey(HKEY_LOCAL_MACHINE, pp_subkey, 0, KEY_ALL_ACCESS)
+    return profile().brand
+
+def read_registry(subkey, name):
+    """
+    Read a value under HKEY_LOCAL_MACHINE.
+    Args:
+        subkey: (str) The key, e.g. constants.PASSPORT_SUBKEY
+        name: (str) The value name
+    Returns:
+        The value's data
+    Raises:
+        FileNotFoundError: If the key or value doesn't exist
+    """
+    reg_key = OpenKey(HKEY_LOCAL_MACHINE, subkey, 0, KEY_ALL_ACCESS)
+    try:
+        return QueryValueEx(reg_key, name)[0]
+    finally:
+        reg_key.Close()
+
+class SiteProfile:
+    """
+    What this site is: brand, version, POS type, MWS resolution, dispenser count and
+    simulator IPs. Each is read the first time it's needed and then kept, until
+    invalidate_profile() is called after Passport restarts.
+    The sources can be replaced, or values given outright, to use it without a site.
+    Examples:
+        >>> profile().brand
+        'Exxon'
+        >>> set_profile(SiteProfile(brand='Exxon', version='11.04.23.01A', site_type='HTMLPos'))
+        >>> SiteProfile(registry=lambda subkey, name: {'BrandSelected': 'Core'}[name]).brand
+        'Core'
+    """
+    def __init__(self, registry=read_registry, site_info=None, standard_config=constants.STANDARD_CONFIG, **values):
+        """
+        Args:
+            registry: (function) Takes a HKLM subkey and value name, returns the value
+            site_info: (function) Returns the simulator IPs. Defaults to asking the automation server
+            standard_config: (str) StandardConfig.json, for the configured dispensers
+            values: Values to use instead of reading them, e.g. brand='Exxon'
+        """
+        self.registry = registry
+        self.site_info = site_info or server.server.get_site_info
+        self.standard_config = standard_config
+        self.fixed = values
+        self.values = dict(values)
+
+    def invalidate(self):
+        """Forget the values that were read, so they're read again on next use. Given values are kept."""
+        self.values = dict(self.fixed)
+
+    @property
+    def brand(self):
+        return self._get('brand', lambda: self.registry(constants.PASSPORT_SUBKEY, 'BrandSelected'))
+
+    @property
+    def version(self):
+        return self._get('version', lambda: self.registry(constants.PASSPORT_SUBKEY, 'Version').strip())
+
+    @property
+    def site_type(self):
+        """Classic, Edge or HTMLPos"""
+        return self._get('site_type', self._read_site_type)
+
+    @property
+    def high_resolution(self):
+        """Whether the MWS is in high-resolution (1024x768) mode"""
+        return self._get('high_resolution', self._read_high_resolution)
+
+    @property
+    def dispenser_count(self):
+        return self._get('dispenser_count', self._read_dispenser_count)
+
+    @property
+    def simulator_ips(self):
+        """Dictionary with the 'ip' of the simulators and the 'network' simulator's"""
+        return self._get('simulator_ips', self.site_info)
+
+    def _get(self, name, read):
+        if name not in self.values:
+            self.values[name] = read()
+            log.debug(f"Site {name}: {self.values[name]}")
+        return self.values[name]
+
+    def _read_site_type(self):
+        if self.registry(constants.NT_SUBKEY, 'Machine') == "PS65":
+            return "Edge"
+        elif 'htmlpos' in self.registry(constants.CSOFT_PP_SUBKEY, 'POSPathName'):
+            return "HTMLPos"
+        return "Classic"
+
+    def _read_high_resolution(self):
+        try:
+            return not bool(int(self.registry(constants.RES_SUBKEY, 'UseLowerResolution')))
+        except FileNotFoundError:
+            return False
+
+    def _read_dispenser_count(self):
+        try:
+            with open(self.standard_config) as f:
+                return len(json.load(f)['Dispensers'])
+        except (OSError, ValueError, KeyError) as e:
+            log.warning(f"Unable to read the configured dispensers from {self.standard_config}: {e}")
+            return 0
+
+_profile = None
 
-    brand = QueryValueEx(reg_key, 'BrandSelected')[0]
-    return brand
+def profile():
+    """
+    Get the site's profile, reading it on first use.
+    Returns:
+        SiteProfile: The profile
+    Examples:
+        >>> profile().site_type
+        'HTMLPos'
+    """
+    global _profile
+    if _profile is None:
+        _profile = SiteProfile()
+    return _profile
+
+def set_profile(site_profile):
+    """
+    Use a given profile, e.g. one with fixed values, instead of reading the site's.
+    Args:
+        site_profile: (SiteProfile) The profile to use. None reads the site's again on next use
+    """
+    global _profile
+    _profile = site_profile
+
+def invalidate_profile():
+    """Forget the values read for the site's profile. Call after anything that can change them, like a restart."""
+    if _profile is not None:
+        _profile.invalidate()
 
 def save_snapshot(snapshot_name = 'Configured_Site'):
     #TODO: need to enhance snapshot for edh & mws
@@ -158,17 +281,17 @@ def save_snapshot_edh(snapshot_name):
     log.debug("Saving a snapshot on the edh")
 
     # Backup a snapshot through System Recovery on the edh. 
-    runas.run_sqlcmd('C:\\Gilbarco\\SR\\bin\\sr /action=backup /type=snapshot')
+    db.get().cmdshell('C:\\Gilbarco\\SR\\bin\\sr /action=backup /type=snapshot')
 
     # Delete the existing snapshot sharing snapshot_name in app\data.
     # Check if the snapshot exists before attempting to remove the directory.
-    check = runas.run_sqlcmd(f'if exist {constants.APPDATA_EDH}\\{snapshot_name} echo found ')
-    if 'found' in check['output']:
-        runas.run_sqlcmd(f'rmdir /S /Q {constants.APPDATA_EDH}\\{snapshot_name}')
+    check = db.get().cmdshell(f'if exist {constants.APPDATA_EDH}\\{snapshot_name} echo found ')
+    if 'found' in check:
+        db.get().cmdshell(f'rmdir /S /Q {constants.APPDATA_EDH}\\{snapshot_name}')
     
     log.debug("Attempting to copy the saved snapshot")
     # Copy the saved snapshot from F:\Gilbarco\snapshot to app\data.
-    runas.run_sqlcmd(f'Xcopy /E /I {constants.SNAPSHOT_PATH_EDH} {constants.APPDATA_EDH}\\{snapshot_name}')
+    db.get().cmdshell(f'Xcopy /E /I {constants.SNAPSHOT_PATH_EDH} {constants.APPDATA_EDH}\\{snapshot_name}')
     
     log.debug("Done saving the snapshot on the edh")
     return True
@@ -227,24 +350,24 @@ def restore_snapshot_edh(snapshot_name):
 
     # Copy the snapshot saved on D:\ to F:\Gilbarco.
     # First, check if this snapshot exists.
-    check = runas.run_sqlcmd(f'if exist {constants.APPDATA_EDH}\\{snapshot_name} echo found ')
-    if 'found' in check['output']:
+    check = db.get().cmdshell(f'if exist {constants.APPDATA_EDH}\\{snapshot_name} echo found ')
+    if 'found' in check:
         
-        runas.run_sqlcmd(f'Xcopy /E /I {constants.APPDATA_EDH}\\{snapshot_name} {constants.SNAPSHOT_PATH_EDH}')
+        db.get().cmdshell(f'Xcopy /E /I {constants.APPDATA_EDH}\\{snapshot_name} {constants.SNAPSHOT_PATH_EDH}')
         
         # Clear the existing snapshot on F:\Gilbarco.
         log.debug("Cleaning out the existing snapshot")
-        runas.run_sqlcmd(f'rmdir /S /Q {constants.SNAPSHOT_PATH_EDH}')
+        db.get().cmdshell(f'rmdir /S /Q {constants.SNAPSHOT_PATH_EDH}')
         
         log.debug('Restoring the snapshot')
 
-        # Run the following command through sqlcmd.exe so as to restore the backup.
-        runas.run_sqlcmd(r'C:\Gilbarco\SR\bin\sr /action=restore /dir=F:\Gilbarco\snapshot /type=snapshot')
+        # Run the following command through xp_cmdshell so as to restore the backup.
+        db.get().cmdshell(r'C:\Gilbarco\SR\bin\sr /action=restore /dir=F:\Gilbarco\snapshot /type=snapshot')
         log.debug("Done restoring the snapshot, restarting the edh")
 
         # Restart the EDH. 
-        runas.run_sqlcmd('net stop edh')
-        runas.run_sqlcmd('net start edh')
+        db.get().cmdshell('net stop edh')
+        db.get().cmdshell('net start edh')
 
         log.debug("Done restarting the edh")
 
@@ -349,11 +472,140 @@ def restartpp(wpf = True):
         time.sleep(1)
         count += 1
 
+    # Brand, version and resolution may have changed, e.g. after restoring a snapshot
+    invalidate_profile()
+
     if count == 180:
         return False
     return True
 
 
+process_refresh_interval = 0.25 # Seconds between process snapshots
+
+class ProcessRegistry:
+    """
+    A live snapshot of the running processes' names, refreshed on a background
+    thread with psutil. Checking for a process is a dictionary lookup, and waits
+    block until a refresh shows the change instead of enumerating processes.
+    Examples:
+        >>> processes().is_running("Eclipse.exe")
+        True
+        >>> processes().wait_for_exit("STOREC~1.exe", 300)
+        True
+    """
+    def __init__(self, interval=process_refresh_interval):
+        self.interval = interval
+        self.names = {}   # pid: name
+        self.running = {} # lowercase name: set of pids
+        self.changed = threading.Condition()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.refresh()
+            self.thread = threading.Thread(target=self._run, name="ProcessRegistry", daemon=True)
+            self.thread.start()
+        return self
+
+    def refresh(self):
+        """Update the snapshot now. Only processes that started since the last one are looked up."""
+        pids = set(psutil.pids())
+        names = {pid: name for pid, name in self.names.items() if pid in pids}
+        for pid in pids - names.keys():
+            try:
+                names[pid] = psutil.Process(pid).name()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+        running = {}
+        for pid, name in names.items():
+            running.setdefault(name.lower(), set()).add(pid)
+        with self.changed:
+            if running.keys() != self.running.keys():
+                self.changed.notify_all()
+            self.names = names
+            self.running = running
+
+    def find(self, proc_name):
+        """
+        Get the running processes matching a name.
+        Args:
+            proc_name: (str) The process name, or part of it, e.g. storec for storeclose.exe or STOREC~1.exe
+        Returns:
+            list: Names of the matching processes
+        """
+        name = proc_name.lower()
+        running = self.running
+        if name in running:
+            return [name]
+        return [running_name for running_name in running if name in running_name]
+
+    def is_running(self, proc_name):
+        """
+        Check if a process is running. A process that isn't in the snapshot is checked
+        for again right away, so one that just started isn't missed.
+        Returns:
+            bool: True if it's running
+        """
+        if self.thread is None:
+            self.start()
+        if self.find(proc_name):
+            return True
+        self.refresh()
+        return bool(self.find(proc_name))
+
+    def wait_for_start(self, proc_name, timeout):
+        """
+        Wait for a process to be running.
+        Args:
+            proc_name: (str) The process name, or part of it
+            timeout: (int) Seconds to wait
+        Returns:
+            bool: True if it's running
+        """
+        if self.is_running(proc_name):
+            return True
+        return self._wait(lambda: self.find(proc_name), timeout)
+
+    def wait_for_exit(self, proc_name, timeout):
+        """
+        Wait for every process matching a name to exit.
+        Args:
+            proc_name: (str) The process name, or part of it
+            timeout: (int) Seconds to wait
+        Returns:
+            bool: True if none are running
+        """
+        if not self.is_running(proc_name):
+            return True
+        return self._wait(lambda: not self.find(proc_name), timeout)
+
+    def _wait(self, done, timeout):
+        with self.changed:
+            return bool(self.changed.wait_for(done, timeout))
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                log.debug(f"Failed to refresh the running processes: {e}")
+
+_processes = None
+_processes_lock = threading.Lock()
+
+def processes():
+    """
+    Get the shared process registry, starting it on first use.
+    Returns:
+        ProcessRegistry: The registry
+    """
+    global _processes
+    with _processes_lock:
+        if _processes is None:
+            _processes = ProcessRegistry()
+        return _processes.start()
+
 def process_wait(proc_name, timeout):
     """
     Waits within a given amount of time for a process to exist.
@@ -372,17 +624,30 @@ def process_wait(proc_name, timeout):
         False
     """
     log = logging.getLogger()
-    starttime = time.time()
-    while time.time() - starttime <= timeout:
-        wmi = win32com.client.GetObject('winmgmts:')
-        for p in wmi.InstancesOf('win32_process'):
-            if proc_name.lower() in p.Name.lower():
-                log.debug("Found %s" % p.Name)
-                return True
+    if processes().wait_for_start(proc_name, timeout):
+        log.debug("Found %s" % proc_name)
+        return True
     log.warning("Could not find %s within %s seconds."
                                 % (proc_name, str(timeout)))
     return False
 
+def process_wait_exit(proc_name, timeout):
+    """
+    Waits within a given amount of time for a process to stop running.
+    Args:
+        proc_name: (str) The name of the process, or part of it, as for process_wait.
+        timeout: (int) The length (in seconds) of time to wait for it to exit.
+    Returns:
+        bool: True if the process isn't running, False if it still is
+    Examples:
+        >>> process_wait_exit("STOREC~1.exe", 300)
+        True
+    """
+    if processes().wait_for_exit(proc_name, timeout):
+        return True
+    log.warning("%s was still running after %s seconds." % (proc_name, str(timeout)))
+    return False
+
 @test_func
 def wait_for(func, desired_result=True, timeout=10, args=[], kwargs={}, interval=None):
     """
@@ -394,7 +659,7 @@ def wait_for(func, desired_result=True, timeout=10, args=[], kwargs={}, interval
         timeout: (int) Seconds to wait for the function to evaluate to the desired result
         args: (list) Positional arguments to provide to the function
         kwargs: (dict) Keyword arguments to provide to the function
-        interval: (int) Seconds to wait between evaluations
+        interval: (int) Seconds to wait between evaluations. Defaults to an exponential backoff
         verify: (bool) Whether or not to fail the current test case if this function return False. Defaults to True
     Returns: 
         bool: Whether or not the function evaluated to the desired
@@ -410,21 +675,20 @@ def wait_for(func, desired_result=True, timeout=10, args=[], kwargs={}, interval
     logger = logging.getLogger()
     if "verify" in func.__code__.co_varnames:
         kwargs.update({"verify": False}) # Prevent test_func decorated function from ending the test case if it fails
-    start_time = time.time()
     log_level = logger.getEffectiveLevel()
     if log_level > logging.DEBUG:
         logger.setLevel(999) # Suppress logging from the repeated calls, unless debug level is set
 
-    while func(*args, **kwargs) != desired_result:
-        if time.time() - start_time > timeout:
-            logger.setLevel(log_level) # Reset log level
-            logger.warning(f"{func.__name__} did not return {desired_result} within {timeout} seconds.")
-            return False
-        if interval is not None:
-            time.sleep(interval)
-
-    logger.setLevel(log_level)
-    return True
+    try:
+        # A fixed interval disables the backoff
+        matched = waits.poll(lambda: func(*args, **kwargs) == desired_result, timeout,
+                             interval=interval, max_wait=interval, name=func.__name__)
+    finally:
+        logger.setLevel(log_level) # Reset log level
+
+    if not matched:
+        logger.warning(f"{func.__name__} did not return {desired_result} within {timeout} seconds.")
+    return matched
 
 @test_func
 def restart_eps():
@@ -0,0 +1,376 @@
+"""
+Name: telemetry
+Description: Latency and resource telemetry for long runs such as the endurance script.
+             Latencies are recorded into HDR-style histograms (log-linear buckets with a
+             fixed relative error), so memory per transaction type stays bounded however
+             long the run is. CPU, memory and handles of the Passport processes are
+             sampled with psutil on a background thread.
+
+             Everything is written as JSON Lines under <directory>/<YYYYMMDD>/: one line
+             per flush interval and transaction type in latency.jsonl, and one line per
+             sample in resources.jsonl. rollup() merges a day's files into summary.json
+             with percentiles and memory growth per hour, which is what shows slow
+             degradation and leaks.
+
+Date created: 10/18/2026
+Modified By:
+Date Modified:
+"""
+
+import collections
+import contextlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+import psutil
+
+from app.util import system
+
+log = logging.getLogger()
+
+# Settings
+flush_interval  = 60 # Seconds of latencies written as one line per transaction type
+sample_interval = 15 # Seconds between resource samples
+sampled_processes = {          # Label: process name, or part of it, as system.processes() finds them
+    "RunIt": "runit",
+    "Eclipse": "eclipse",
+    "EDH": "edh",
+    "Chrome": "chrome.exe",
+    "ChromeDriver": "chromedriver",
+}
+
+class Histogram:
+    """
+    Latency histogram with HDR-style buckets: exact to the unit up to 2**bits units,
+    then within 2**-(bits-1) of the value (2**-7, about 0.8%, with the default 8 bits).
+    A percentile is never reported above the largest value recorded. Histograms with the same settings can be merged.
+    Examples:
+        >>> h = Histogram()
+        >>> for seconds in (0.120, 0.135, 2.400):
+        ...     h.record(seconds)
+        >>> h.percentile(50)
+        0.135
+        >>> h.percentile(99)
+        2.4
+    """
+    def __init__(self, unit=0.001, bits=8):
+        """
+        Args:
+            unit: (float) Seconds per count. Defaults to milliseconds
+            bits: (int) Sub-bucket bits. 8 keeps 2 significant digits
+        """
+        self.unit = unit
+        self.bits = bits
+        self.counts = collections.Counter() # Lowest value of each bucket, in units: count
+        self.total = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+
+    def record(self, seconds, count=1):
+        """Record a latency, in seconds."""
+        units = max(int(round(seconds / self.unit)), 0)
+        self.counts[self._bucket(units)] += count
+        self.total += count
+        self.sum += units * count
+        self.min = units if self.min is None else min(self.min, units)
+        self.max = units if self.max is None else max(self.max, units)
+
+    def percentile(self, percent):
+        """
+        Get the latency at a percentile.
+        Args:
+            percent: (float) The percentile, 0 to 100
+        Returns:
+            float: Seconds, or None if nothing was recorded
+        """
+        if not self.total:
+            return None
+        target = max(math.ceil(self.total * percent / 100), 1)
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= target:
+                return round(min(self._highest(bucket), self.max) * self.unit, 6)
+        return round(self.max * self.unit, 6)
+
+    def mean(self):
+        """The mean latency in seconds, or None if nothing was recorded."""
+        return round(self.sum / self.total * self.unit, 6) if self.total else None
+
+    def merge(self, other):
+        """Add another histogram's counts to this one. Returns this histogram."""
+        if (other.unit, other.bits) != (self.unit, self.bits):
+            raise ValueError("Only histograms with the same unit and bits can be merged")
+        self.counts.update(other.counts)
+        self.total += other.total
+        self.sum += other.sum
+        for bound, pick in (('min', min), ('max', max)):
+            theirs = getattr(other, bound)
+            if theirs is not None:
+                ours = getattr(self, bound)
+                setattr(self, bound, theirs if ours is None else pick(ours, theirs))
+        return self
+
+    def summary(self):
+        """
+        Get the count and the usual percentiles.
+        Returns:
+            dict: count, min, mean, p50, p90, p99, p999 and max, in seconds
+        """
+        return {'count': self.total,
+                'min': None if self.min is None else round(self.min * self.unit, 6),
+                'mean': self.mean(),
+                'p50': self.percentile(50),
+                'p90': self.percentile(90),
+                'p99': self.percentile(99),
+                'p999': self.percentile(99.9),
+                'max': None if self.max is None else round(self.max * self.unit, 6)}
+
+    def to_dict(self):
+        return {'unit': self.unit, 'bits': self.bits, 'total': self.total, 'sum': self.sum,
+                'min': self.min, 'max': self.max, 'counts': {str(k): v for k, v in sorted(self.counts.items())}}
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(data['unit'], data['bits'])
+        histogram.counts.update({int(k): v for k, v in data['counts'].items()})
+        histogram.total = data['total']
+        histogram.sum = data['sum']
+        histogram.min = data['min']
+        histogram.max = data['max']
+        return histogram
+
+    def _bucket(self, units):
+        shift = max(units.bit_length() - self.bits, 0)
+        return (units >> shift) << shift
+
+    def _highest(self, bucket):
+        shift = max(bucket.bit_length() - self.bits, 0)
+        return bucket + (1 << shift) - 1
+
+class Telemetry:
+    """
+    Records latencies by transaction type and samples the Passport processes,
+    writing both to daily JSON Lines files.
+    Examples:
+        >>> telemetry = Telemetry(r"D:\\Automation\\logs\\telemetry").start()
+        >>> with telemetry.timed("speed key sale"):
+        ...     pos.add_item("Generic Item", verify=False)
+        ...     pos.pay(verify=False)
+        >>> telemetry.record("crind debit prompt", 1.84)
+        >>> telemetry.rollup()
+        {'day': '20261018', 'latency': {'speed key sale': {'count': 212, 'p50': 6.1, ...}, ...},
+         'resources': {'Chrome': {'memory_mb': {'first': 410.2, 'last': 1280.5, 'per_hour': 36.2, ...}, ...}}}
+        >>> telemetry.stop()
+    """
+    def __init__(self, directory, processes=None, flush_every=None, sample_every=None):
+        """
+        Args:
+            directory: (str) Where the daily folders go
+            processes: (dict) Label: process name to sample. Defaults to sampled_processes
+            flush_every: (float) Seconds between latency lines. Defaults to flush_interval
+            sample_every: (float) Seconds between resource samples. Defaults to sample_interval
+        """
+        self.directory = directory
+        self.processes = dict(sampled_processes if processes is None else processes)
+        self.flush_every = flush_interval if flush_every is None else flush_every
+        self.sample_every = sample_interval if sample_every is None else sample_every
+        self.interval = {}   # Transaction type: Histogram since the last flush
+        self.failures = collections.Counter() # Transaction type: failures since the last flush
+        self.totals = {}     # Transaction type: Histogram since start
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+        self._handles = {}   # pid: psutil.Process, kept so cpu_percent measures since the last sample
+
+    def start(self):
+        """Start sampling and flushing in the background. Returns this Telemetry."""
+        if self.thread is None or not self.thread.is_alive():
+            self.stopped.clear()
+            self.thread = threading.Thread(target=self._run, name="Telemetry", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop the background thread and write what's left."""
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join(self.sample_every + 5)
+            self.thread = None
+        self.flush()
+
+    def record(self, name, seconds, success=True):
+        """
+        Record one transaction's latency.
+        Args:
+            name: (str) The transaction type, e.g. "dept sale" or "crind receipt prompt"
+            seconds: (float) How long it took
+            success: (bool) Whether it worked. Failures are counted but kept out of the latencies
+        """
+        with self.lock:
+            if not success:
+                self.failures[name] += 1
+                return
+            self.interval.setdefault(name, Histogram()).record(seconds)
+            self.totals.setdefault(name, Histogram()).record(seconds)
+
+    @contextlib.contextmanager
+    def timed(self, name):
+        """
+        Time a block as one transaction. It's recorded as a failure if the block raises.
+        Examples:
+            >>> with telemetry.timed("dept sale"):
+            ...     assert pos.add_item("Dept 3", "Dept Key", price="$5.00", verify=False)
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.record(name, time.perf_counter() - start, success=False)
+            raise
+        self.record(name, time.perf_counter() - start)
+
+    def summary(self):
+        """
+        Get the latencies since start.
+        Returns:
+            dict: Transaction type: Histogram.summary()
+        """
+        with self.lock:
+            return {name: histogram.summary() for name, histogram in self.totals.items()}
+
+    def flush(self):
+        """Write the latencies since the last flush, one line per transaction type."""
+        with self.lock:
+            interval, self.interval = self.interval, {}
+            failures, self.failures = self.failures, collections.Counter()
+        if not interval and not failures:
+            return
+        now = round(time.time(), 1)
+        lines = [{'t': now, 'name': name, 'failures': failures.get(name, 0),
+                  'histogram': interval[name].to_dict() if name in interval else None}
+                 for name in sorted(set(interval) | set(failures))]
+        self._append("latency.jsonl", lines)
+
+    def sample(self):
+        """
+        Sample the CPU, memory and handles of each process group and write them as one line.
+        Returns:
+            dict: Label: [cpu percent, resident MB, handles, processes], summed over the matching processes
+        """
+        registry = system.processes()
+        line = {'t': round(time.time(), 1)}
+        live = set()
+        for label, name in self.processes.items():
+            cpu = memory = handles = count = 0
+            for running_name in registry.find(name):
+                for pid in list(registry.running.get(running_name, ())):
+                    process = self._handles.get(pid)
+                    try:
+                        if process is None:
+                            process = self._handles[pid] = psutil.Process(pid)
+                        with process.oneshot():
+                            cpu += process.cpu_percent(None)
+                            memory += process.memory_info().rss
+                            handles += process.num_handles() if hasattr(process, 'num_handles') else process.num_fds()
+                        count += 1
+                        live.add(pid)
+                    except psutil.Error:
+                        continue
+            line[label] = [round(cpu, 1), round(memory / (1024 * 1024), 1), handles, count]
+        for pid in set(self._handles) - live:
+            del self._handles[pid]
+        self._append("resources.jsonl", [line])
+        return line
+
+    def rollup(self, day=None):
+        """
+        Merge a day's files into summary.json.
+        Args:
+            day: (str) The day, as YYYYMMDD. Defaults to today
+        Returns:
+            dict: 'day', 'latency' with Histogram.summary() and 'failures' per transaction type, and
+                  'resources' with min, mean, max, first, last and growth per hour of each measure per process group
+        """
+        day = day or time.strftime("%Y%m%d")
+        folder = os.path.join(self.directory, day)
+        histograms = {}
+        failures = collections.Counter()
+        for line in _read_lines(os.path.join(folder, "latency.jsonl")):
+            failures[line['name']] += line.get('failures', 0)
+            if line.get('histogram'):
+                histogram = Histogram.from_dict(line['histogram'])
+                if line['name'] in histograms:
+                    histograms[line['name']].merge(histogram)
+                else:
+                    histograms[line['name']] = histogram
+        latency = {}
+        for name in sorted(set(histograms) | set(failures)):
+            latency[name] = histograms[name].summary() if name in histograms else Histogram().summary()
+            latency[name]['failures'] = failures.get(name, 0)
+
+        series = collections.defaultdict(lambda: collections.defaultdict(list))
+        for line in _read_lines(os.path.join(folder, "resources.jsonl")):
+            for label, values in line.items():
+                if label != 't':
+                    for measure, value in zip(("cpu_percent", "memory_mb", "handles", "processes"), values):
+                        series[label][measure].append((line['t'], value))
+        resources = {label: {measure: _trend(points) for measure, points in measures.items()}
+                     for label, measures in series.items()}
+
+        summary = {'day': day, 'latency': latency, 'resources': resources}
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, "summary.json"), 'w') as f:
+            json.dump(summary, f, indent=4)
+        return summary
+
+    def _append(self, filename, lines):
+        folder = os.path.join(self.directory, time.strftime("%Y%m%d"))
+        try:
+            os.makedirs(folder, exist_ok=True)
+            with open(os.path.join(folder, filename), 'a') as f:
+                for line in lines:
+                    f.write(json.dumps(line, separators=(',', ':')) + '\n')
+        except OSError as e:
+            log.warning(f"Unable to write telemetry to {folder}: {e}")
+
+    def _run(self):
+        next_flush = time.monotonic() + self.flush_every
+        while not self.stopped.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                log.debug(f"Failed to sample resources: {e}")
+            if time.monotonic() >= next_flush:
+                self.flush()
+                next_flush = time.monotonic() + self.flush_every
+            self.stopped.wait(self.sample_every)
+
+def _read_lines(path):
+    if not os.path.isfile(path):
+        return
+    with open(path) as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                log.debug(f"Skipping unreadable telemetry line in {path}")
+
+def _trend(points):
+    """Summarize a measure's (time, value) samples, with its least squares growth per hour."""
+    values = [value for _, value in points]
+    times = [t for t, _ in points]
+    per_hour = 0.0
+    if len(points) > 1:
+        mean_t = sum(times) / len(times)
+        mean_v = sum(values) / len(values)
+        spread = sum((t - mean_t) ** 2 for t in times)
+        if spread:
+            per_hour = sum((t - mean_t) * (v - mean_v) for t, v in points) / spread * 3600
+    return {'min': min(values), 'mean': round(sum(values) / len(values), 1), 'max': max(values),
+            'first': values[0], 'last': values[-1], 'per_hour': round(per_hour, 2)}
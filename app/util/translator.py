@@ -0,0 +1,213 @@
+"""
+Name: translator
+Description: Client for the network message parser API. Messages are sent over one
+             keep-alive session, several at a time through the batch endpoint, and
+             translations are cached by message bytes in memory and on disk, so the
+             same message is only ever parsed once. The file on disk is rewritten with just
+             the cached translations when it's loaded, and whenever it grows past twice that.
+
+             Batch endpoint contract: POST a JSON list of message strings to
+             <PARSER_API>batch and get back a JSON list of the same length, with
+             each entry the translated message, or null if it couldn't be parsed.
+             Parsers without the batch endpoint are sent one message per request.
+
+Date created: 10/18/2026
+Modified By:
+Date Modified:
+"""
+
+import collections
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import requests
+
+from app.util import constants
+
+log = logging.getLogger()
+
+# Settings
+cache_size  = 2048 # Translations kept in memory
+batch_size  = 50   # Messages per batch request
+batch_route = "batch"
+
+class Translator:
+    """
+    Translates network messages through the parser API.
+    Examples:
+        >>> translator = Translator()
+        >>> translator.translate(message)
+        {'Message Type': {'value': '0100'}, ...}
+        >>> translator.translate_many([preauth_request, preauth_response])
+        [{'Message Type': {'value': '0100'}, ...}, {'Message Type': {'value': '0110'}, ...}]
+    """
+    def __init__(self, url=constants.PARSER_API, cache_file=None):
+        """
+        Args:
+            url: (str) The parser API
+            cache_file: (str) JSON Lines file to keep translations in between runs. None keeps them in memory only
+        """
+        self.url = url
+        self.session = requests.Session()
+        self.batch_supported = True
+        self.cache = collections.OrderedDict()
+        self.cache_file = cache_file
+        self.file_entries = 0 # Lines in cache_file, including ones for translations that were dropped
+        self.lock = threading.Lock()
+        if cache_file and os.path.isfile(cache_file):
+            self._load(cache_file)
+        elif cache_file:
+            os.makedirs(os.path.dirname(cache_file) or '.', exist_ok=True)
+
+    def translate(self, message, timeout=30):
+        """
+        Translate one message.
+        Args:
+            message: (str) The raw network message
+            timeout: (int) Seconds to wait for the parser
+        Returns:
+            dict: The translated message, or False if it couldn't be translated
+        """
+        return self.translate_many([message], timeout)[0]
+
+    def translate_many(self, messages, timeout=30):
+        """
+        Translate several messages, sending the ones not already cached in as few requests as possible.
+        Args:
+            messages: (list) Raw network messages
+            timeout: (int) Seconds to wait for each request to the parser
+        Returns:
+            list: The translated messages, in the same order. False for any that couldn't be translated
+        """
+        keys = [self._key(message) for message in messages]
+        missing = {}
+        with self.lock:
+            for key, message in zip(keys, messages):
+                if key in self.cache:
+                    self.cache.move_to_end(key)
+                elif key not in missing:
+                    missing[key] = message
+
+        if missing:
+            log.debug(f"Translating {len(missing)} of {len(messages)} messages through {self.url}")
+            pending = list(missing.items())
+            for start in range(0, len(pending), batch_size):
+                chunk = pending[start:start + batch_size]
+                translated = self._send([message for _, message in chunk], timeout)
+                for (key, _), result in zip(chunk, translated):
+                    if result:
+                        self._store(key, result)
+
+        with self.lock:
+            return [self.cache.get(key, False) for key in keys]
+
+    def clear(self):
+        """Forget the cached translations, including the ones on disk."""
+        with self.lock:
+            self.cache.clear()
+            if self.cache_file and os.path.isfile(self.cache_file):
+                os.remove(self.cache_file)
+            self.file_entries = 0
+
+    def _send(self, messages, timeout):
+        if self.batch_supported and len(messages) > 1:
+            try:
+                response = self.session.post(self.url + batch_route, json=messages, timeout=timeout)
+                if response.status_code in (404, 405):
+                    log.debug(f"{self.url} has no batch endpoint. Sending messages one at a time.")
+                    self.batch_supported = False
+                elif response.status_code == 200:
+                    results = response.json()
+                    if len(results) == len(messages):
+                        return results
+                    log.error(f"{self.url}{batch_route} returned {len(results)} translations for {len(messages)} messages")
+                else:
+                    log.error(f"Error was returned from {self.url}{batch_route} status code {response.status_code}")
+            except (requests.exceptions.RequestException, ValueError) as e:
+                log.error(f"Failed attempting to post to: {self.url}{batch_route}, please check it the parser is working")
+                log.error(e)
+                return [False] * len(messages)
+        return [self._send_one(message, timeout) for message in messages]
+
+    def _send_one(self, message, timeout):
+        log.debug(f"{message} was sent to {self.url}")
+        try:
+            response = self.session.post(self.url, data=message, timeout=timeout)
+            log.debug(f"{response.text} was returned from {self.url}")
+        except requests.exceptions.RequestException as e:
+            log.error(f"Failed attempting to post to: {self.url}, please check it the parser is working")
+            log.error(e)
+            return False
+
+        if response.status_code != 200:
+            log.error(f"Error was returned from {self.url} status code {response.status_code}")
+            return False
+        try:
+            return json.loads(response.text)
+        except ValueError:
+            log.error(f"{self.url} did not return JSON for {message}")
+            return False
+
+    def _key(self, message):
+        return hashlib.sha1(message.encode() if isinstance(message, str) else bytes(message)).hexdigest()
+
+    def _store(self, key, translation):
+        with self.lock:
+            self.cache[key] = translation
+            self.cache.move_to_end(key)
+            while len(self.cache) > cache_size:
+                self.cache.popitem(last=False)
+            if self.cache_file:
+                with open(self.cache_file, 'a') as f:
+                    f.write(json.dumps({'key': key, 'translation': translation}) + '\n')
+                self.file_entries += 1
+                if self.file_entries > 2 * cache_size:
+                    self._compact()
+
+    def _load(self, path):
+        try:
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        self.file_entries += 1
+                        record = json.loads(line)
+                        self.cache[record['key']] = record['translation']
+                        self.cache.move_to_end(record['key'])
+        except (ValueError, KeyError) as e:
+            log.warning(f"Ignoring the rest of unreadable translation cache {path}: {e}")
+        while len(self.cache) > cache_size:
+            self.cache.popitem(last=False)
+        if self.file_entries > len(self.cache):
+            self._compact()
+
+    def _compact(self):
+        """Rewrite cache_file with only the cached translations, oldest first. Call with the lock held, or before it's shared."""
+        temp_file = self.cache_file + '.tmp'
+        try:
+            with open(temp_file, 'w') as f:
+                for key, translation in self.cache.items():
+                    f.write(json.dumps({'key': key, 'translation': translation}) + '\n')
+            os.replace(temp_file, self.cache_file)
+        except OSError as e:
+            log.warning(f"Unable to compact translation cache {self.cache_file}: {e}")
+            return
+        log.debug(f"Compacted translation cache {self.cache_file} from {self.file_entries} to {len(self.cache)} entries")
+        self.file_entries = len(self.cache)
+
+_translator = None
+_translator_lock = threading.Lock()
+
+def get():
+    """
+    Get the shared translator for constants.PARSER_API, creating it on first use.
+    Returns:
+        Translator: The translator. Its translations are kept in constants.TRANSLATION_CACHE
+    """
+    global _translator
+    with _translator_lock:
+        if _translator is None:
+            _translator = Translator(constants.PARSER_API, constants.TRANSLATION_CACHE)
+        return _translator
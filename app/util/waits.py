@@ -0,0 +1,316 @@
+"""
+Name: waits
+Description: Shared polling helpers for the UI drivers. A wait backs off
+             between attempts instead of spinning, can be woken early by a
+             trigger (threading.Event, WinEvent hook, DOM MutationObserver),
+             and records how long it took.
+
+Date created: 10/18/2026
+Modified By:
+Date Modified:
+"""
+
+import ctypes
+import logging
+import random
+import threading
+import time
+
+log = logging.getLogger()
+
+# Backoff settings. Intervals are in seconds.
+initial_interval = 0.05
+max_interval     = 1.0
+backoff_factor   = 2
+jitter           = 0.1
+
+# Wait durations, keyed by wait name
+stats = {}
+_stats_lock = threading.Lock()
+
+class Deadline:
+    """
+    A point in time that nested waits can share, so a caller's timeout
+    covers every wait it makes instead of each one starting over.
+    """
+    def __init__(self, timeout):
+        self.timeout = max(timeout or 0, 0)
+        self.end = time.monotonic() + self.timeout
+
+    def remaining(self):
+        """Seconds left before the deadline, never negative."""
+        return max(self.end - time.monotonic(), 0)
+
+    def expired(self):
+        return time.monotonic() >= self.end
+
+    def __repr__(self):
+        return f"Deadline(remaining={self.remaining():.3f})"
+
+def deadline(timeout):
+    """
+    Get a Deadline for a timeout.
+    Args:
+        timeout: (int/float/Deadline) Seconds from now, or an existing Deadline to share.
+    Returns:
+        Deadline: The deadline. An existing Deadline is returned as-is.
+    Examples:
+        >>> d = deadline(10)
+        >>> deadline(d) is d
+        True
+    """
+    if isinstance(timeout, Deadline):
+        return timeout
+    return Deadline(timeout)
+
+def poll(func, timeout=10, args=(), kwargs=None, until=bool, interval=None, max_wait=None,
+         trigger=None, exceptions=(), name=None):
+    """
+    Call a function until its result satisfies a check, backing off between attempts.
+    The function is always called at least once, even with a timeout of 0.
+    Args:
+        func: (function) The function to evaluate. This must be a function object, NOT a function call
+        timeout: (int/float/Deadline) Seconds to keep trying, or a Deadline shared with the caller
+        args: (list) Positional arguments to provide to the function
+        kwargs: (dict) Keyword arguments to provide to the function
+        until: (function) Check applied to each result. Defaults to truthiness. Use
+               lambda r: r is not None for functions that return objects without a truth value
+        interval: (float) Seconds to wait after the first failed attempt. Defaults to initial_interval
+        max_wait: (float) Longest wait between attempts. Defaults to max_interval
+        trigger: (function) Called with a number of seconds instead of sleeping. It should return
+                 early when something worth re-checking happens, e.g. threading.Event().wait
+        exceptions: (tuple) Exception types to treat as a failed attempt instead of raising
+        name: (str) Name to log and record stats under. Defaults to the function's name
+    Returns:
+        The first result that passed the check, or the last result if the deadline passed.
+    Examples:
+        >>> poll(lambda: pos.read_status_line() == "Press the speed keys to enter items.")
+        True
+        >>> poll(find_window, 5, exceptions=(ElementNotFoundError,))
+        <pywinauto.application.WindowSpecification object at 0x02BE9710>
+        >>> poll(event.is_set, 2, trigger=event.wait)
+        False
+    """
+    kwargs = kwargs or {}
+    name = name or getattr(func, '__qualname__', repr(func))
+    end = deadline(timeout)
+    delay = initial_interval if interval is None else interval
+    ceiling = max_interval if max_wait is None else max_wait
+    start_time = time.monotonic()
+
+    while True:
+        try:
+            result = func(*args, **kwargs)
+        except exceptions as e:
+            log.debug(f"{name} raised {type(e).__name__} while waiting: {e}")
+            result = None
+        done = until(result)
+        if done:
+            break
+        remaining = end.remaining()
+        if remaining <= 0:
+            break
+        pause = min(delay * random.uniform(1 - jitter, 1 + jitter), remaining)
+        if trigger is None:
+            time.sleep(pause)
+        else:
+            try:
+                trigger(pause)
+            except Exception as e:
+                log.debug(f"Wait trigger for {name} failed, falling back to sleeping: {e}")
+                trigger = None
+                time.sleep(pause)
+        delay = min(delay * backoff_factor, ceiling)
+
+    record(name, time.monotonic() - start_time, done)
+    return result
+
+def record(name, elapsed, success=True):
+    """
+    Record how long a wait took.
+    Args:
+        name: (str) The name of the wait
+        elapsed: (float) Seconds the wait took
+        success: (bool) Whether the wait finished before its deadline
+    Returns:
+        None
+    """
+    log.debug(f"Wait for {name} {'finished' if success else 'timed out'} after {elapsed:.3f} seconds.")
+    with _stats_lock:
+        entry = stats.setdefault(name, {'count': 0, 'timeouts': 0, 'total': 0.0, 'max': 0.0})
+        entry['count'] += 1
+        entry['total'] += elapsed
+        entry['max'] = max(entry['max'], elapsed)
+        if not success:
+            entry['timeouts'] += 1
+
+def wait_stats():
+    """
+    Get how long waits have taken so far.
+    Returns:
+        dict: Wait name mapped to its count, timeouts, total seconds and longest wait.
+    Examples:
+        >>> wait_stats()
+        {'wait_for_fuel.<locals>.is_idle': {'count': 2, 'timeouts': 0, 'total': 14.2, 'max': 9.8}}
+    """
+    with _stats_lock:
+        return {name: dict(entry) for name, entry in stats.items()}
+
+def reset_stats():
+    """Clear the recorded wait durations."""
+    with _stats_lock:
+        stats.clear()
+
+"""
+Triggers
+"""
+def dom_mutation_trigger(driver, locator="document.body"):
+    """
+    Get a trigger that returns as soon as the DOM under an element changes.
+    Args:
+        driver: (WebDriver) The selenium driver for the page.
+        locator: (str) JavaScript expression for the element to observe.
+    Returns:
+        function: A trigger for poll. It blocks for up to the given number of
+                  seconds and returns True if the DOM changed.
+    Examples:
+        >>> poll(read_status, 10, trigger=dom_mutation_trigger(driver))
+        'Press the speed keys to enter items.'
+    """
+    script = """
+        var done = arguments[arguments.length - 1];
+        var target = %s;
+        if (!target) { setTimeout(function() { done(false); }, arguments[0]); return; }
+        var timer;
+        var observer = new MutationObserver(function() {
+            observer.disconnect(); clearTimeout(timer); done(true);
+        });
+        observer.observe(target, {subtree: true, childList: true, characterData: true, attributes: true});
+        timer = setTimeout(function() { observer.disconnect(); done(false); }, arguments[0]);
+    """ % locator
+    def trigger(seconds):
+        return bool(driver.execute_async_script(script, int(seconds * 1000)))
+    return trigger
+
+# WinEvent constants. See https://docs.microsoft.com/en-us/windows/win32/winauto/event-constants
+EVENT_SYSTEM_FOREGROUND     = 0x0003
+EVENT_OBJECT_CREATE         = 0x8000
+EVENT_OBJECT_SHOW           = 0x8002
+EVENT_OBJECT_STATECHANGE    = 0x800A
+EVENT_OBJECT_LOCATIONCHANGE = 0x800B # Fires on every mouse move and caret blink. Never hook it
+EVENT_OBJECT_NAMECHANGE     = 0x800C
+EVENT_OBJECT_VALUECHANGE    = 0x800E
+WINEVENT_OUTOFCONTEXT       = 0x0000
+WINEVENT_SKIPOWNPROCESS     = 0x0002
+WM_QUIT                     = 0x0012
+
+# The (min, max) event ranges hooked, one hook each, so nothing in between is delivered
+UI_EVENTS = [(EVENT_SYSTEM_FOREGROUND, EVENT_SYSTEM_FOREGROUND),
+             (EVENT_OBJECT_CREATE, EVENT_OBJECT_CREATE),
+             (EVENT_OBJECT_SHOW, EVENT_OBJECT_SHOW),
+             (EVENT_OBJECT_STATECHANGE, EVENT_OBJECT_STATECHANGE),
+             (EVENT_OBJECT_NAMECHANGE, EVENT_OBJECT_NAMECHANGE),
+             (EVENT_OBJECT_VALUECHANGE, EVENT_OBJECT_VALUECHANGE)]
+max_win_event_hooks = 4 # Processes hooked at once. The oldest hook is removed to make room
+
+class WinEventTrigger:
+    """
+    Trigger that wakes a wait when one process creates, shows, renames or changes
+    a window or UIA object, or brings a window to the foreground.
+    The hooks run on their own thread with a message pump, as WinEvent hooks require.
+    Examples:
+        >>> with WinEventTrigger(pid) as trigger:
+        ...     poll(find_window, 10, trigger=trigger)
+    """
+    def __init__(self, pid, events=UI_EVENTS):
+        """
+        Args:
+            pid: (int) The process to watch. Events from other processes are never delivered
+            events: (list) The (min, max) event ranges to hook
+        """
+        if not pid:
+            raise ValueError("WinEventTrigger needs a process id. A system-wide hook would wake on every event.")
+        self.pid = pid
+        self.events = list(events)
+        self._event = threading.Event()
+        self._ready = threading.Event()
+        self._thread = None
+        self._thread_id = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._ready.clear()
+            self._thread = threading.Thread(target=self._pump, name=f"WinEventTrigger-{self.pid}", daemon=True)
+            self._thread.start()
+            self._ready.wait(5)
+        return self
+
+    def stop(self):
+        if self._thread_id is not None:
+            ctypes.windll.user32.PostThreadMessageW(self._thread_id, WM_QUIT, 0, 0)
+        self._thread = None
+        self._thread_id = None
+
+    def __call__(self, seconds):
+        fired = self._event.wait(seconds)
+        self._event.clear()
+        return fired
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _pump(self):
+        from ctypes import wintypes
+        user32 = ctypes.windll.user32
+        proc_type = ctypes.WINFUNCTYPE(None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+                                       wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD)
+        callback = proc_type(lambda *event: self._event.set())
+        self._thread_id = ctypes.windll.kernel32.GetCurrentThreadId()
+        hooks = [user32.SetWinEventHook(event_min, event_max, 0, callback, self.pid, 0,
+                                        WINEVENT_OUTOFCONTEXT | WINEVENT_SKIPOWNPROCESS)
+                 for event_min, event_max in self.events]
+        hooks = [hook for hook in hooks if hook]
+        self._ready.set()
+        if not hooks:
+            log.warning(f"Unable to install WinEvent hooks for process {self.pid}. Waits will fall back to polling.")
+            return
+        msg = wintypes.MSG()
+        try:
+            while user32.GetMessageW(ctypes.byref(msg), 0, 0, 0) > 0:
+                user32.TranslateMessage(ctypes.byref(msg))
+                user32.DispatchMessageW(ctypes.byref(msg))
+        finally:
+            for hook in hooks:
+                user32.UnhookWinEvent(hook)
+
+_win_events = {} # pid: WinEventTrigger
+_win_events_lock = threading.Lock()
+
+def win_event_trigger(pid):
+    """
+    Get the shared WinEvent trigger for a process, starting its hooks on first use.
+    Args:
+        pid: (int) The process to watch, e.g. Eclipse.exe
+    Returns:
+        WinEventTrigger: The running trigger, or None if there's no process or hooks aren't available on this machine.
+    Examples:
+        >>> poll(find_window, 10, trigger=win_event_trigger(pid))
+    """
+    if not pid:
+        return None
+    with _win_events_lock:
+        trigger = _win_events.get(pid)
+        if trigger is None:
+            try:
+                ctypes.windll.user32 # Only on Windows
+                trigger = WinEventTrigger(pid).start()
+            except (AttributeError, OSError) as e:
+                log.debug(f"WinEvent hooks unavailable: {e}")
+                return None
+            while len(_win_events) >= max_win_event_hooks:
+                _win_events.pop(next(iter(_win_events))).stop()
+            _win_events[pid] = trigger
+        return trigger
@@ -0,0 +1,271 @@
+"""
+Name: webdriver_pool
+Description: Keeps Chrome WebDriver sessions warm for the browser based modules
+             (pos_html, edge, console, checkout). Closing one of them hides its
+             window instead of quitting Chrome, so the next connect reuses the
+             session and its loaded page instead of starting ChromeDriver again.
+
+             Sessions are keyed by role and URL. They're checked with one cheap
+             WebDriver call before reuse, and recycled once Chrome's memory passes
+             recycle_memory_mb. Startup costs and session lifetimes are kept for
+             metrics().
+
+Date created: 10/18/2026
+Modified By:
+Date Modified:
+"""
+
+import atexit
+import logging
+import threading
+import time
+
+import psutil
+from selenium import webdriver
+
+from app.util import constants
+
+log = logging.getLogger()
+
+# Settings
+recycle_memory_mb = 2048 # Chrome memory, across all of a session's processes, that gets it recycled
+
+class Session:
+    """A Chrome session and what it has cost."""
+    def __init__(self, role, url, driver, startup):
+        self.role = role
+        self.url = url
+        self.driver = driver
+        self.startup = startup # Seconds to start Chrome and ChromeDriver
+        self.created = time.time()
+        self.uses = 0
+        self.hidden = False
+
+    @property
+    def fresh(self):
+        """Whether the session was just started, so its page still needs loading."""
+        return self.uses == 1
+
+    def __repr__(self):
+        return f"Session({self.role}, {self.url}, uses={self.uses})"
+
+class WebDriverPool:
+    """
+    Warm Chrome sessions, one per role and URL. Safe to share between threads.
+    Examples:
+        >>> session = webdriver_pool.get().acquire("pos", "https://127.0.0.1:7500/", options)
+        >>> if session.fresh:
+        ...     session.driver.get(session.url)
+        >>> webdriver_pool.get().release(session.driver) # Minimized, ready for the next acquire
+    """
+    def __init__(self, start=None):
+        """
+        Args:
+            start: (function) Takes ChromeOptions and returns a new driver. Defaults to starting Chrome with constants.CHROME_DRIVER
+        """
+        self.start = start or (lambda options: webdriver.Chrome(constants.CHROME_DRIVER, chrome_options=options))
+        self.sessions = {}
+        self.starting = {} # Role and URL mapped to an Event set once the thread starting its Chrome is done
+        self.lock = threading.Lock()
+        self.stats = {}
+
+    def acquire(self, role, url, options=None):
+        """
+        Get the session for a role and URL, starting Chrome only if there's no healthy session to reuse.
+        If another thread is already starting Chrome for it, waits for that session instead.
+        Args:
+            role: (str) What the session is for, e.g. "pos" or "console"
+            url: (str) The page the session is for
+            options: (ChromeOptions) Options for Chrome, if it has to be started
+        Returns:
+            Session: The session. Check fresh to know whether its page needs loading
+        Raises:
+            Whatever starting Chrome raised, if it had to be started and couldn't
+        """
+        key = (role, url)
+        while True:
+            with self.lock:
+                session = self.sessions.get(key)
+                starting = self.starting.get(key)
+                if session is None and starting is None:
+                    # Reserve the slot, so other threads wait for this Chrome instead of starting their own
+                    starting = self.starting[key] = threading.Event()
+                    break
+            if session is None:
+                starting.wait()
+                continue
+
+            reason = None
+            if not self.healthy(session):
+                reason = "unresponsive"
+            elif self.memory_mb(session) > recycle_memory_mb:
+                reason = "memory"
+            if reason is None:
+                with self.lock:
+                    session.uses += 1
+                    self._stat(role)['reuses'] += 1
+                if session.hidden:
+                    self._show(session)
+                log.debug(f"Reusing {session} started {time.time() - session.created:.0f}s ago")
+                return session
+            log.info(f"Recycling {session}: {reason}")
+            with self.lock:
+                self._stat(role)['recycled_' + reason] += 1
+            self.discard(session.driver)
+
+        try:
+            start_time = time.perf_counter()
+            driver = self.start(options)
+            session = Session(role, url, driver, time.perf_counter() - start_time)
+            session.uses = 1
+            with self.lock:
+                stat = self._stat(role)
+                stat['starts'] += 1
+                stat['startup_seconds'] += session.startup
+                self.sessions[key] = session
+            log.debug(f"Started Chrome for {role} in {session.startup:.1f}s")
+            return session
+        finally:
+            # Waiting threads take the new session, or try starting one themselves if this failed
+            with self.lock:
+                self.starting.pop(key, None)
+            starting.set()
+
+    def release(self, driver):
+        """
+        Hide a session's window so it's ready for the next acquire.
+        Args:
+            driver: (WebDriver) The session's driver
+        Returns:
+            bool: True if it was hidden, False if it isn't one of the pool's sessions or Chrome is gone
+        """
+        session = self._find(driver)
+        if session is None:
+            return False
+        try:
+            driver.minimize_window()
+        except Exception as e:
+            log.debug(f"Couldn't minimize {session}, discarding it: {e}")
+            self.discard(driver)
+            return False
+        session.hidden = True
+        return True
+
+    def discard(self, driver):
+        """
+        Quit a session's Chrome and forget it.
+        Args:
+            driver: (WebDriver) The session's driver
+        Returns:
+            None
+        """
+        session = self._find(driver)
+        if session is not None:
+            key = (session.role, session.url)
+            with self.lock:
+                # Another thread may have discarded it already and started its replacement
+                if self.sessions.get(key) is session:
+                    del self.sessions[key]
+                    self._stat(session.role)['lifetimes'].append(time.time() - session.created)
+        try:
+            driver.quit()
+        except Exception as e:
+            log.debug(f"Chrome was already gone: {e}")
+
+    def healthy(self, session):
+        """Whether the session's Chrome still answers. One WebDriver call."""
+        try:
+            session.driver.current_window_handle
+            return True
+        except Exception:
+            return False
+
+    def memory_mb(self, session):
+        """
+        Get the memory used by a session's ChromeDriver and every Chrome process under it.
+        Returns:
+            float: Resident memory in MB. 0 if it can't be measured
+        """
+        try:
+            driver_process = psutil.Process(session.driver.service.process.pid)
+            processes = [driver_process] + driver_process.children(recursive=True)
+        except (AttributeError, psutil.Error):
+            return 0
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                continue
+        return total / (1024 * 1024)
+
+    def over_memory(self, driver):
+        """
+        Whether a session's Chrome has grown past recycle_memory_mb.
+        Args:
+            driver: (WebDriver) The session's driver
+        Returns:
+            bool: True if it should be recycled. False if it's under, or isn't one of the pool's sessions
+        """
+        session = self._find(driver)
+        return session is not None and self.memory_mb(session) > recycle_memory_mb
+
+    def metrics(self):
+        """
+        Get what the sessions have cost so far, by role.
+        Returns:
+            dict: For each role, starts, reuses, startup_seconds (total), recycled_unresponsive,
+                  recycled_memory, and lifetimes (seconds each ended session lived)
+        Examples:
+            >>> webdriver_pool.get().metrics()
+            {'pos': {'starts': 1, 'reuses': 14, 'startup_seconds': 6.2, 'recycled_unresponsive': 0, 'recycled_memory': 0, 'lifetimes': []}}
+        """
+        with self.lock:
+            return {role: dict(stat, lifetimes=list(stat['lifetimes'])) for role, stat in self.stats.items()}
+
+    def close_all(self):
+        """Quit every session and log the metrics."""
+        with self.lock:
+            drivers = [session.driver for session in self.sessions.values()]
+        for driver in drivers:
+            self.discard(driver)
+        for role, stat in self.metrics().items():
+            log.debug(f"Chrome sessions for {role}: {stat['starts']} started in {stat['startup_seconds']:.1f}s, "
+                      f"{stat['reuses']} reused")
+
+    def _show(self, session):
+        try:
+            session.driver.maximize_window()
+        except Exception as e:
+            log.debug(f"Couldn't restore the window of {session}: {e}")
+        session.hidden = False
+
+    def _find(self, driver):
+        with self.lock:
+            for session in self.sessions.values():
+                if session.driver is driver:
+                    return session
+        return None
+
+    def _stat(self, role):
+        """Get the counters for a role. Call with the lock held, and update them before releasing it."""
+        if role not in self.stats:
+            self.stats[role] = {'starts': 0, 'reuses': 0, 'startup_seconds': 0.0,
+                                'recycled_unresponsive': 0, 'recycled_memory': 0, 'lifetimes': []}
+        return self.stats[role]
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get():
+    """
+    Get the shared pool, creating it on first use. Its sessions are quit when Python exits.
+    Returns:
+        WebDriverPool: The pool
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = WebDriverPool()
+            atexit.register(_pool.close_all)
+        return _pool
@@ -9,18 +9,20 @@ import types
 import inspect
 import pywinauto
 from threading import Lock
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from textwrap import TextWrapper
 
 os.chdir(os.path.dirname(os.path.realpath(__file__)))
 
-from app import initial_setup, Overlay, Results, system, crindsim
+from app import initial_setup, Overlay, Results, system, crindsim, OCR
 from app.framework import EDH
-from app import server
+from app.util import server
+from app.util import waits, scheduler
 
 SCRIPTS_DIR = "scripts/features"
 TIME_FMT = "%Y-%m-%dT%H:%M:%S"
 RUN_DATA_FILE = "C:/Automation/run_info.json"
+DURATION_HISTORY_FILE = "C:/Automation/script_durations.json"
 PASS = True
 FAIL = False
 LOCK = Lock()
@@ -368,6 +370,7 @@ def execute(test, tests_to_run=[]):
             test_name = [*test][0]
             tests_to_run = test[test_name]
         execute_test(test_name, res, tests_to_run)
+    res.finalize()
 
     now = datetime.now().replace(microsecond=0)
     diff = now - start_time
@@ -377,6 +380,73 @@ def execute(test, tests_to_run=[]):
     log.info('-'*60)
     log.info(f"| Suite run time: {diff}")
     log.info('-'*60)
+    ocr_stats = OCR.cacheStats()
+    log.info(f"| OCR cache: {ocr_stats['hits']} hits, {ocr_stats['misses']} misses")
+    log.info('-'*60)
+    wait_stats = waits.wait_stats()
+    if wait_stats:
+        log.info("| Slowest waits (count, timeouts, total, max):")
+        for name, entry in sorted(wait_stats.items(), key=lambda item: -item[1]['total'])[:10]:
+            log.info(f"|   {name}: {entry['count']}, {entry['timeouts']}, {entry['total']:.1f}s, {entry['max']:.1f}s")
+        log.info('-'*60)
+
+def execute_parallel(test, sites_file):
+    """
+    Execute Parallel
+
+    This method will run the scripts of a suite across the sites listed in sites_file and merge
+    their results into one report. Scripts are handed out longest first based on previous run times.
+    The sites must already be set up; the suite's initial_setup is not run.
+
+    Args:
+        test (str):         The name of the suite being run.
+        sites_file (str):   JSON file listing the sites to run on. See scheduler.load_agents.
+    """
+    global run_info
+
+    log = logging.getLogger()
+
+    if '.json' not in test:
+        log.error("Parallel runs need a suite file")
+        return False
+
+    suite_file = f'scripts/{test}'
+    if not os.path.isfile(suite_file):
+        log.warning(f"No such suite: {suite_file}")
+        return False
+    with open(suite_file) as suite_list:
+        try:
+            suite = json.load(suite_list)
+        except:
+            log.error(f"Invalid json file: {suite_file}")
+            return False
+
+    agents = scheduler.load_agents(sites_file)
+    history = scheduler.DurationHistory(DURATION_HISTORY_FILE)
+    jobs = scheduler.build_jobs(suite['suite_features'], suite.get('affinity', []))
+    assignment, estimate = scheduler.plan(jobs, agents, history)
+
+    log.info("-" * 60)
+    log.info(f"| Starting {run_info['name']} on {len(agents)} sites: {run_info['date_started']}")
+    log.info(f"| Estimated run time: {timedelta(seconds=int(estimate))}")
+    for site, site_jobs in assignment.items():
+        log.info(f"|   {site}: {', '.join(job.name for job in site_jobs)}")
+    log.info("-" * 60)
+
+    results = scheduler.run(jobs, agents, history)
+    history.save()
+
+    res = Results()
+    res.initilize(run_info['brand'], run_info['version'], run_info['attempt_num'], run_info['name'], run_info['results_dir'])
+    res.merge(results, upload=False) # Each site already uploaded its own results
+    res.finalize()
+
+    now = datetime.now().replace(microsecond=0)
+    log.info('-'*60)
+    log.info(f"| Finished run at {now}")
+    log.info('-'*60)
+    log.info(f"| Suite run time: {now - start_time}")
+    log.info('-'*60)
 
 def execute_test(script, res, tests_to_run=[]):
     """
@@ -579,6 +649,9 @@ def args_parser():
     helptext = '\n'.join(wrap.wrap(f"The name of the test or suite to run."))
     argparser.add_argument("-run", "--run", default='None', help=helptext)
 
+    helptext = '\n'.join(wrap.wrap(f"Run the suite given with -run across the sites listed in this JSON file, longest scripts first."))
+    argparser.add_argument("-sites", "--sites", help=helptext)
+
     helptext = '\n'.join(wrap.wrap(f"Run specific test cases from a script. Provide test method names to run separated by commas. N/A for suites."))
     argparser.add_argument("-tests", "--tests", help=helptext)
 
@@ -677,7 +750,10 @@ if __name__ == '__main__':
     elif args.run != 'None':
         setup_run(args.run, verbosity, variables)
         log.info(f'Running {args.run}')
-        execute(f"{args.run}", tests_to_run)
+        if args.sites:
+            execute_parallel(f"{args.run}", args.sites)
+        else:
+            execute(f"{args.run}", tests_to_run)
     else:
         parser.print_help()
 
@@ -0,0 +1,71 @@
+"""
+Name: bench_color_mask
+Description: Micro-benchmark of the OCR color filter over saved screenshots: the NumPy
+             mask (OCR.colorMask) against the PIL band filtering (OCR.bandMask) processImage
+             falls back to without NumPy, alone and with the upscale and filters processImage
+             adds. Also checks that both give the same pixels.
+                python tests/bench_color_mask.py Scripts/features/test_image.png
+             Not collected by unittest, the file name doesn't start with test.
+
+Date created: 10/18/2026
+Modified By:
+Date Modified:
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+_root = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..")
+sys.path.insert(0, _root)
+
+from PIL import Image
+from app.framework import OCR
+
+# (color, tolerance) pairs, single color searches and a multi color one
+CASES = [
+    ('000000', '000000'),
+    ('FFFFFF', '202020'),
+    (['000000', 'FFFFFF', '0000FF'], '303030'),
+]
+
+def process(img, color, tolerance, use_numpy):
+    OCR.numpy_installed = use_numpy
+    return OCR.processImage(img, color, tolerance)
+
+def bench(func, repeat):
+    """
+    Mean ms per call.
+    """
+    return timeit.timeit(func, number=repeat) / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="NumPy vs PIL OCR color filter")
+    parser.add_argument("images", nargs="*", default=[os.path.join(_root, "Scripts", "features", "test_image.png")],
+                        help="Saved screenshots to filter")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    numpy_installed = OCR.numpy_installed
+    if not numpy_installed:
+        sys.exit("NumPy is not installed, nothing to compare")
+    try:
+        for path in args.images:
+            img = Image.open(path).convert('RGB')
+            print(f"{os.path.basename(path)} {img.size[0]}x{img.size[1]}")
+            for color, tolerance in CASES:
+                same = (process(img, color, tolerance, False).tobytes()
+                        == process(img, color, tolerance, True).tobytes())
+                pil = bench(lambda: OCR.bandMask(img, color, tolerance), args.repeat)
+                vec = bench(lambda: OCR.colorMask(img, color, tolerance), args.repeat)
+                pilFull = bench(lambda: process(img, color, tolerance, False), args.repeat)
+                vecFull = bench(lambda: process(img, color, tolerance, True), args.repeat)
+                print(f"  {str(color):<32} mask: PIL {pil:6.1f} ms  NumPy {vec:6.1f} ms  {pil/vec:4.1f}x   "
+                      f"processImage: PIL {pilFull:6.1f} ms  NumPy {vecFull:6.1f} ms   "
+                      f"{'identical' if same else 'DIFFERENT'}")
+    finally:
+        OCR.numpy_installed = numpy_installed
+
+if __name__ == '__main__':
+    main()
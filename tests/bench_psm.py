@@ -0,0 +1,75 @@
+"""
+Name: bench_psm
+Description: Per-call latency of an OCR attempt with the PSMs run one after another
+             (OCR.parallel_psm = False) and all at once (OCR.parallel_psm = True).
+             Needs Tesseract, so run it on a test machine:
+                python tests/bench_psm.py "Press the speed keys" --images Scripts/features/test_image.png
+                python tests/bench_psm.py "Press the speed keys" --live
+             Not collected by unittest, the file name doesn't start with test.
+
+Date created: 10/18/2026
+Modified By:
+Date Modified:
+"""
+
+import argparse
+import os
+import statistics
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+
+from PIL import Image
+from app.framework import OCR
+
+def attempt(img, search_text, psm):
+    """
+    One findText attempt on a processed image: the first PSM whose output
+    contains the text wins and the rest are cancelled.
+    """
+    wanted = search_text.replace(' ', '')
+    for mode, output in OCR.runPSMs(lambda mode: OCR.imageToString(img, mode), psm):
+        if OCR.closestMatch(output.replace('\n', '').replace(' ', ''), wanted, 0)[1] == 0:
+            return mode
+    return None
+
+def time_calls(func, repeat):
+    """
+    Call func repeat times with an empty Tesseract cache and return the latencies in ms.
+    """
+    latencies = []
+    for _ in range(repeat):
+        OCR.result_cache.clear()
+        start = perf_counter()
+        func()
+        latencies.append((perf_counter() - start) * 1000)
+    return latencies
+
+def report(name, latencies):
+    print(f"{name:<40} mean {statistics.mean(latencies):8.1f} ms   "
+          f"median {statistics.median(latencies):8.1f} ms   max {max(latencies):8.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Serial vs parallel PSM latency")
+    parser.add_argument("search_text", help="Text to look for. Use text that isn't there to time every PSM")
+    parser.add_argument("--images", nargs="*", default=[], help="Saved screenshots to read")
+    parser.add_argument("--live", action="store_true", help="Time OCR.findText against the screen")
+    parser.add_argument("--psm", type=int, nargs="+", default=[12, 6, 3, 11])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    for parallel in (False, True):
+        OCR.parallel_psm = parallel
+        mode = "parallel" if parallel else "serial"
+        for path in args.images:
+            img = OCR.processImage(Image.open(path).convert('RGB'))
+            found = []
+            latencies = time_calls(lambda: found.append(attempt(img, args.search_text, args.psm)), args.repeat)
+            report(f"{mode} {os.path.basename(path)} (psm {found[-1]})", latencies)
+        if args.live:
+            latencies = time_calls(lambda: OCR.findText(args.search_text, psm=args.psm), args.repeat)
+            report(f"{mode} findText on screen", latencies)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Name: test_closest_match
+Description: Checks OCR.closestMatch against the full dynamic programming table it
+             replaced, on edge cases and random text.
+             Run with python -m unittest discover tests
+
+Date created: 10/18/2026
+Modified By:
+Date Modified:
+"""
+
+import ast
+import logging
+import os
+import random
+import string
+import unittest
+
+# OCR.py needs PIL, pywinauto and Tesseract just to import, so only the matcher is
+# pulled out of the source
+_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "app", "framework", "OCR.py")
+with open(_path) as _file:
+    _tree = ast.parse(_file.read())
+_module = ast.Module([node for node in _tree.body if getattr(node, 'name', None) in ('closestMatch', 'ClosestMatchError')], [])
+_namespace = {'log': logging.getLogger()}
+exec(compile(_module, _path, 'exec'), _namespace)
+closestMatch = _namespace['closestMatch']
+
+def reference_closest_match(text, pattern):
+    """
+    The original closestMatch, which fills in the whole table.
+    """
+    tLen = len(text)
+    pLen = len(pattern)
+    minDists = [[float('inf') for x in range(tLen+1)] for y in range(pLen+1)]
+    for j in range(tLen+1):
+        minDists[0][j] = 0
+    paths = [[-1 for x in range(tLen+1)] for y in range(pLen+1)]
+    for j in range(tLen+1):
+        for i in range(1,pLen+1):
+            if j == 0:
+                minDists[i][j] = minDists[i-1][j] + 1
+                paths[i][j] = 1
+            else:
+                path1 = minDists[i-1][j] + 1
+                path2 = minDists[i-1][j-1] + (pattern[i-1] != text[j-1])
+                path3 = minDists[i][j-1] + 1
+                minDists[i][j] = min(path1, path2, path3)
+                if minDists[i][j] == path1: paths[i][j] = 1
+                elif minDists[i][j] == path2: paths[i][j] = 2
+                else: paths[i][j] = 3
+
+    minDist = float('inf')
+    starts = []
+    matches = []
+    for j in range(tLen+1):
+        if minDists[pLen][j] < minDist:
+            starts = [j]
+            minDist = minDists[pLen][j]
+        elif minDists[pLen][j] == minDist:
+            starts.append(j)
+    for start in starts:
+        y = start
+        x = pLen
+        while x > 0 and y > 0:
+            if paths[x][y] == 1:
+                x = x-1
+            elif paths[x][y] == 2:
+                x = x-1
+                y = y-1
+            else:
+                y = y-1
+        matches.append(text[y:start])
+    return (matches, minDist)
+
+class ClosestMatchTest(unittest.TestCase):
+    def assertSameMatches(self, text, pattern):
+        self.assertEqual(closestMatch(text, pattern), reference_closest_match(text, pattern),
+                         f"text={text!r} pattern={pattern!r}")
+
+    def test_empty_text_and_pattern(self):
+        for text, pattern in [('', ''), ('', 'Pay'), ('Pay', ''), ('', 'a')]:
+            self.assertSameMatches(text, pattern)
+
+    def test_exact_and_repeated_matches(self):
+        self.assertSameMatches('Cash Credit Cash', 'Cash')
+        self.assertSameMatches('aaaa', 'aa')
+        self.assertEqual(closestMatch('Cash Credit Cash', 'Cash'), (['Cash', 'Cash'], 0))
+
+    def test_ties(self):
+        for text, pattern in [('abXdefabYdef', 'abZdef'), ('cat bat hat', 'mat'), ('abab', 'ba'), ('xyz', 'abc')]:
+            self.assertSameMatches(text, pattern)
+
+    def test_case_differences(self):
+        for text, pattern in [('TOTAL DUE $5.00', 'Total Due'), ('pay', 'PAY'), ('Void Item', 'void item')]:
+            self.assertSameMatches(text, pattern)
+
+    def test_pattern_longer_than_text(self):
+        self.assertSameMatches('Pay', 'Payment Complete')
+
+    def test_ocr_like_text(self):
+        screen = "Enter Amount\nTotal: $12.50\nTender: Cash  Credit  Debit\nPress the speed keys to enter items."
+        for pattern in ['Press the speed keys', 'Tota1', 'Cred1t', 'Debit Card', 'Amount Due']:
+            self.assertSameMatches(screen, pattern)
+
+    def test_random(self):
+        rng = random.Random(2026)
+        for alphabet in ['ab', 'abc ', string.ascii_letters + string.digits + ' .$']:
+            for _ in range(300):
+                text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 60)))
+                pattern = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 12)))
+                self.assertSameMatches(text, pattern)
+
+    def test_max_dist(self):
+        self.assertEqual(closestMatch('Cash Credit', 'Debit Card', maxDist=1),
+                         ([], reference_closest_match('Cash Credit', 'Debit Card')[1]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+"""
+Name: test_peripheral_loop
+Description: Tests for the simulated peripherals' I/O loop, over local sockets.
+             Run with python -m unittest discover tests
+
+Date created: 10/18/2026
+Modified By:
+Date Modified:
+"""
+
+import importlib.util
+import os
+import socket
+import threading
+import unittest
+
+# Loaded by path, as importing the app package starts the simulators
+_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "app", "simulators", "peripheral_loop.py")
+_spec = importlib.util.spec_from_file_location("peripheral_loop", _path)
+peripheral_loop = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(peripheral_loop)
+
+TIMEOUT = 5
+
+def recv_exactly(sock, size):
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+class DelimitedTest(unittest.TestCase):
+    def test_frames_split_across_chunks(self):
+        frames = []
+        on_data = peripheral_loop.delimited(frames.append)
+        on_data(b'AB')
+        self.assertEqual(frames, [])
+        on_data(b'C\rDE')
+        self.assertEqual(frames, [b'ABC'])
+        on_data(b'F\r')
+        self.assertEqual(frames, [b'ABC', b'DEF'])
+
+    def test_several_frames_in_one_chunk(self):
+        frames = []
+        peripheral_loop.delimited(frames.append)(b'1\r\r2\r3')
+        self.assertEqual(frames, [b'1', b'', b'2'])
+
+    def test_multibyte_delimiter(self):
+        frames = []
+        on_data = peripheral_loop.delimited(frames.append, delimiter=b'\r\n')
+        on_data(b'one\r')
+        on_data(b'\ntwo\r\n')
+        self.assertEqual(frames, [b'one', b'two'])
+
+class SocketEndpointTest(unittest.TestCase):
+    def setUp(self):
+        self.loop = peripheral_loop.PeripheralLoop().start()
+        self.sock, self.peer = socket.socketpair()
+        self.peer.settimeout(TIMEOUT)
+        self.received = []
+        self.got_data = threading.Event()
+        self.disconnected = threading.Event()
+        def on_data(data):
+            self.received.append(data)
+            self.got_data.set()
+        self.endpoint = self.loop.attach(self.sock, on_data=on_data, on_disconnect=self.disconnected.set)
+        self.assertTrue(self.endpoint.wait_connected(TIMEOUT))
+
+    def tearDown(self):
+        self.loop.stop()
+        self.peer.close()
+        if self.endpoint.conn is not None:
+            self.endpoint.conn.close()
+
+    def test_send_calls_on_sent(self):
+        results = []
+        sent = threading.Event()
+        def on_sent(ok):
+            results.append(ok)
+            sent.set()
+        payload = bytes(range(256)) * 4096 # More than one send() writes
+        self.assertTrue(self.endpoint.send(payload, on_sent))
+        self.assertEqual(recv_exactly(self.peer, len(payload)), payload)
+        self.assertTrue(sent.wait(TIMEOUT))
+        self.assertEqual(results, [True])
+
+    def test_unsent_data_fails_on_close(self):
+        results = []
+        self.loop.stop() # Hold the queued calls until the close is queued behind the send
+        self.assertTrue(self.endpoint.send(b'lost', results.append))
+        self.endpoint.close()
+        self.loop.start()
+        self.assertTrue(self._wait(lambda: results))
+        self.assertEqual(results, [False])
+        self.assertFalse(self.endpoint.send(b'more'))
+
+    def test_receive_and_disconnect(self):
+        self.peer.sendall(b'hello')
+        self.assertTrue(self.got_data.wait(TIMEOUT))
+        self.assertEqual(b''.join(self.received), b'hello')
+        self.peer.close()
+        self.assertTrue(self.disconnected.wait(TIMEOUT))
+        self.assertFalse(self.endpoint.connected.is_set())
+
+    def _wait(self, done):
+        event = threading.Event()
+        for _ in range(int(TIMEOUT / 0.01)):
+            if done():
+                return True
+            event.wait(0.01)
+        return done()
+
+class TcpEndpointTest(unittest.TestCase):
+    def setUp(self):
+        self.loop = peripheral_loop.PeripheralLoop().start()
+        self.connects = []
+        self.connected = threading.Event()
+        self.disconnected = threading.Event()
+        def on_connect(addr):
+            self.connects.append(addr)
+            self.connected.set()
+        self.endpoint = self.loop.listen('127.0.0.1', 0, on_connect=on_connect,
+                                         on_disconnect=self.disconnected.set)
+        self.port = self.endpoint.listener.getsockname()[1]
+        self.clients = []
+
+    def tearDown(self):
+        self.endpoint.close()
+        self.loop.stop()
+        for client in self.clients:
+            client.close()
+
+    def connect(self):
+        self.connected.clear()
+        client = socket.create_connection(('127.0.0.1', self.port), TIMEOUT)
+        self.clients.append(client)
+        self.assertTrue(self.connected.wait(TIMEOUT))
+        return client
+
+    def test_reconnect_after_disconnect(self):
+        first = self.connect()
+        first.close()
+        self.assertTrue(self.disconnected.wait(TIMEOUT))
+
+        second = self.connect()
+        self.assertEqual(len(self.connects), 2)
+        self.assertTrue(self.endpoint.send(b'again'))
+        self.assertEqual(recv_exactly(second, 5), b'again')
+
+    def test_new_connection_replaces_old(self):
+        first = self.connect()
+        second = self.connect()
+        self.assertEqual(first.recv(1), b'') # Closed by the endpoint
+        self.assertTrue(self.endpoint.send(b'new'))
+        self.assertEqual(recv_exactly(second, 3), b'new')
+
+if __name__ == '__main__':
+    unittest.main()